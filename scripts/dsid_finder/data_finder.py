@@ -3,16 +3,21 @@ __author__ = "Josh McFayden"
 __doc__ = """API for PMG Central Page"""
 
 # Python imports
-import subprocess
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import json
 import logging
 import pandas as pd
 import os
+import sys
+import threading
 
+import session_daemon
 import utils
 
 
 metas=['crossSection','genFiltEff','kFactor']
+PMGDBcolumns=['DSID','physics_short','crossSection','genFiltEff','kFactor','relUncertUP','relUncertDOWN','generator_name','etag']
 fixedL3s=['Baseline','Systematic','Alternative','Specialised']
 
 
@@ -22,7 +27,7 @@ def main():
 
     # Parse options from command line
     from optparse import OptionParser
-    usage = "usage: %prog ldn"
+    usage = "usage: %prog ldn\n       %prog -i ldns.txt -o table.csv [-j 8]"
     parser = OptionParser(usage=usage)#, version="%prog")
     parser.add_option("-v", "--verbose", action="store_true", dest="verbose",    help="Set verbose mode (default: %default)")
     parser.add_option("-m", "--metadata", action="store_true", dest="metadata", help="Also print dataset metadata (default: %default)")
@@ -32,12 +37,23 @@ def main():
     parser.add_option("-f", "--outformat", action="store", dest="outformat", help="Print only specific output format availble for each sample (default: %default)")
     parser.add_option("-s", "--scope", action="store", dest="scope", help="Select specific scope (default: %default)")
     parser.add_option("-S", "--shortscope", action="store", dest="shortscope", help="Force shortscope (default: %default)")
+    parser.add_option("-i", "--input", action="store", dest="input", help="Batch mode: read evtgen datasets, one per line, from this file ('-' for stdin) (default: %default)")
+    parser.add_option("-o", "--output", action="store", dest="output", help="Batch mode: write the table here - .csv, .json or .parquet (default: %default)")
+    parser.add_option("-j", "--jobs", action="store", type="int", dest="jobs", help="Batch mode: datasets processed in parallel (default: %default)")
+    parser.add_option("-d", "--daemon", action="store", dest="daemon", help="Use the AMI/Rucio sessions of the session_daemon.py listening on this socket, if it is running (default: %default)")
+    parser.add_option("-D", "--nodaemon", action="store_true", dest="nodaemon", help="Always open new AMI/Rucio sessions (default: %default)")
+    parser.add_option("-c", "--checkpoint", action="store", dest="checkpoint", help="Batch mode: file recording finished datasets, so a failed run can be resumed (default: <output>.checkpoint)")
 
-    parser.set_defaults(verbose=False,metadata=False,aod=False,phys=None,physlite=None,outformat=None,scope=None,shortscope=None,table=None)
+    parser.set_defaults(verbose=False,metadata=False,aod=False,phys=None,physlite=None,outformat=None,scope=None,shortscope=None,table=None,input=None,output=None,jobs=8,checkpoint=None,daemon=session_daemon.defaultSocket(),nodaemon=False)
 
     (opts, args) = parser.parse_args()
 
-    if len(args) != 1:
+    if opts.input:
+        if args:
+            raise ValueError("Give evtgen datasets either on the command line or with --input, not both")
+        if not opts.output:
+            raise ValueError("--input needs an --output table")
+    elif len(args) != 1:
         raise ValueError("Please provide exactly one evtgen dataset")   
 
     # Set up logging
@@ -88,32 +104,43 @@ def main():
     if scopeshort != "mc16" and scopeshort != "mc20":
         DBfile=DBfilebase+f'dev/PMGTools/PMGxsecDB_{simshort}.txt'
 
-    # AMI client
-    try:
-        import pyAMI.client
-        import pyAMI.atlas.api as AtlasAPI
-    except ImportError:
-        logging.error("Unable to find pyAMI client. Please try this command first: lsetup pyAMI")
-        return -1
-
-    # Rucio client
-    try:
-        from rucio.client import Client
-        rucio = Client()
-    except ImportError:
-        logging.error("Unable to find Rucio client. Please try this command first: lsetup rucio")
-        return -1
-
-
-    # AMI session
-    try:
-        #ami = pyAMI.client.Client('atlas')
-        ami = pyAMI.client.Client('atlas-replica')
-        AtlasAPI.init()
-    except:
-        logging.error("Could not establish pyAMI session. Are you sure you have a valid certificate? Do: voms-proxy-init -voms atlas")
-        return -1
-
+    # A running session daemon already holds authenticated sessions
+    rucio=None
+    if not opts.nodaemon:
+        rucio=session_daemon.connect(opts.daemon)
+        if rucio:
+            logging.debug(f'Using the session daemon on {opts.daemon}')
+
+    if rucio is None:
+        # AMI client
+        try:
+            import pyAMI.client
+            import pyAMI.atlas.api as AtlasAPI
+        except ImportError:
+            logging.error("Unable to find pyAMI client. Please try this command first: lsetup pyAMI")
+            return -1
+
+        # Rucio client
+        try:
+            from rucio.client import Client
+            rucio = Client()
+        except ImportError:
+            logging.error("Unable to find Rucio client. Please try this command first: lsetup rucio")
+            return -1
+
+
+        # AMI session
+        try:
+            #ami = pyAMI.client.Client('atlas')
+            ami = pyAMI.client.Client('atlas-replica')
+            AtlasAPI.init()
+        except:
+            logging.error("Could not establish pyAMI session. Are you sure you have a valid certificate? Do: voms-proxy-init -voms atlas")
+            return -1
+
+
+    if opts.input:
+        return runBatch(opts,rucio,scopeshort,tagcombs,DBfile)
 
     # Parsing of command line options
     hashcomb=[]
@@ -126,41 +153,27 @@ def main():
 
     ldns=[args[0]]
 
-    metadata=None
     outformats=None
     aods=None
     physs=None
     physlites=None
-    if opts.metadata:
-        metadata=getMetadata(ldns,DBfile)
     if opts.outformat:
-        outformats=utils.getOutputFormat(rucio,opts.outformat,ldns,scopeshort,tagcombs)
+        outformats=getOutputFormat(rucio,opts.outformat,ldns,scopeshort,tagcombs)
     if opts.aod:
-        aods=utils.getOutputFormat(rucio,"AOD",ldns,scopeshort,tagcombs)
+        aods=getOutputFormat(rucio,"AOD",ldns,scopeshort,tagcombs)
     if opts.phys:
-        physs=utils.getOutputFormat(rucio,"DAOD_PHYS",ldns,scopeshort,tagcombs)
+        physs=getOutputFormat(rucio,"DAOD_PHYS",ldns,scopeshort,tagcombs)
     if opts.physlite:
-        physlites=utils.getOutputFormat(rucio,"DAOD_PHYSLITE",ldns,scopeshort,tagcombs)
-    table={}
+        physlites=getOutputFormat(rucio,"DAOD_PHYSLITE",ldns,scopeshort,tagcombs)
+    table=sampleTable(ldns,readPMGDB(DBfile) if opts.metadata else None).set_index('ldn')
     
     for ldn in ldns:
-        if ldn not in table:
-            s_ldn=ldn.split('.')
-            table[ldn]={
-                'Dataset':s_ldn[1]+"."+s_ldn[2].replace('_','\_')+"."+s_ldn[-1],
-                'crossSection':"",
-                'genFiltEff':"",
-                'kFactor':"",
-            }
         if not opts.metadata:
             #Check mode
             print(ldn)
         else:
             
-            print(ldn,metadata[ldn]['crossSection'],metadata[ldn]['genFiltEff'],metadata[ldn]['kFactor'])
-
-            for meta in metas:
-                table[ldn][meta]=metadata[ldn][meta]
+            print(ldn,*table.loc[ldn,metas])
             
         if opts.outformat:
             if not outformats:
@@ -188,6 +201,121 @@ def main():
 
 
 
+def readLdns(path):
+    # One dataset per line; blank lines and # comments skipped, duplicates dropped
+    f = sys.stdin if path == '-' else open(path)
+    try:
+        ldns=[ln.strip() for ln in f if ln.strip() and not ln.strip().startswith('#')]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    return list(OrderedDict.fromkeys(ldns))
+
+
+def readCheckpoint(path):
+    # ldn -> row, for every dataset a previous run finished
+    done={}
+    if not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for ln in f:
+            try:
+                row=json.loads(ln)
+            except ValueError:
+                # A line cut short when the last run died
+                continue
+            done[row['ldn']]=row
+    return done
+
+
+def requestedFormats(opts):
+    formats=[]
+    if opts.outformat:
+        formats.append(opts.outformat)
+    if opts.aod:
+        formats.append("AOD")
+    if opts.phys:
+        formats.append("DAOD_PHYS")
+    if opts.physlite:
+        formats.append("DAOD_PHYSLITE")
+    return list(OrderedDict.fromkeys(formats))
+
+
+def getOutputFormat(rucio,dsformat,ldns,scopeshort,tagcombs):
+    # rucio is either a Rucio client or a session_daemon.DaemonClient
+    if isinstance(rucio,session_daemon.DaemonClient):
+        return rucio.getOutputFormat(dsformat,ldns,scopeshort)
+    return utils.getOutputFormat(rucio,dsformat,ldns,scopeshort,tagcombs)
+
+
+def processLdn(ldn,rucio,scopeshort,tagcombs,formats):
+    # The Rucio part of a row of the batch table: the newest dataset of each
+    # requested format for each campaign (metadata is joined on afterwards)
+    if len(ldn.split('.')) < 6:
+        raise ValueError(f"Not an evtgen dataset name: {ldn}")
+    row=OrderedDict([('ldn',ldn)])
+    for dsformat in formats:
+        found=getOutputFormat(rucio,dsformat,[ldn],scopeshort,tagcombs)
+        if not found:
+            continue
+        for tagcomb in tagcombs:
+            names=sorted(found[ldn][tagcomb],reverse=True,key = lambda x: int(x.split('_')[-1][1:]))
+            row[f'{dsformat} {tagcomb}']=names[0] if names else ""
+    return row
+
+
+def writeTable(df,path):
+    ext=os.path.splitext(path)[1].lower()
+    if ext == '.json':
+        df.to_json(path,orient='records',indent=1)
+    elif ext in ('.parquet','.pq'):
+        df.to_parquet(path,index=False)
+    else:
+        df.to_csv(path,index=False)
+
+
+def runBatch(opts,rucio,scopeshort,tagcombs,DBfile):
+    # Every dataset is processed with the same AMI/Rucio clients, PMG DB and tag
+    # combinations, opts.jobs at a time. Each finished row is appended to the
+    # checkpoint straight away, so a rerun after a failure only does what is left.
+    ldns=readLdns(opts.input)
+    checkpoint=opts.checkpoint or opts.output+'.checkpoint'
+    done=readCheckpoint(checkpoint)
+    todo=[ldn for ldn in ldns if ldn not in done]
+    logging.info(f"{len(ldns)} datasets, {len(ldns)-len(todo)} already done (from {checkpoint})")
+
+    formats=requestedFormats(opts)
+
+    lock=threading.Lock()
+    failed=[]
+    with open(checkpoint,'a') as ckpt:
+        with ThreadPoolExecutor(max_workers=max(1,opts.jobs)) as pool:
+            futures={pool.submit(processLdn,ldn,rucio,scopeshort,tagcombs,formats): ldn for ldn in todo}
+            for n,future in enumerate(as_completed(futures)):
+                ldn=futures[future]
+                try:
+                    row=future.result()
+                except Exception as e:
+                    logging.error(f"{ldn}: {e}")
+                    failed.append(ldn)
+                    continue
+                with lock:
+                    ckpt.write(json.dumps(row)+'\n')
+                    ckpt.flush()
+                done[ldn]=row
+                logging.info(f"[{n+1}/{len(todo)}] {ldn}")
+
+    finished=[ldn for ldn in ldns if ldn in done]
+    found=pd.DataFrame([done[ldn] for ldn in finished]) if finished else pd.DataFrame({'ldn':[]})
+    table=sampleTable(finished,readPMGDB(DBfile) if opts.metadata else None)
+    writeTable(table.merge(found,on='ldn',how='left'),opts.output)
+    print(f"Wrote {len(ldns)-len(failed)} datasets to {opts.output}")
+    if failed:
+        print(f"ERROR: {len(failed)} datasets failed - run again to retry them (finished ones are kept in {checkpoint})")
+        return 1
+    return 0
+
+
 def getAvailableHashtags(ami,scopeshort,hashcomb,maxLevel):
 
     hashcombcmd=''
@@ -257,41 +385,36 @@ def getHashtagsForLdn(ami,ldn):
     return hashes
 
 
-def getMetadata(dslist,DBfile):
-    valsnotfound={'crossSection':"UNKNOWN",
-                  'genFiltEff':"UNKNOWN",
-                  'kFactor':"UNKNOWN"}
-
-    returnVals={}
-
+def readPMGDB(DBfile):
+    # The PMG cross section DB as a DataFrame, read once, one row per (DSID, etag)
     try:
-        with open(DBfile) as f:
-            s = f.read()
+        db=pd.read_csv(DBfile,sep=r'\s+',header=None,names=PMGDBcolumns,usecols=range(len(PMGDBcolumns)),dtype=str,on_bad_lines='skip')
     except IOError:
         logging.error("Looks like there was a problem reading PMG cross section database file: %s"%DBfile)
-        for ds in dslist: returnVals[ds]=valsnotfound
-        return returnVals
-
-
-    for ds in dslist:
-
-        if ds not in returnVals:
-            returnVals[ds]={}
-
-        p1 = subprocess.Popen(['cat','%s'%DBfile], stdout=subprocess.PIPE)
-        p2 = subprocess.Popen(['grep',ds.split('.')[1]], stdin=p1.stdout, stdout=subprocess.PIPE)
-        p3 = subprocess.Popen(['grep',ds.split('.')[-1]], stdin=p2.stdout, stdout=subprocess.PIPE)
-        matchline=p3.communicate()[0]
-        if len(matchline):
-            returnVals[ds]={'crossSection':matchline.split()[2].decode("utf-8"),
-                            'genFiltEff':matchline.split()[3].decode("utf-8"),
-                            'kFactor':matchline.split()[4].decode("utf-8")}
-        else:
-            returnVals[ds]=valsnotfound
+        return pd.DataFrame(columns=PMGDBcolumns)
+    # (the header line, and anything else that isn't a sample, has no numeric DSID)
+    db=db[db['DSID'].str.isdigit().fillna(False).astype(bool)]
+    return db.drop_duplicates(['DSID','etag'])
+
+
+def sampleTable(ldns,db=None):
+    # One row per LDN, with the DSID, etag and Dataset taken from the name, and (if
+    # db is given) the PMG metadata joined on (DSID, etag) in a single merge
+    table=pd.DataFrame({'ldn':list(ldns)},dtype=str)
+    parts=table['ldn'].str.split('.')
+    table['DSID']=parts.str[1]
+    table['etag']=parts.str[-1].str.split('_').str[0]
+    table['Dataset']=parts.str[1]+"."+parts.str[2]+"."+parts.str[-1]
+    if db is not None:
+        table=table.merge(db[['DSID','etag']+metas],on=['DSID','etag'],how='left')
+        table[metas]=table[metas].fillna("UNKNOWN")
+    return table
 
 
+def getMetadata(dslist,DBfile):
+    table=sampleTable(dslist,readPMGDB(DBfile)).drop_duplicates('ldn').set_index('ldn')
+    return table[metas].to_dict('index')
 
-    return returnVals
 
 def getEVNTldn(ldn,evgenshort,simshort,recshort,opts):
     #print("BEFORE:",ldn)
@@ -312,4 +435,4 @@ def getEVNTldn(ldn,evgenshort,simshort,recshort,opts):
     return evgenldn
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+__doc__ = """Daemon holding AMI and Rucio sessions for the dsid_finder scripts
+
+Setting up pyAMI (AtlasAPI.init) and a Rucio client, certificate handling and
+all, costs more than most of the queries the scripts make. The daemon does it
+once and then serves getSamplesFromHashtags, getHashtagsForLdn and
+getOutputFormat over a local (unix) socket, one JSON request per line.
+data_finder.py uses it when it is running.
+
+  session_daemon.py start [-p 4]    # run the daemon (in the foreground)
+  session_daemon.py status
+  session_daemon.py stop
+"""
+
+# Python imports
+from contextlib import contextmanager
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+
+import utils
+
+
+def defaultSocket():
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"dsid_finder-{os.getuid()}.sock")
+
+
+class ClientPool:
+    # A fixed set of clients, each used by one request at a time. They keep
+    # their HTTP connections open between requests.
+    def __init__(self, factory, size):
+        self._clients = queue.Queue()
+        for i in range(size):
+            self._clients.put(factory())
+
+    @contextmanager
+    def client(self):
+        c = self._clients.get()
+        try:
+            yield c
+        finally:
+            self._clients.put(c)
+
+
+class Sessions:
+    # The AMI and Rucio sessions, and the operations served on them
+    def __init__(self, poolsize):
+        import pyAMI.client
+        import pyAMI.atlas.api as AtlasAPI
+        from rucio.client import Client
+
+        AtlasAPI.init()
+        self.ami = ClientPool(
+            lambda: pyAMI.client.Client("atlas-replica"),
+            poolsize,
+        )
+        self.rucio = ClientPool(Client, poolsize)
+        self._tagcombs = {}
+
+    def tagcombs(self, scopeshort):
+        if scopeshort not in self._tagcombs:
+            self._tagcombs[scopeshort] = utils.getTagCombs(scopeshort)
+        return self._tagcombs[scopeshort]
+
+    def getSamplesFromHashtags(self, hashcomb, scope):
+        import data_finder
+
+        with self.ami.client() as ami:
+            return data_finder.getSamplesFromHashtags(ami, hashcomb, scope)
+
+    def getHashtagsForLdn(self, ldn):
+        import data_finder
+
+        with self.ami.client() as ami:
+            return data_finder.getHashtagsForLdn(ami, ldn)
+
+    def getOutputFormat(self, dsformat, ldns, scopeshort):
+        with self.rucio.client() as rucio:
+            return utils.getOutputFormat(
+                rucio, dsformat, ldns, scopeshort, self.tagcombs(scopeshort)
+            )
+
+
+OPERATIONS = ["getSamplesFromHashtags", "getHashtagsForLdn", "getOutputFormat"]
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request["op"]
+                if op == "ping":
+                    reply = {"ok": True, "result": os.getpid()}
+                elif op == "shutdown":
+                    reply = {"ok": True, "result": None}
+                    threading.Thread(target=self.server.shutdown).start()
+                elif op in OPERATIONS:
+                    result = getattr(self.server.sessions, op)(
+                        **request.get("args", {})
+                    )
+                    reply = {"ok": True, "result": result}
+                else:
+                    reply = {"ok": False, "error": f"Unknown operation {op}"}
+            except Exception as e:
+                logging.exception("Request failed")
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def serve(path, sessions):
+    if os.path.exists(path):
+        if connect(path) is not None:
+            raise RuntimeError(f"A daemon is already running on {path}")
+        os.unlink(path)
+    # Only this user may talk to the sessions
+    old = os.umask(0o177)
+    try:
+        server = Server(path, Handler)
+    finally:
+        os.umask(old)
+    server.sessions = sessions
+    logging.info(f"Serving AMI/Rucio sessions on {path}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.unlink(path)
+
+
+class DaemonError(RuntimeError):
+    pass
+
+
+class DaemonClient:
+    # Talks to a running daemon. Each call is its own connection, so one client
+    # can be used from many threads.
+    def __init__(self, path):
+        self.path = path
+
+    def call(self, op, **args):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(self.path)
+            with s.makefile("rwb") as f:
+                request = json.dumps({"op": op, "args": args}) + "\n"
+                f.write(request.encode("utf-8"))
+                f.flush()
+                line = f.readline()
+        if not line:
+            raise DaemonError(f"No reply from the daemon on {self.path}")
+        reply = json.loads(line)
+        if not reply["ok"]:
+            raise DaemonError(reply["error"])
+        return reply["result"]
+
+    def ping(self):
+        return self.call("ping")
+
+    def getSamplesFromHashtags(self, hashcomb, scope):
+        return self.call(
+            "getSamplesFromHashtags",
+            hashcomb=hashcomb,
+            scope=scope,
+        )
+
+    def getHashtagsForLdn(self, ldn):
+        return self.call("getHashtagsForLdn", ldn=ldn)
+
+    def getOutputFormat(self, dsformat, ldns, scopeshort):
+        return self.call(
+            "getOutputFormat",
+            dsformat=dsformat,
+            ldns=ldns,
+            scopeshort=scopeshort,
+        )
+
+
+def connect(path=None):
+    # A client for the daemon on path, or None if none is running there
+    client = DaemonClient(path or defaultSocket())
+    try:
+        client.ping()
+    except (OSError, ValueError, DaemonError):
+        return None
+    return client
+
+
+def main():
+
+    from optparse import OptionParser
+
+    usage = "usage: %prog start|status|stop"
+    parser = OptionParser(usage=usage)
+    parser.add_option(
+        "-v",
+        "--verbose",
+        action="store_true",
+        dest="verbose",
+        help="Set verbose mode (default: %default)",
+    )
+    parser.add_option(
+        "-s",
+        "--socket",
+        action="store",
+        dest="socket",
+        help="Socket to serve on (default: %default)",
+    )
+    parser.add_option(
+        "-p",
+        "--pool",
+        action="store",
+        type="int",
+        dest="pool",
+        help="AMI and Rucio clients kept open (default: %default)",
+    )
+    parser.set_defaults(verbose=False, socket=defaultSocket(), pool=4)
+
+    opts, args = parser.parse_args()
+    if len(args) != 1 or args[0] not in ("start", "status", "stop"):
+        parser.error("Please give one of start, status or stop")
+
+    logging.basicConfig(
+        format="%(levelname)s: %(message)s",
+        level=logging.DEBUG if opts.verbose else logging.INFO,
+    )
+
+    if args[0] == "status":
+        client = connect(opts.socket)
+        if client is None:
+            print(f"No daemon running on {opts.socket}")
+            return 1
+        print(f"Daemon running on {opts.socket} (pid {client.ping()})")
+        return 0
+
+    if args[0] == "stop":
+        client = connect(opts.socket)
+        if client is None:
+            print(f"No daemon running on {opts.socket}")
+            return 1
+        client.call("shutdown")
+        return 0
+
+    try:
+        sessions = Sessions(opts.pool)
+    except ImportError:
+        logging.error(
+            "Unable to find the pyAMI and Rucio clients. "
+            "Please try this command first: lsetup pyAMI rucio"
+        )
+        return -1
+    except Exception:
+        logging.error(
+            "Could not establish pyAMI/Rucio sessions. Are you sure you have "
+            "a valid certificate? Do: voms-proxy-init -voms atlas"
+        )
+        return -1
+    serve(opts.socket, sessions)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
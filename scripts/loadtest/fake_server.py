@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Run the atlas-mcp server against a fake ami-helper backend.
+
+`run_on_wsl` is replaced by a function that sleeps for an injected latency and
+has a small process print canned ami-helper output, so the server (cache,
+scheduler, tools) can be load tested without WSL, AMI or a grid proxy. Everything
+above `run_on_wsl` is the real server.
+
+Usage:
+    fake_server.py [--transport stdio|streamable-http] [--port 8000]
+
+Latency comes from ATLAS_LOADTEST_LATENCY_MS and ATLAS_LOADTEST_JITTER_MS. If
+ATLAS_LOADTEST_PID_FILE is set the server writes its pid there (so the load
+generator can watch its memory).
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import atlas_mcp.central_page as cp
+from atlas_mcp import deadlines, server
+
+LATENCY_MS = float(os.environ.get("ATLAS_LOADTEST_LATENCY_MS", "200"))
+JITTER_MS = float(os.environ.get("ATLAS_LOADTEST_JITTER_MS", "50"))
+FAIL_RATE = float(os.environ.get("ATLAS_LOADTEST_FAIL_RATE", "0"))
+
+GENERATORS = ["PowhegPythia8", "Sherpa2214", "MadGraphPythia8", "Herwig72"]
+
+
+def _hashtags(scope: str, keyword: str) -> str:
+    lines = []
+    for i, generator in enumerate(GENERATORS):
+        level3 = "Baseline" if i == 0 else "Systematic"
+        lines.append(f"Physics {keyword} {level3} {generator}")
+    return "\n".join(lines)
+
+
+def _evnt(scope: str, run: str) -> str:
+    return f"{scope}.{run}.PhPy8EG_A14_sample_{run}.evgen.EVNT.e8514"
+
+
+def _with_datatype(scope: str, run: str, tier: str) -> str:
+    rows = [
+        {
+            "dataset": f"{scope}.{run}.PhPy8EG_A14_sample_{run}.deriv.{tier}."
+            f"e8514_s4369_r16083_{p}",
+            "campaign": "mc23e - FS",
+        }
+        for p in ("p6266", "p6697")
+    ]
+    return json.dumps(rows)
+
+
+def _metadata(scope: str, name: str) -> str:
+    run = name.split(".")[1] if name.count(".") >= 2 else "000000"
+    return json.dumps(
+        {
+            "Physics Comment": "load test sample",
+            "Physics Short Name": f"PhPy8EG_A14_sample_{run}",
+            "Generator Name": "Powheg+Pythia8",
+            "Filter Efficiency": "1.0",
+            "Cross Section (nb)": "0.7298",
+        }
+    )
+
+
+def _provenance(scope: str, name: str) -> str:
+    run = name.split(".")[1] if name.count(".") >= 2 else "000000"
+    return "\n".join([name, _evnt(scope, run)])
+
+
+def ami_helper_output(args: str) -> str:
+    "What ami-helper would print for `args`"
+    words = args.split()
+    if words[:2] == ["hashtags", "find"]:
+        return _hashtags(words[2], words[3])
+    if words[:2] == ["datasets", "with-hashtags"]:
+        return "\n".join(_evnt(words[2], str(601000 + i)) for i in range(5))
+    if words[:2] == ["datasets", "with-datatype"]:
+        return _with_datatype(words[2], words[3], words[4])
+    if words[:2] == ["datasets", "metadata"]:
+        return _metadata(words[2], words[3])
+    if words[:2] == ["datasets", "provenance"]:
+        return _provenance(words[2], words[3])
+    raise RuntimeError(f"fake backend does not know `{args}`")
+
+
+def fake_run_on_wsl(command, distro="atlas_al9", files=None, on_line=None) -> str:
+    time.sleep(max(0.0, random.gauss(LATENCY_MS, JITTER_MS)) / 1000.0)
+    if FAIL_RATE and random.random() < FAIL_RATE:
+        raise RuntimeError("command failed with return code 1: injected failure")
+    args = command.split("ami-helper ", 1)[1]
+    stdout = "setting up atlas\n--start--\n" + ami_helper_output(args) + "\n"
+    # Printed by a real process, so the output is read (and bounded) the way
+    # ami-helper's is
+    echo = [sys.executable, "-c", "import sys; sys.stdout.write(sys.argv[1])"]
+    return deadlines.run_process([*echo, stdout], on_line=on_line).stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--transport", choices=["stdio", "streamable-http"], default="stdio"
+    )
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    pid_file = os.environ.get("ATLAS_LOADTEST_PID_FILE")
+    if pid_file:
+        with open(pid_file, "w") as f:
+            f.write(str(os.getpid()))
+
+    cp.run_on_wsl = fake_run_on_wsl
+    server.mcp.settings.port = args.port
+    server.mcp.run(transport=args.transport)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""Load test an atlas-mcp server running against a fake backend.
+
+For each concurrency level a fresh server (`fake_server.py`, with an empty cache)
+is started, and that many simulated clients call a weighted mix of tools as fast
+as they can for `--duration` seconds. Throughput, latency percentiles, error rates
+and the server's peak memory are reported per level.
+
+Examples:
+    loadgen.py --clients 1,4,16,64 --duration 20
+    loadgen.py --transport http --clients 8 --latency-ms 500 --json results.json
+    loadgen.py --mix get_metadata=1 --ami-concurrency 16 --ami-rate 1000
+
+With `--transport stdio` the clients share one stdio session (concurrent requests
+on one connection, like one agent host running many agents); with `http` each
+client has its own streamable-HTTP session.
+
+Note the server's own AMI rate limit (ATLAS_MCP_AMI_RATE, 2 calls a second by
+default) will dominate unless raised with `--ami-rate`.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+FAKE_SERVER = Path(__file__).with_name("fake_server.py")
+SCOPE = "mc23_13p6TeV"
+KEYWORDS = ["ttbar", "Dijet", "Wjets", "Zjets", "Diboson", "SingleTop", "Higgs"]
+
+DEFAULT_MIX = "get_addresses_for_keyword=5,get_samples_for_run=3,get_metadata=2"
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(TOOL_ARGS)
+    if unknown:
+        raise ValueError(f"Unknown tools in --mix: {sorted(unknown)}")
+    return mix
+
+
+def _run(keys: int) -> str:
+    return str(601000 + random.randrange(keys))
+
+
+TOOL_ARGS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    "get_addresses_for_keyword": lambda keys: {
+        "scope": SCOPE,
+        "keyword": f"{random.choice(KEYWORDS)}{random.randrange(keys)}",
+    },
+    "get_samples_for_run": lambda keys: {
+        "scope": SCOPE,
+        "run_number": _run(keys),
+        "data_tier": "PHYSLITE",
+    },
+    "get_metadata": lambda keys: {
+        "scope": SCOPE,
+        "dataset_name": f"{SCOPE}.{_run(keys)}.PhPy8EG_A14_sample.evgen.EVNT.e8514",
+    },
+}
+
+
+def read_rss_mb(pid: int) -> Optional[float]:
+    "Resident memory of a process, in MB, or None if it can't be read here"
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    try:
+        import psutil  # type: ignore
+
+        return psutil.Process(pid).memory_info().rss / (1024.0 * 1024.0)
+    except Exception:
+        return None
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+def server_env(opts: argparse.Namespace, cache_dir: str, pid_file: str) -> Dict:
+    env = dict(os.environ)
+    env.update(
+        {
+            "ATLAS_MCP_CACHE_DIR": cache_dir,
+            "ATLAS_LOADTEST_LATENCY_MS": str(opts.latency_ms),
+            "ATLAS_LOADTEST_JITTER_MS": str(opts.jitter_ms),
+            "ATLAS_LOADTEST_FAIL_RATE": str(opts.fail_rate),
+            "ATLAS_LOADTEST_PID_FILE": pid_file,
+        }
+    )
+    for setting, value in (
+        ("CONCURRENCY", opts.ami_concurrency),
+        ("RATE", opts.ami_rate),
+        ("BURST", opts.ami_burst),
+    ):
+        if value is not None:
+            env[f"ATLAS_MCP_AMI_{setting}"] = str(value)
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _wait_for_port(port: int, timeout: float = 30.0) -> None:
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server did not start listening on port {port}")
+
+
+@asynccontextmanager
+async def open_session(read, write) -> AsyncIterator[ClientSession]:
+    async with ClientSession(read, write) as session:
+        await session.initialize()
+        yield session
+
+
+async def worker(
+    session: ClientSession,
+    opts: argparse.Namespace,
+    mix: Dict[str, float],
+    stop_at: float,
+    results: List[Tuple[str, float, bool]],
+) -> None:
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < stop_at:
+        name = random.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            r = await asyncio.wait_for(
+                session.call_tool(name, TOOL_ARGS[name](opts.keys)), opts.call_timeout
+            )
+            ok = not r.isError
+        except Exception:
+            ok = False
+        results.append((name, time.perf_counter() - start, ok))
+
+
+async def watch_rss(pid_file: str, samples: List[float], stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            pid = int(Path(pid_file).read_text())
+            rss = read_rss_mb(pid)
+            if rss is not None:
+                samples.append(rss)
+        except (OSError, ValueError):
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), 0.5)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(
+    opts: argparse.Namespace, mix: Dict[str, float], clients: int
+) -> Dict[str, Any]:
+    "Start a fresh server, run `clients` clients against it, and summarize"
+    results: List[Tuple[str, float, bool]] = []
+    rss: List[float] = []
+    with tempfile.TemporaryDirectory(prefix="atlas-mcp-load-") as tmp:
+        pid_file = str(Path(tmp) / "server.pid")
+        env = server_env(opts, str(Path(tmp) / "cache"), pid_file)
+        stop = asyncio.Event()
+        watcher = asyncio.create_task(watch_rss(pid_file, rss, stop))
+
+        if opts.transport == "stdio":
+            params = StdioServerParameters(
+                command=sys.executable, args=[str(FAKE_SERVER)], env=env
+            )
+            errlog = sys.stderr if opts.verbose else open(os.devnull, "w")
+            async with stdio_client(params, errlog=errlog) as (read, write):
+                async with open_session(read, write) as session:
+                    started = time.monotonic()
+                    stop_at = started + opts.duration
+                    await asyncio.gather(
+                        *(
+                            worker(session, opts, mix, stop_at, results)
+                            for _ in range(clients)
+                        )
+                    )
+        else:
+            port = _free_port()
+            server = subprocess.Popen(
+                [
+                    sys.executable,
+                    str(FAKE_SERVER),
+                    "--transport",
+                    "streamable-http",
+                    "--port",
+                    str(port),
+                ],
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                await _wait_for_port(port)
+                url = f"http://127.0.0.1:{port}/mcp"
+
+                async def http_client():
+                    async with streamablehttp_client(url) as (read, write, _):
+                        async with open_session(read, write) as session:
+                            await worker(session, opts, mix, stop_at, results)
+
+                started = time.monotonic()
+                stop_at = started + opts.duration
+                await asyncio.gather(*(http_client() for _ in range(clients)))
+            finally:
+                server.terminate()
+                server.wait(10)
+        elapsed = time.monotonic() - started
+
+        stop.set()
+        await watcher
+
+    by_tool: Dict[str, List[float]] = defaultdict(list)
+    for name, latency, _ in results:
+        by_tool[name].append(latency * 1000)
+    latencies = [latency * 1000 for _, latency, _ in results]
+    errors = sum(1 for _, _, ok in results if not ok)
+    return {
+        "clients": clients,
+        "requests": len(results),
+        "throughput_rps": len(results) / elapsed if elapsed > 0 else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "error_rate": errors / len(results) if results else 0.0,
+        "max_rss_mb": max(rss) if rss else None,
+        "by_tool": {
+            name: {
+                "requests": len(values),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+            }
+            for name, values in sorted(by_tool.items())
+        },
+    }
+
+
+def print_table(levels: List[Dict[str, Any]]) -> None:
+    header = (
+        f"{'clients':>7} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'errors':>7} {'RSS MB':>7}"
+    )
+    print(header)
+    print("-" * len(header))
+    for r in levels:
+        rss = f"{r['max_rss_mb']:.0f}" if r["max_rss_mb"] is not None else "n/a"
+        print(
+            f"{r['clients']:>7} {r['requests']:>8} {r['throughput_rps']:>8.1f} "
+            f"{r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} {r['p99_ms']:>8.0f} "
+            f"{r['error_rate']:>7.1%} {rss:>7}"
+        )
+
+
+async def main_async(opts: argparse.Namespace) -> List[Dict[str, Any]]:
+    mix = parse_mix(opts.mix)
+    levels = []
+    for clients in [int(c) for c in opts.clients.split(",")]:
+        result = await run_level(opts, mix, clients)
+        levels.append(result)
+        if opts.verbose:
+            print(json.dumps(result, indent=2), file=sys.stderr)
+    return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__.splitlines()[0],
+        epilog="\n".join(__doc__.splitlines()[1:]),
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "--clients", default="1,4,16", help="Concurrency levels (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10.0, help="Seconds per level"
+    )
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument(
+        "--mix", default=DEFAULT_MIX, help="Tool weights (default: %(default)s)"
+    )
+    parser.add_argument(
+        "--keys",
+        type=int,
+        default=50,
+        help="Distinct keywords/runs to draw from - fewer means more cache hits",
+    )
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument(
+        "--fail-rate", type=float, default=0.0, help="Fraction of backend calls to fail"
+    )
+    parser.add_argument(
+        "--call-timeout",
+        type=float,
+        default=60.0,
+        help="Count a call as failed if it takes longer than this (seconds)",
+    )
+    parser.add_argument("--ami-concurrency", type=int, default=None)
+    parser.add_argument("--ami-rate", type=float, default=None)
+    parser.add_argument("--ami-burst", type=float, default=None)
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    opts = parser.parse_args()
+
+    levels = asyncio.run(main_async(opts))
+    print_table(levels)
+    if opts.json:
+        with open(opts.json, "w") as f:
+            json.dump(levels, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,3 @@
-def main() -> None:
-    print("Hello from atlas-mcp!")
+from atlas_mcp.cli import main
+
+__all__ = ["main"]
@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field
+
+from atlas_mcp import deadlines
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class BackendUnavailableError(RuntimeError):
+    "The backend has been failing, so the call was not attempted"
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BackendInfrastructureError(RuntimeError):
+    """The backend itself could not be used - WSL would not start, the grid proxy
+    has expired, AMI could not be reached, etc."""
+
+
+class BackendQueryError(RuntimeError):
+    """The backend ran, but failed on this query (a scope or dataset that does not
+    exist, say) - another query may well work."""
+
+
+def is_backend_failure(e: BaseException) -> bool:
+    """True if `e` says the backend is down, rather than that one query was bad.
+
+    Only these count towards opening a breaker: timeouts, errors starting the
+    process (`OSError`) and `BackendInfrastructureError`. Per-query errors -
+    `BackendQueryError`, output that was too large, anything raised parsing the
+    result - do not, so a client asking bad questions can't shut the backend off
+    for everyone else.
+    """
+    return isinstance(e, (TimeoutError, OSError, BackendInfrastructureError))
+
+
+class BreakerStats(BaseModel):
+    backend: str = Field(description="Backend name")
+    state: str = Field(description="closed (normal), open (failing fast), half_open")
+    consecutive_failures: int = Field(description="Failed calls since the last success")
+    last_error: str = Field(default="", description="The most recent failure")
+    retry_in: float = Field(
+        default=0.0, description="Seconds until a probe call is let through, if open"
+    )
+
+
+class CircuitBreaker:
+    """Stops calls to a backend that keeps failing.
+
+    After `failure_threshold` failures in a row the breaker opens, and calls fail
+    straight away with `BackendUnavailableError` instead of starting a process that
+    will fail too. Once `reset_timeout` seconds have passed a single call is let
+    through as a probe (half open): if it works the breaker closes, otherwise it
+    opens for another `reset_timeout`.
+
+    Only backend failures (see `is_backend_failure`) are counted. Other errors, and
+    cancelled calls, say nothing about the backend and leave the breaker as it is.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._last_error = ""
+
+    def check(self) -> None:
+        """Raise `BackendUnavailableError` if a call would fail fast right now. Use it
+        to skip queueing for a backend that is down."""
+        self._before(probe=False)
+
+    @contextmanager
+    def guard(self) -> Iterator[None]:
+        "Run a backend call inside - raises `BackendUnavailableError` if it is open"
+        self._before(probe=True)
+        try:
+            yield
+        except deadlines.BackendCancelledError:
+            self._inconclusive()
+            raise
+        except Exception as e:
+            if is_backend_failure(e):
+                self._failure(e)
+            else:
+                self._inconclusive()
+            raise
+        self._success()
+
+    def _retry_in(self) -> float:
+        return max(0.0, self._opened_at + self.reset_timeout - time.monotonic())
+
+    def _before(self, probe: bool) -> None:
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and self._retry_in() == 0:
+                if probe:
+                    self._state = HALF_OPEN
+                return
+            # (half open: another call is probing, it won't be long)
+            retry_in = self._retry_in() if self._state == OPEN else 1.0
+            raise BackendUnavailableError(
+                f"The {self.name} backend is unavailable ({self._failures} failures "
+                f"in a row, last: {self._last_error}). Not retrying for "
+                f"{retry_in:.0f}s - check the WSL distro is running and the grid "
+                "proxy is valid (voms-proxy-init).",
+                retry_after=retry_in,
+            )
+
+    def _success(self) -> None:
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+
+    def _failure(self, e: Exception) -> None:
+        with self._lock:
+            self._failures += 1
+            message = str(e).strip()
+            self._last_error = (
+                message.splitlines()[0][:200] if message else type(e).__name__
+            )
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def _inconclusive(self) -> None:
+        with self._lock:
+            # A cancelled probe, or one that failed on its query, proves nothing -
+            # let the next call probe instead
+            if self._state == HALF_OPEN:
+                self._state = OPEN
+                self._opened_at = time.monotonic() - self.reset_timeout
+
+    def stats(self) -> BreakerStats:
+        with self._lock:
+            return BreakerStats(
+                backend=self.name,
+                state=self._state,
+                consecutive_failures=self._failures,
+                last_error=self._last_error,
+                retry_in=self._retry_in() if self._state == OPEN else 0.0,
+            )
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """The circuit breaker for backend `name`, created on first use.
+
+    Settings come from ATLAS_MCP_<NAME>_FAILURE_THRESHOLD (default 3) and
+    ATLAS_MCP_<NAME>_RESET_TIMEOUT (seconds, default 30).
+    """
+    with _breakers_lock:
+        b = _breakers.get(name)
+        if b is None:
+            prefix = f"ATLAS_MCP_{name.upper()}_"
+            b = CircuitBreaker(
+                name,
+                failure_threshold=int(os.environ.get(prefix + "FAILURE_THRESHOLD", 3)),
+                reset_timeout=float(os.environ.get(prefix + "RESET_TIMEOUT", 30)),
+            )
+            _breakers[name] = b
+        return b
+
+
+def all_stats() -> List[BreakerStats]:
+    "Stats for every backend that has been used"
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return [b.stats() for b in breakers]
+
+
+def reset(name: Optional[str] = None) -> None:
+    "Forget the breaker for `name` (or all of them), closing it"
+    with _breakers_lock:
+        if name is None:
+            _breakers.clear()
+        else:
+            _breakers.pop(name, None)
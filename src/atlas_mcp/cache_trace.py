@@ -0,0 +1,347 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Union,
+)
+
+from pydantic import BaseModel, Field
+
+# Every memoized lookup is appended to ATLAS_MCP_CACHE_TRACE_FILE, one JSON array per
+# line:
+#   [unix time, function, key, hit (0/1), value size in bytes, call time in ms]
+# `key` is a hash of the full cache key, so the trace holds no dataset names. The
+# call time of a miss is what the backend cost. The size is only measured on a miss
+# (0 for a hit). Nothing is recorded if it is not set (or `configure` has not been
+# called).
+#
+# `simulate` replays a trace against other cache sizes, eviction policies and TTLs
+# (`atlas-mcp cache simulate`).
+POLICIES = ("lru", "lfu", "fifo")
+
+
+class Access(NamedTuple):
+    time: float
+    function: str
+    key: str
+    hit: bool
+    size: int
+    latency_ms: float
+
+
+class TraceWriter:
+    "Appends cache accesses to a file"
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def write(self, access: Access) -> None:
+        line = json.dumps(
+            [
+                round(access.time, 3),
+                access.function,
+                access.key,
+                int(access.hit),
+                access.size,
+                round(access.latency_ms, 3),
+            ],
+            separators=(",", ":"),
+        )
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+_writer: Optional[TraceWriter] = (
+    TraceWriter(os.environ["ATLAS_MCP_CACHE_TRACE_FILE"])
+    if os.environ.get("ATLAS_MCP_CACHE_TRACE_FILE")
+    else None
+)
+
+
+def configure(path: Optional[Union[str, Path]]) -> None:
+    "Record cache accesses to `path` from now on, or stop if it is None"
+    global _writer
+    _writer = TraceWriter(path) if path is not None else None
+
+
+def enabled() -> bool:
+    return _writer is not None
+
+
+def normalized_key(key: Any) -> str:
+    "A short, stable stand-in for a cache key"
+    return hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+
+
+def _size(value: Any) -> int:
+    # Roughly what the value takes in the (pickling) disk cache
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+class Lookup:
+    "A call to a memoized function: a hit unless the function itself had to run"
+
+    __slots__ = ("hit", "value")
+
+    def __init__(self):
+        self.hit = True
+        self.value: Any = None
+
+
+_lookup: ContextVar[Optional[Lookup]] = ContextVar(
+    "atlas_mcp_cache_lookup", default=None
+)
+
+
+@contextmanager
+def lookup() -> Iterator[Lookup]:
+    """Find out whether the memoized call made in the block is a cache hit, without
+    a second cache read. The function must be wrapped in `detects_misses` under its
+    `cache.memoize()`. Nested wrappers of the same call (`tracing.traced_cache` and
+    `recorded`) share one `Lookup`.
+    """
+    current = _lookup.get()
+    if current is not None:
+        yield current
+        return
+    token = _lookup.set(Lookup())
+    try:
+        yield _lookup.get()  # type: ignore[misc]
+    finally:
+        _lookup.reset(token)
+
+
+def detects_misses(fn: Callable) -> Callable:
+    """Go under `cache.memoize()`: memoize only calls `fn` on a miss, so this is
+    where the `lookup` in progress learns it was one (and gets the value)."""
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        current = _lookup.get()
+        if current is None:
+            return fn(*args, **kwargs)
+        current.hit = False
+        # Memoized calls made by `fn` are lookups of their own
+        token = _lookup.set(None)
+        try:
+            current.value = fn(*args, **kwargs)
+        finally:
+            _lookup.reset(token)
+        return current.value
+
+    return wrapper
+
+
+def recorded(cache: Any) -> Callable[[Callable], Callable]:
+    """Record each call to a `cache.memoize()` function in the access trace.
+
+    The function must be wrapped in `detects_misses` under its `cache.memoize()`.
+    The memoized function's `__cache_key__` and `__wrapped__` are kept, so this can
+    go under `tracing.traced_cache`.
+    """
+
+    def decorate(memoized: Callable) -> Callable:
+        name = memoized.__name__
+
+        @functools.wraps(memoized)
+        def wrapper(*args, **kwargs):
+            writer = _writer
+            if writer is None:
+                return memoized(*args, **kwargs)
+            key = memoized.__cache_key__(*args, **kwargs)  # type: ignore
+            with lookup() as call:
+                start = time.perf_counter()
+                value = memoized(*args, **kwargs)
+                latency_ms = (time.perf_counter() - start) * 1000.0
+                writer.write(
+                    Access(
+                        time.time(),
+                        name,
+                        normalized_key(key),
+                        call.hit,
+                        0 if call.hit else _size(call.value),
+                        latency_ms,
+                    )
+                )
+            return value
+
+        wrapper.__cache_key__ = memoized.__cache_key__  # type: ignore[attr-defined]
+        wrapper.__wrapped__ = memoized.__wrapped__  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorate
+
+
+def read_trace(path: Union[str, Path]) -> List[Access]:
+    "The accesses recorded in a trace file, skipping lines that can't be read"
+    accesses = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                t, function, key, hit, size, latency_ms = json.loads(line)
+            except ValueError:
+                continue
+            accesses.append(
+                Access(float(t), function, key, bool(hit), int(size), float(latency_ms))
+            )
+    return accesses
+
+
+class SimulationResult(BaseModel):
+    max_bytes: Optional[int] = Field(description="Cache size (None for unbounded)")
+    policy: str = Field(description="Eviction policy")
+    ttl: Optional[float] = Field(description="Entry lifetime in seconds (None: never)")
+    requests: int = Field(description="Lookups replayed")
+    hits: int = Field(description="Lookups served from the simulated cache")
+    hit_rate: float = Field(description="hits / requests")
+    backend_seconds: float = Field(description="Backend time spent on the misses")
+    saved_seconds: float = Field(description="Backend time the hits saved")
+    evictions: int = Field(description="Entries evicted to make room")
+
+
+def _per_key(
+    accesses: Iterable[Access], measure: Callable[[Access], float]
+) -> Dict[str, float]:
+    "The mean of `measure` over each key's misses, or over its function's"
+    by_key: Dict[str, List[float]] = defaultdict(list)
+    by_function: Dict[str, List[float]] = defaultdict(list)
+    functions: Dict[str, str] = {}
+    for a in accesses:
+        functions[a.key] = a.function
+        if not a.hit:
+            by_key[a.key].append(measure(a))
+            by_function[a.function].append(measure(a))
+
+    def mean(values: List[float]) -> float:
+        return sum(values) / len(values) if values else 0.0
+
+    return {
+        key: mean(by_key[key]) if by_key.get(key) else mean(by_function[function])
+        for key, function in functions.items()
+    }
+
+
+def backend_latencies(accesses: Iterable[Access]) -> Dict[str, float]:
+    """What a miss of each key costs, in ms: the mean of its recorded misses, or
+    (for keys only ever seen as hits) the mean miss of its function."""
+    return _per_key(accesses, lambda a: a.latency_ms)
+
+
+def value_sizes(accesses: Iterable[Access]) -> Dict[str, int]:
+    """The size of each key's value in bytes, as measured on its misses, or (for
+    keys only ever seen as hits - their size is not measured) the mean of its
+    function's."""
+    return {k: round(v) for k, v in _per_key(accesses, lambda a: a.size).items()}
+
+
+def simulate(
+    accesses: List[Access],
+    max_bytes: Optional[int] = None,
+    policy: str = "lru",
+    ttl: Optional[float] = None,
+    latencies: Optional[Dict[str, float]] = None,
+    sizes: Optional[Dict[str, int]] = None,
+) -> SimulationResult:
+    """Replay an access trace against a cache of `max_bytes` with the given eviction
+    policy and entry lifetime.
+
+    The simulated cache starts empty, so the first lookup of every key is a miss
+    whatever the trace says. A miss costs the key's backend time (see
+    `backend_latencies`); a hit saves it.
+
+    Args:
+        accesses (List[Access]): The trace, in time order
+        max_bytes (int, optional): Cache size - unbounded if not given
+        policy (str): One of `POLICIES` - least recently used, least frequently used
+            or first in first out
+        ttl (float, optional): Entries expire this many seconds after they are
+            stored - never if not given
+        latencies (Dict[str, float], optional): Key -> backend time in ms, if
+            already worked out
+        sizes (Dict[str, int], optional): Key -> value size (see `value_sizes`), if
+            already worked out
+
+    Returns:
+        SimulationResult: Hit rate and backend time of the configuration
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy `{policy}` - must be one of {POLICIES}")
+    if latencies is None:
+        latencies = backend_latencies(accesses)
+    if sizes is None:
+        sizes = value_sizes(accesses)
+
+    # key -> (size, stored at); the order is the eviction order for lru and fifo
+    entries: "OrderedDict[str, tuple]" = OrderedDict()
+    uses: Dict[str, int] = defaultdict(int)
+    used = 0
+    hits = evictions = 0
+    backend_ms = saved_ms = 0.0
+
+    def drop(key: str) -> None:
+        nonlocal used
+        size, _ = entries.pop(key)
+        used -= size
+        uses.pop(key, None)
+
+    for a in accesses:
+        entry = entries.get(a.key)
+        if entry is not None and ttl is not None and a.time - entry[1] > ttl:
+            drop(a.key)
+            entry = None
+        if entry is not None:
+            hits += 1
+            saved_ms += latencies.get(a.key, 0.0)
+            uses[a.key] += 1
+            if policy == "lru":
+                entries.move_to_end(a.key)
+            continue
+
+        backend_ms += latencies.get(a.key, 0.0)
+        size = sizes.get(a.key, a.size)
+        if max_bytes is not None and size > max_bytes:
+            continue
+        while max_bytes is not None and entries and used + size > max_bytes:
+            if policy == "lfu":
+                victim = min(entries, key=lambda k: uses[k])
+            else:
+                victim = next(iter(entries))
+            drop(victim)
+            evictions += 1
+        entries[a.key] = (size, a.time)
+        uses[a.key] = 1
+        used += size
+
+    return SimulationResult(
+        max_bytes=max_bytes,
+        policy=policy,
+        ttl=ttl,
+        requests=len(accesses),
+        hits=hits,
+        hit_rate=hits / len(accesses) if accesses else 0.0,
+        backend_seconds=backend_ms / 1000.0,
+        saved_seconds=saved_ms / 1000.0,
+        evictions=evictions,
+    )
@@ -0,0 +1,101 @@
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from atlas_mcp.did_parser import parse_did, split_tags
+
+# Which simulation (s/a) and reconstruction (r) AMI tags make up each MC campaign,
+# per short scope. Kept in step with the PMG central page definitions (see also
+# `scripts/dsid_finder/utils.py`).
+SCOPE_TAGS: Dict[str, Dict[str, Dict[str, List[str]]]] = {
+    "mc16": {
+        "sim": {"FS": ["s3126"], "AF2": ["a875"]},
+        "reco": {"mc16a": ["r9364"], "mc16d": ["r10201"], "mc16e": ["r10724"]},
+    },
+    "mc20": {
+        "sim": {"FS": ["s3681", "s4231", "s3797"], "AF2": ["a907"]},
+        "reco": {
+            "mc20a": ["r13167", "r14859"],
+            "mc20d": ["r13144", "r14860"],
+            "mc20e": ["r13145", "r14861"],
+        },
+    },
+    "mc23": {
+        "sim": {"FS": ["s4162", "s4159", "s4369"], "AF3": ["a910", "a911", "a934"]},
+        "reco": {
+            "mc23a": ["r15540", "r14622"],
+            "mc23d": ["r15530", "r15224"],
+            "mc23e": ["r16083"],
+        },
+    },
+}
+
+
+class Campaign(BaseModel):
+    model_config = {"frozen": True}
+
+    period: str = Field(description="MC campaign - mc20a, mc23e, etc.")
+    sim_type: str = Field(description="Simulation type - FS, AF2, AF3")
+
+
+def _build_index(section: str) -> Dict[str, Tuple[str, str]]:
+    "tag -> (short scope, simulation type or campaign)"
+    index = {}
+    for scope_short, tags in SCOPE_TAGS.items():
+        for value, tag_list in tags[section].items():
+            for tag in tag_list:
+                index[tag] = (scope_short, value)
+    return index
+
+
+# Built once, at import: tag -> (short scope, sim type) and tag -> (short scope, period)
+SIM_TAG_INDEX = _build_index("sim")
+RECO_TAG_INDEX = _build_index("reco")
+
+
+def _lookup(tags: str, index: Dict[str, Tuple[str, str]]) -> Optional[Tuple[str, str]]:
+    # Merged productions carry several tags of a kind; the first known one wins.
+    for tag in tags.split("_"):
+        found = index.get(tag)
+        if found is not None:
+            return found
+    return None
+
+
+def campaign_for_tags(tags: str) -> Optional[Campaign]:
+    """The campaign for an AMI tag string (e.g. `e8514_s4369_r16083_p6697`).
+
+    Returns None unless both a known simulation (s or a) tag and a known
+    reconstruction (r) tag from the same scope are present.
+    """
+    split = split_tags(tags)
+    sim = _lookup(
+        "_".join(filter(None, (split.get("s"), split.get("a")))), SIM_TAG_INDEX
+    )
+    reco = _lookup(split.get("r", ""), RECO_TAG_INDEX)
+    if sim is None or reco is None or sim[0] != reco[0]:
+        return None
+    return Campaign(period=reco[1], sim_type=sim[1])
+
+
+def campaign_for_did(name: str) -> Optional[Campaign]:
+    """The campaign of a rucio dataset, from the AMI tags in its name, or None if it
+    is not part of a known campaign."""
+    parsed = parse_did(name)
+    if parsed is None:
+        return None
+    return campaign_for_tags(parsed.tags)
+
+
+def matches(campaign: Optional[Campaign], period: str = "", sim_type: str = "") -> bool:
+    """True if `campaign` satisfies the filters. `period` may be a prefix - `mc23`
+    matches `mc23a`, `mc23d`, etc. Empty filters match anything (including None)."""
+    if not period and not sim_type:
+        return True
+    if campaign is None:
+        return False
+    if period and not campaign.period.lower().startswith(period.lower()):
+        return False
+    if sim_type and campaign.sim_type.lower() != sim_type.lower():
+        return False
+    return True
@@ -0,0 +1,279 @@
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from pydantic import BaseModel, Field
+
+from atlas_mcp.did_parser import parse_did
+from atlas_mcp.fuzzy_search import expand_query_groups
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    id INTEGER PRIMARY KEY,
+    scope TEXT NOT NULL,
+    name TEXT NOT NULL UNIQUE,
+    tier TEXT NOT NULL,
+    run_number TEXT NOT NULL,
+    campaign TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS datasets_run ON datasets (scope, run_number);
+CREATE TABLE IF NOT EXISTS runs (
+    scope TEXT NOT NULL,
+    run_number TEXT NOT NULL,
+    physics_short TEXT NOT NULL,
+    description TEXT NOT NULL,
+    PRIMARY KEY (scope, run_number)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS datasets_fts USING fts5 (
+    name, physics_short, description
+);
+"""
+
+
+class DatasetRecord(BaseModel):
+    scope: str = Field(description="Data scope name")
+    name: str = Field(description="Rucio dataset name")
+    tier: str = Field(description="Data tier - EVNT, AOD, DAOD_PHYSLITE, etc.")
+    run_number: str = Field(description="Run number (DSID)")
+    campaign: str = Field(default="", description="MC campaign, if known")
+    physics_short: str = Field(default="", description="Physics short name, if known")
+    description: str = Field(default="", description="Physics comment, if known")
+
+
+def normalize_tier(tier: str) -> str:
+    """Map the short tier names the tools accept (`PHYSLITE`) to the name used
+    in dataset names (`DAOD_PHYSLITE`)."""
+    tier = tier.upper()
+    if tier in ("PHYS", "PHYSLITE"):
+        return f"DAOD_{tier}"
+    return tier
+
+
+def _split_name(name: str) -> Optional[tuple]:
+    "Pull (run_number, tier) out of a dataset name, None if it isn't one"
+    parsed = parse_did(name)
+    if parsed is None:
+        return None
+    return parsed.dsid, parsed.tier
+
+
+def _fts_prefix(term: str) -> str:
+    "An FTS5 prefix query for `term`, quoted so it is never read as syntax"
+    return '"' + term.replace('"', '""') + '"*'
+
+
+class CatalogIndex:
+    """Local SQLite full-text index over every dataset the server has seen.
+
+    Dataset names come from the EVNT and per-run sample listings; the physics short
+    name and description are filled in (per run) as metadata is fetched. Everything
+    is keyed, so re-recording the same results is cheap and idempotent.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as db, db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self._path, timeout=30)
+        db.row_factory = sqlite3.Row
+        return db
+
+    @staticmethod
+    def _reindex(db: sqlite3.Connection, dataset_id: int):
+        "Bring the full text row for a dataset in line with its tables"
+        row = db.execute(
+            "SELECT d.name, r.physics_short, r.description FROM datasets d "
+            "LEFT JOIN runs r ON r.scope = d.scope AND r.run_number = d.run_number "
+            "WHERE d.id = ?",
+            (dataset_id,),
+        ).fetchone()
+        db.execute("DELETE FROM datasets_fts WHERE rowid = ?", (dataset_id,))
+        db.execute(
+            "INSERT INTO datasets_fts (rowid, name, physics_short, description) "
+            "VALUES (?, ?, ?, ?)",
+            (dataset_id, row[0], row[1] or "", row[2] or ""),
+        )
+
+    def record_datasets(
+        self,
+        scope: str,
+        names: Iterable[str],
+        campaigns: Optional[Dict[str, str]] = None,
+    ) -> int:
+        """Add dataset names to the index.
+
+        Args:
+            scope (str): Scope the datasets belong to
+            names (Iterable[str]): Rucio dataset names
+            campaigns (Dict[str, str], optional): Campaign for some or all of the names
+
+        Returns:
+            int: Number of datasets that were new to the index
+        """
+        campaigns = campaigns or {}
+        added = 0
+        with closing(self._connect()) as db, db:
+            for name in names:
+                split = _split_name(name)
+                if split is None:
+                    continue
+                run_number, tier = split
+                campaign = campaigns.get(name, "")
+                existing = db.execute(
+                    "SELECT id FROM datasets WHERE name = ?", (name,)
+                ).fetchone()
+                if existing is not None:
+                    if campaign:
+                        db.execute(
+                            "UPDATE datasets SET campaign = ? WHERE id = ?",
+                            (campaign, existing[0]),
+                        )
+                    continue
+                cursor = db.execute(
+                    "INSERT INTO datasets (scope, name, tier, run_number, campaign) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (scope, name, tier, run_number, campaign),
+                )
+                self._reindex(db, cursor.lastrowid)  # type: ignore[arg-type]
+                added += 1
+        return added
+
+    def record_metadata(self, scope: str, name: str, metadata: Dict) -> None:
+        """Attach the physics short name and description from a metadata lookup to
+        every dataset of the same run.
+
+        Args:
+            scope (str): Scope name
+            name (str): Dataset the metadata was fetched for
+            metadata (Dict): Metadata as returned by `get_metadata`
+        """
+        split = _split_name(name)
+        if split is None:
+            return
+        run_number = split[0]
+        physics_short = str(metadata.get("Physics Short Name") or "")
+        description = str(metadata.get("Physics Comment") or "")
+        if description == "NULL":
+            description = ""
+
+        with closing(self._connect()) as db, db:
+            db.execute(
+                "INSERT INTO runs (scope, run_number, physics_short, description) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (scope, run_number) DO UPDATE SET "
+                "physics_short = excluded.physics_short, "
+                "description = excluded.description",
+                (scope, run_number, physics_short, description),
+            )
+            ids = db.execute(
+                "SELECT id FROM datasets WHERE scope = ? AND run_number = ?",
+                (scope, run_number),
+            ).fetchall()
+            for (dataset_id,) in ids:
+                self._reindex(db, dataset_id)
+
+        self.record_datasets(scope, [name])
+
+    def search(
+        self, scope: str, query: str, tier: str = "", limit: int = 50
+    ) -> List[DatasetRecord]:
+        """Full text search of the index.
+
+        Every query term must match (as a prefix) somewhere in the dataset name,
+        physics short name or description. Synonyms are expanded as for the
+        hashtag search - a word with several synonyms matches if any one of them
+        does. Results are ranked with BM25.
+
+        Args:
+            scope (str): Scope to search
+            query (str): Free-form query
+            tier (str): Only return datasets of this tier ("" for any)
+            limit (int): Maximum number of results
+
+        Returns:
+            List[DatasetRecord]: Matching datasets, best first
+        """
+        groups = expand_query_groups(query)
+        if not groups:
+            return []
+        match = " AND ".join(
+            "(" + " OR ".join(_fts_prefix(t) for t in dict.fromkeys(g)) + ")"
+            for g in groups
+        )
+
+        sql = (
+            "SELECT d.scope, d.name, d.tier, d.run_number, d.campaign, "
+            "r.physics_short, r.description FROM datasets_fts f "
+            "JOIN datasets d ON d.id = f.rowid "
+            "LEFT JOIN runs r ON r.scope = d.scope AND r.run_number = d.run_number "
+            "WHERE datasets_fts MATCH ? AND d.scope = ?"
+        )
+        params: list = [match, scope]
+        if tier:
+            sql += " AND d.tier = ?"
+            params.append(normalize_tier(tier))
+        sql += " ORDER BY bm25(datasets_fts) LIMIT ?"
+        params.append(limit)
+
+        with closing(self._connect()) as db:
+            rows = db.execute(sql, params).fetchall()
+
+        return [
+            DatasetRecord(
+                scope=r["scope"],
+                name=r["name"],
+                tier=r["tier"],
+                run_number=r["run_number"],
+                campaign=r["campaign"],
+                physics_short=r["physics_short"] or "",
+                description=r["description"] or "",
+            )
+            for r in rows
+        ]
+
+    def dump(self) -> Dict[str, List[tuple]]:
+        """All rows of the index, for snapshots.
+
+        Returns:
+            Dict[str, List[tuple]]: `datasets` and `runs` rows
+        """
+        with closing(self._connect()) as db:
+            datasets = db.execute(
+                "SELECT scope, name, tier, run_number, campaign FROM datasets"
+            ).fetchall()
+            runs = db.execute(
+                "SELECT scope, run_number, physics_short, description FROM runs"
+            ).fetchall()
+        return {
+            "datasets": [tuple(r) for r in datasets],
+            "runs": [tuple(r) for r in runs],
+        }
+
+    def load(self, rows: Dict[str, List[tuple]]) -> None:
+        """Bulk load rows produced by `dump`, merging with what is already indexed.
+
+        Args:
+            rows (Dict[str, List[tuple]]): `datasets` and `runs` rows
+        """
+        with closing(self._connect()) as db, db:
+            db.executemany(
+                "INSERT INTO runs (scope, run_number, physics_short, description) "
+                "VALUES (?, ?, ?, ?) ON CONFLICT (scope, run_number) DO NOTHING",
+                rows.get("runs", []),
+            )
+            db.executemany(
+                "INSERT INTO datasets (scope, name, tier, run_number, campaign) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (name) DO NOTHING",
+                rows.get("datasets", []),
+            )
+            # Rebuild the full text rows in one go
+            db.execute("DELETE FROM datasets_fts")
+            db.execute(
+                "INSERT INTO datasets_fts (rowid, name, physics_short, description) "
+                "SELECT d.id, d.name, coalesce(r.physics_short, ''), "
+                "coalesce(r.description, '') FROM datasets d LEFT JOIN runs r "
+                "ON r.scope = d.scope AND r.run_number = d.run_number"
+            )
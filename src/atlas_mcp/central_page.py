@@ -1,12 +1,28 @@
 import os
 from pathlib import Path
-from typing import Any, List, Union, Dict, Tuple
+from typing import Any, Callable, List, Optional, Union, Dict, Tuple
 import base64
 import json
+import re
+import threading
+import time
+import uuid
 
 from diskcache import Cache
 from pydantic import BaseModel, Field
 
+from atlas_mcp import (
+    breaker,
+    cache_trace,
+    deadlines,
+    fuzzy_search,
+    scheduler,
+    streaming,
+    tracing,
+)
+from atlas_mcp.catalog_index import CatalogIndex, DatasetRecord
+from atlas_mcp.hashtag_store import HashtagStore
+
 # Cache location selection:
 # - If ATLAS_MCP_CACHE_DIR environment variable is set, use it (useful for tests/CI)
 # - Otherwise default to the user's home directory under `.atlas_mcp_cache` for
@@ -16,6 +32,10 @@ cache_dir = os.environ.get(
 )
 cache = Cache(cache_dir)
 
+# Full text index of every dataset that has passed through the tools, kept next to
+# the cache.
+catalog = CatalogIndex(Path(cache_dir) / "catalog_index.sqlite")
+
 
 class CentralPageAddress(BaseModel):
     model_config = {"frozen": True}
@@ -86,45 +106,94 @@ def run_ami_helper(
     distribution. We set up the ATLAS environment, lsetup centralpage, echo a start marker,
     then run `centralpage` with the provided args and return the output lines after the marker.
 
+    If a `streaming` listener is set, each output line after the start marker is
+    passed to it as soon as it is printed.
+
+    The output is read as it is printed: lines before the start marker are dropped,
+    a large result is spooled to a temporary file, and ami-helper is killed if it
+    prints more than `deadlines.max_output_bytes`.
+
     Args:
         args (List[str]): List of arguments to pass to the centralpage command
 
     Returns:
-        List[str]: List of output lines after the start marker, or all output lines if the marker
-        is not found.
+        List[str]: List of output lines after the start marker, or if the marker is
+        not found only the last output lines (`deadlines.pre_marker_tail_bytes`).
+
+    Raises:
+        deadlines.BackendOutputTooLargeError: ami-helper printed too much
     """
     # Build the command snippet to run inside WSL (after env setup)
     inner_cmd = "echo --start-- && uvx --python=3.11 ami-helper " + args
 
-    # Run inside the centralpage-configured environment.
-    stdout = run_on_wsl(inner_cmd, files=files)
-
-    lines = stdout.splitlines()
-    try:
-        start_index = lines.index("--start--") + 1
-        return lines[start_index:]
-    except ValueError:
-        # If the marker is not found, return all lines as a list
-        return lines
+    listener = streaming.listener()
+    after_marker = False
+
+    def send_to_listener(line: str) -> None:
+        nonlocal after_marker
+        if after_marker:
+            listener(line)  # type: ignore[misc]
+        elif line == "--start--":
+            after_marker = True
+
+    on_line = send_to_listener if listener is not None else None
+
+    # Run inside the centralpage-configured environment, once the AMI backend has a
+    # free slot (see `scheduler`) - unless it has been failing (see `breaker`).
+    with tracing.span("run_ami_helper", {"ami.args": args}) as span:
+        ami_breaker = breaker.get_breaker("ami")
+        if tracing.enabled():
+            span.set_attribute("breaker.state", ami_breaker.stats().state)
+        ami_breaker.check()
+        # Setup noise before the marker is dropped as it is read, and a runaway
+        # ami-helper is killed rather than filling memory (see `deadlines`).
+        with deadlines.bounded_output(start_marker="--start--") as output:
+            with scheduler.get_scheduler("ami").slot():
+                with ami_breaker.guard():
+                    run_on_wsl(inner_cmd, files=files, on_line=on_line)
+            if tracing.enabled():
+                span.set_attribute("ami.output_spooled", output.spooled)
+            return list(output.lines())
 
 
 def run_on_wsl(
     command: str,
     distro: str = "atlas_al9",
     files: Union[Dict[str, Union[str, Path]], None] = None,
+    on_line: Optional[Callable[[str], None]] = None,
 ) -> str:
     """Run an arbitrary shell command inside a WSL distro and return raw stdout.
 
+    The command runs under the current deadline (see `deadlines`). If it passes, or
+    the call is cancelled, the command is killed - both the local `wsl` process and
+    the process group it started inside the distro.
+
     Args:
         command (str): Shell command to run inside the WSL session.
         distro (str): WSL distribution name to use.
         files (Dict[str, Union[str, Path]], optional): Dictionary of files to copy to /tmp
             in WSL before running the command. Keys are filenames in /tmp, values can be
             strings (content) or Path objects (file paths to copy).
+        on_line (Callable, optional): Called with each line of stdout as soon as it
+            is printed (see `deadlines.run_process`).
 
     Returns:
         str: Raw stdout from the executed command.
+
+    Raises:
+        deadlines.BackendTimeoutError: The command ran past the deadline
+        deadlines.BackendCancelledError: The call was cancelled
     """
+    with tracing.span("run_on_wsl", {"wsl.distro": distro, "wsl.command": command}):
+        return _run_on_wsl(command, distro, files, on_line)
+
+
+def _run_on_wsl(
+    command: str,
+    distro: str,
+    files: Union[Dict[str, Union[str, Path]], None],
+    on_line: Optional[Callable[[str], None]],
+) -> str:
     import subprocess
 
     # If files are provided, copy them to /tmp in WSL first
@@ -154,26 +223,75 @@ def run_on_wsl(
                     "-c",
                     f"echo '{encoded_content}' | base64 -d > {wsl_path}",
                 ]
-                copy_result = subprocess.run(copy_cmd, capture_output=True, text=True)
+                copy_result = deadlines.run_process(
+                    copy_cmd, description=f"copy {filename} to WSL"
+                )
                 if copy_result.returncode != 0:
-                    raise RuntimeError(
+                    raise breaker.BackendInfrastructureError(
                         f"Failed to copy string content to WSL: {copy_result.stderr}"
                     )
 
-    cmd = ["wsl", "-d", distro, "bash", "-l", "-c", command]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    # Killing `wsl` does not stop what it started inside the distro, so run the
+    # command as its own session there, and leave its pid behind for `kill_remote`.
+    pid_file = f"/tmp/atlas_mcp_{uuid.uuid4().hex}.pid"
+    wrapped = f"echo $$ > {pid_file}; trap 'rm -f {pid_file}' EXIT; {command}"
+    cmd = ["wsl", "-d", distro, "setsid", "-w", "bash", "-l", "-c", wrapped]
+
+    def kill_remote():
+        subprocess.run(
+            [
+                "wsl",
+                "-d",
+                distro,
+                "bash",
+                "-c",
+                f"kill -KILL -- -$(cat {pid_file}) 2>/dev/null; rm -f {pid_file}",
+            ],
+            capture_output=True,
+            timeout=10,
+        )
+
+    result = deadlines.run_process(
+        cmd, description=command, on_kill=kill_remote, on_line=on_line
+    )
 
     if result.returncode != 0:
-        raise RuntimeError(
+        message = (
             f"command failed with return code {result.returncode}: {result.stderr}"
         )
+        if _is_infrastructure_failure(result.returncode, result.stderr):
+            raise breaker.BackendInfrastructureError(message)
+        raise breaker.BackendQueryError(message)
 
     # Return raw stdout; higher-level callers can choose to split/parse it.
     return result.stdout
 
 
+# Signs in a failed command's stderr that the environment is broken, not the query
+_INFRASTRUCTURE_ERRORS = re.compile(
+    r"proxy|voms|certificate|credential|expired|"
+    r"no distribution|wsl/|wslregister|"
+    r"connection (refused|reset|timed out)|could not resolve|name or service|"
+    r"temporary failure in name resolution|network is unreachable|"
+    r"command not found",
+    re.IGNORECASE,
+)
+
+
+def _is_infrastructure_failure(returncode: int, stderr: str) -> bool:
+    """True if a command run by `run_on_wsl` failed because WSL, the grid proxy, the
+    network or the tools are not working - rather than on its query."""
+    # 126/127: bash could not run the command; outside 0-255: `wsl` itself failed
+    if returncode in (126, 127) or not 0 <= returncode <= 255:
+        return True
+    return bool(_INFRASTRUCTURE_ERRORS.search(stderr or ""))
+
+
 def get_address_for_keyword(
-    scope: str, keywords: str | List[str]
+    scope: str,
+    keywords: str | List[str],
+    level3: str = "",
+    limit: Optional[int] = None,
 ) -> List[CentralPageAddress]:
     """Returns a CentralPageAddress object for a given scope and keyword.
 
@@ -181,37 +299,78 @@ def get_address_for_keyword(
     contains the given keyword. If found, it returns the corresponding
     CentralPageAddress object. If not found, it returns None.
 
+    Filtering runs against a `HashtagStore`; models are only built for the
+    addresses that are returned.
+
     Args:
         scope (str): Scope name
         keyword (str): Keyword to search for in hash tags
+        level3 (str): Only return addresses whose third tag is this (e.g. `Baseline`)
+        limit (int, optional): Return at most this many addresses
     """
 
     if isinstance(keywords, str):
         keywords = [keywords]
 
     # Get the keywords that match the first one, and then search those.
-    lines = run_ami_helper(f"hashtags find {scope} {keywords[0]}")
-    print(lines)
-    addresses = []
-    for ln in lines:
-        parts = ln.split()
-        if len(parts) != 4:
-            continue
-        addr = CentralPageAddress(
-            scope=scope,
-            hash_tags=tuple(parts),
-        )
-        addresses.append(addr)
+    fresh = True
+    try:
+        lines = run_ami_helper(f"hashtags find {scope} {keywords[0]}")
+    except breaker.BackendUnavailableError:
+        # Serve what we have seen before, if anything
+        known = cache.get(("fuzzy_search", scope, "addresses"), [])
+        if not known:
+            raise
+        lines = [" ".join(tags) for tags in known]
+        fresh = False
+    store = HashtagStore.from_lines(lines)
+
+    rows = store.select(keywords, level3=level3)
+    if limit is not None:
+        rows = rows[:limit]
+    matches = [
+        CentralPageAddress.model_construct(scope=scope, hash_tags=store.row(r))
+        for r in rows
+    ]
+
+    if fresh:
+        record_addresses(scope, store.rows())
 
-    def has_keyword(addr: CentralPageAddress, keyword: str) -> bool:
-        return any(keyword.lower() in t.lower() for t in addr.hash_tags)
+    return matches
 
-    matches = [a for a in addresses if all(has_keyword(a, kw) for kw in keywords)]
 
-    return matches
+class RefreshResult(BaseModel):
+    added: List[str] = Field(description="Datasets that are new since the last sync")
+    total: int = Field(description="Number of datasets in the merged listing")
+    synced_at: float = Field(description="Time of this sync (epoch seconds)")
+    previous_sync: Optional[float] = Field(
+        default=None, description="Time of the previous sync, if known"
+    )
+    stale: bool = Field(
+        default=False,
+        description="The backend is unavailable - this is the cached listing, unsynced",
+    )
+
+
+def _sync_key(fn, *args) -> tuple:
+    return ("catalog_sync",) + fn.__cache_key__(*args)
+
 
+def _mark_synced(fn, *args) -> None:
+    cache.set(_sync_key(fn, *args), time.time())
 
+
+def last_synced(fn, *args) -> Optional[float]:
+    """When the cached listing of a memoized function (`get_evtgen_for_address`,
+    `get_samples_for_run`) was last fetched from the backend, or None if unknown.
+    """
+    return cache.get(_sync_key(fn, *args))
+
+
+@tracing.traced_cache(cache)
+@cache_trace.recorded(cache)
 @cache.memoize()
+@cache_trace.detects_misses
 def get_evtgen_for_address(cpa: CentralPageAddress) -> List[str]:
     """Returns a list of EVTGEN sample names for a given CentralPageAddress.
 
@@ -220,10 +379,17 @@ def get_evtgen_for_address(cpa: CentralPageAddress) -> List[str]:
     """
     cmd_args = [*["datasets", "with-hashtags"], f"{cpa.scope}", *cpa.hash_tags]
     output = run_ami_helper(" ".join(cmd_args))
+    record_samples(cpa, output)
+    catalog.record_datasets(cpa.scope, output)
+    _mark_synced(get_evtgen_for_address, cpa)
+    catalog_changed(cpa.scope, cpa.hash_tags)
     return output
 
 
+@tracing.traced_cache(cache)
+@cache_trace.recorded(cache)
 @cache.memoize()
+@cache_trace.detects_misses
 def get_samples_for_run(scope: str, run_number: str, derivation: str) -> Dict[str, Any]:
     """Returns a list of rucio dataset names for a given EVTGEN sample.
 
@@ -250,10 +416,22 @@ def get_samples_for_run(scope: str, run_number: str, derivation: str) -> Dict[st
 
     d = json.loads(" ".join(lines))
 
+    if isinstance(d, list):
+        campaigns = {
+            row["dataset"]: row.get("campaign", "")
+            for row in d
+            if isinstance(row, dict) and "dataset" in row
+        }
+        catalog.record_datasets(scope, campaigns.keys(), campaigns=campaigns)
+
+    _mark_synced(get_samples_for_run, scope, run_number, derivation)
     return d
 
 
+@tracing.traced_cache(cache)
+@cache_trace.recorded(cache)
 @cache.memoize()
+@cache_trace.detects_misses
 def get_metadata(
     scope: str,
     full_dataset_name: str,
@@ -290,10 +468,17 @@ def get_metadata(
     # Join all lines and parse as JSON
     d = json.loads(" ".join(lines))
 
+    if isinstance(d, dict):
+        for ds in {target_ds, full_dataset_name}:
+            catalog.record_metadata(scope, ds, d)
+
     return d
 
 
+@tracing.traced_cache(cache)
+@cache_trace.recorded(cache)
 @cache.memoize()
+@cache_trace.detects_misses
 def get_provenance(scope: str, dataset_name: str) -> List[str]:
     """Returns the provenance chain for a given dataset.
 
@@ -309,3 +494,273 @@ def get_provenance(scope: str, dataset_name: str) -> List[str]:
     lines = run_ami_helper(f"datasets provenance {scope} {dataset_name}")
 
     return lines
+
+
+# In-memory fuzzy search indices, one per scope, built lazily from what has been
+# recorded in the disk cache (so they survive server restarts).
+_search_indices: Dict[str, fuzzy_search.FuzzyIndex] = {}
+# Held while an index is built and while recorded addresses and samples are added to
+# the cache and the indices, so an index built from the cache misses nothing.
+_search_lock = threading.RLock()
+
+# A hashtag search none of whose hits match a query term at least this well (trigram
+# similarity) is also sent to the backend - the index may not have seen it yet.
+search_confident_similarity = 0.6
+
+# Called (from whichever thread wrote the cache) when a cached catalog changes, with
+# the scope and the hashtag 4-tuple of an EVNT listing, the scope and None for its
+# hashtag list, or None and None when anything may have changed.
+_catalog_listeners: List[Callable[[Optional[str], Optional[Tuple[str, ...]]], None]] = (
+    []
+)
+
+
+def on_catalog_change(
+    callback: Callable[[Optional[str], Optional[Tuple[str, ...]]], None],
+) -> None:
+    "Have `callback` told whenever a cached catalog is written"
+    _catalog_listeners.append(callback)
+
+
+def catalog_changed(
+    scope: Optional[str] = None, hash_tags: Optional[Tuple[str, ...]] = None
+) -> None:
+    for callback in list(_catalog_listeners):
+        callback(scope, hash_tags)
+
+
+def _index_address(index: fuzzy_search.FuzzyIndex, scope: str, tags: Tuple[str, ...]):
+    index.add(("address", tags), " ".join(tags), ("address", scope, tags, None))
+
+
+def _index_sample(
+    index: fuzzy_search.FuzzyIndex, scope: str, name: str, tags: Tuple[str, ...]
+):
+    # Index the run number and physics short name, not the tags/tier boilerplate.
+    parts = name.split(".")
+    text = " ".join(parts[1:3]) if len(parts) > 2 else name
+    index.add(("sample", name), text, ("sample", scope, tags, name))
+
+
+def _get_search_index(scope: str) -> fuzzy_search.FuzzyIndex:
+    with _search_lock:
+        index = _search_indices.get(scope)
+        if index is None:
+            index = fuzzy_search.FuzzyIndex()
+            for tags in cache.get(("fuzzy_search", scope, "addresses"), []):
+                _index_address(index, scope, tuple(tags))
+            samples = cache.get(("fuzzy_search", scope, "samples"), {})
+            for name, tags in samples.items():
+                _index_sample(index, scope, name, tuple(tags))
+            _search_indices[scope] = index
+        return index
+
+
+def record_addresses(scope: str, hash_tags: List[Tuple[str, ...]]) -> None:
+    """Remember hashtag 4-tuples seen from the backend so they can be fuzzy searched.
+
+    Args:
+        scope (str): Scope the tuples belong to
+        hash_tags (List[Tuple[str, ...]]): The 4-tuples
+    """
+    # The scope's search index holds everything recorded, so the usual call -
+    # nothing new - is answered from memory, without a write to the disk cache
+    index = _get_search_index(scope)
+    if all(("address", tuple(t)) in index for t in hash_tags):
+        return
+
+    key = ("fuzzy_search", scope, "addresses")
+    with _search_lock, cache.transact():
+        known = set(cache.get(key, []))
+        new = [t for t in hash_tags if t not in known]
+        if new:
+            cache.set(key, sorted(known | set(new)))
+        # (the index may have been built before some of these were recorded)
+        index = _get_search_index(scope)
+        for tags in hash_tags:
+            _index_address(index, scope, tuple(tags))
+    if new:
+        catalog_changed(scope)
+
+
+def record_samples(cpa: CentralPageAddress, names: List[str]) -> None:
+    """Remember the EVNT samples found under an address so they can be fuzzy searched.
+
+    Args:
+        cpa (CentralPageAddress): Address the samples were listed for
+        names (List[str]): EVNT rucio dataset names
+    """
+    key = ("fuzzy_search", cpa.scope, "samples")
+    with _search_lock, cache.transact():
+        known = cache.get(key, {})
+        new = [n for n in names if n not in known]
+        if not new:
+            return
+        known.update({n: cpa.hash_tags for n in new})
+        cache.set(key, known)
+
+        index = _search_indices.get(cpa.scope)
+        if index is not None:
+            for name in new:
+                _index_sample(index, cpa.scope, name, cpa.hash_tags)
+    record_addresses(cpa.scope, [cpa.hash_tags])
+
+
+def search_datasets(
+    scope: str, query: str, tier: str = "", limit: int = 50
+) -> List[DatasetRecord]:
+    """Full text search over every dataset name, physics short name and description
+    that has passed through `get_evtgen_for_address`, `get_samples_for_run` and
+    `get_metadata`. This is purely local - no backend call is made.
+
+    Args:
+        scope (str): Scope name
+        query (str): Free-form query, e.g. "ttbar allhad"
+        tier (str): Only return this tier ("EVNT", "PHYSLITE", "DAOD_LLP1", ...), or
+            "" for any
+        limit (int): Maximum number of results
+
+    Returns:
+        List[DatasetRecord]: Matching datasets, best first
+    """
+    return catalog.search(scope, query, tier=tier, limit=limit)
+
+
+def search_hashtags(
+    scope: str, query: str, limit: Optional[int] = 20
+) -> List[fuzzy_search.SearchHit]:
+    """Ranked fuzzy search over the hashtag 4-tuples and EVNT physics short names
+    seen so far for a scope.
+
+    The query is expanded with a synonym table ("top pair" -> "ttbar", "W+jets" ->
+    "wjets", etc.), and each term is matched against the index allowing for typos
+    and plurals. Results are ranked with BM25. If no hit matches a query term well
+    (see `search_confident_similarity`) - e.g. nothing is known about the scope yet -
+    a backend hashtag search is run for each expanded query term (one backend call
+    per term), the results added to the index, and the search repeated.
+
+    Args:
+        scope (str): Scope name
+        query (str): Free-form query, e.g. "top pair allhad"
+        limit (Optional[int]): Maximum number of hits to return, None for all
+
+    Returns:
+        List[SearchHit]: Hits, best first
+    """
+    terms = fuzzy_search.expand_query(query)
+    index = _get_search_index(scope)
+    confident = index.search(terms, limit=1, min_similarity=search_confident_similarity)
+    if not confident:
+        for term in terms:
+            get_address_for_keyword(scope, term)
+
+    return [
+        fuzzy_search.SearchHit(
+            kind=kind, scope=hit_scope, hash_tags=tags, name=name, score=score
+        )
+        for (kind, hit_scope, tags, name), score in index.search(terms, limit=limit)
+    ]
+
+
+def refresh_evtgen_for_address(cpa: CentralPageAddress) -> RefreshResult:
+    """Re-list the EVNT samples for an address and merge new ones into the cached
+    listing, rather than replacing it.
+
+    Samples already in the cache are kept (even if the backend no longer lists
+    them); new ones are appended, recorded in the search indices, and returned in
+    `added` so callers only need to look at the delta. If the backend is
+    unavailable the cached listing is reported, marked `stale`.
+
+    Args:
+        cpa (CentralPageAddress): Address to refresh
+
+    Returns:
+        RefreshResult: The new samples and the sync times
+    """
+    key = get_evtgen_for_address.__cache_key__(cpa)
+    previous: List[str] = cache.get(key) or []
+    previous_sync = last_synced(get_evtgen_for_address, cpa)
+
+    try:
+        fresh = get_evtgen_for_address.__wrapped__(cpa)  # type: ignore[attr-defined]
+    except breaker.BackendUnavailableError:
+        if previous_sync is None:
+            raise
+        return RefreshResult(
+            added=[],
+            total=len(previous),
+            synced_at=previous_sync,
+            previous_sync=previous_sync,
+            stale=True,
+        )
+
+    known = set(previous)
+    added = [ds for ds in fresh if ds not in known]
+    merged = previous + added
+    cache.set(key, merged)
+    if added:
+        catalog_changed(cpa.scope, cpa.hash_tags)
+
+    return RefreshResult(
+        added=added,
+        total=len(merged),
+        synced_at=last_synced(get_evtgen_for_address, cpa) or time.time(),
+        previous_sync=previous_sync,
+    )
+
+
+def refresh_samples_for_run(
+    scope: str, run_number: str, derivation: str
+) -> RefreshResult:
+    """Re-list the samples of a run and merge new ones (typically new p-tags) into
+    the cached listing, rather than replacing it.
+
+    Rows already in the cache are kept, with their campaign updated if the backend
+    now reports one; new rows are appended and returned (by name) in `added`.
+
+    Args:
+        scope (str): Scope name
+        run_number (str): Run number
+        derivation (str): Derivation type, as for `get_samples_for_run`
+
+    Returns:
+        RefreshResult: The new datasets and the sync times
+    """
+    key = get_samples_for_run.__cache_key__(scope, run_number, derivation)
+    previous = cache.get(key)
+    previous_sync = last_synced(get_samples_for_run, scope, run_number, derivation)
+
+    try:
+        fresh = get_samples_for_run.__wrapped__(  # type: ignore[attr-defined]
+            scope, run_number, derivation
+        )
+    except breaker.BackendUnavailableError:
+        if previous_sync is None or previous is None:
+            raise
+        return RefreshResult(
+            added=[],
+            total=len(previous),
+            synced_at=previous_sync,
+            previous_sync=previous_sync,
+            stale=True,
+        )
+
+    if isinstance(previous, list) and isinstance(fresh, list):
+        rows = {r["dataset"]: r for r in previous}
+        added = [r["dataset"] for r in fresh if r["dataset"] not in rows]
+        for r in fresh:
+            if r["dataset"] not in rows or r.get("campaign"):
+                rows[r["dataset"]] = r
+        merged: Any = list(rows.values())
+    else:
+        merged = fresh
+        added = [r["dataset"] for r in fresh] if isinstance(fresh, list) else []
+    cache.set(key, merged)
+
+    return RefreshResult(
+        added=added,
+        total=len(merged),
+        synced_at=last_synced(get_samples_for_run, scope, run_number, derivation)
+        or time.time(),
+        previous_sync=previous_sync,
+    )
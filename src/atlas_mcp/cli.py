@@ -0,0 +1,166 @@
+import argparse
+from typing import List, Optional
+
+
+def _snapshot_export(args: argparse.Namespace) -> None:
+    from atlas_mcp.snapshot import export_snapshot
+
+    stats = export_snapshot(args.path)
+    print(f"Wrote {sum(stats.entries.values())} cache entries to {args.path}")
+    for kind, count in sorted(stats.entries.items()):
+        print(f"  {kind}: {count}")
+    print(f"  catalog datasets: {stats.catalog_datasets}")
+
+
+def _snapshot_import(args: argparse.Namespace) -> None:
+    from atlas_mcp.snapshot import import_snapshot
+
+    stats = import_snapshot(args.path, overwrite=args.overwrite)
+    print(f"Loaded {sum(stats.entries.values())} cache entries from {args.path}")
+    for kind, count in sorted(stats.entries.items()):
+        print(f"  {kind}: {count}")
+    print(f"  catalog datasets: {stats.catalog_datasets}")
+    if stats.skipped_expired:
+        print(f"  skipped (expired): {stats.skipped_expired}")
+
+
+_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def _parse_size(text: str) -> Optional[int]:
+    "`100M`, `2G`, `65536` - or `none` for unbounded"
+    text = text.strip().upper().removesuffix("B")
+    if text in ("NONE", ""):
+        return None
+    unit = text[-1] if text[-1] in _UNITS else ""
+    return int(float(text[: len(text) - len(unit)]) * _UNITS[unit])
+
+
+def _parse_ttl(text: str) -> Optional[float]:
+    "Seconds - or `none` for entries that never expire"
+    return None if text.strip().lower() in ("none", "") else float(text)
+
+
+def _parse_policies(text: str) -> List[str]:
+    from atlas_mcp.cache_trace import POLICIES
+
+    policies = [p.strip().lower() for p in text.split(",")]
+    unknown = [p for p in policies if p not in POLICIES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown policy {', '.join(unknown)} - use {', '.join(POLICIES)}"
+        )
+    return policies
+
+
+def _format_size(size: Optional[int]) -> str:
+    if size is None:
+        return "unbounded"
+    for unit in ("G", "M", "K"):
+        if size >= _UNITS[unit] and size % _UNITS[unit] == 0:
+            return f"{size // _UNITS[unit]}{unit}"
+    return str(size)
+
+
+def _cache_simulate(args: argparse.Namespace) -> None:
+    from atlas_mcp.cache_trace import (
+        backend_latencies,
+        read_trace,
+        simulate,
+        value_sizes,
+    )
+
+    accesses = read_trace(args.path)
+    latencies = backend_latencies(accesses)
+    sizes = value_sizes(accesses)
+    recorded_hits = sum(a.hit for a in accesses)
+    print(
+        f"{len(accesses)} lookups of {len(latencies)} keys, "
+        f"{sum(a.size for a in accesses if not a.hit) / 1024**2:.1f} MB missed; "
+        f"recorded hit rate {recorded_hits / len(accesses) if accesses else 0:.1%}"
+    )
+    print(
+        f"{'size':>10}  {'policy':<6}  {'ttl':>8}  {'hit rate':>8}  "
+        f"{'backend s':>10}  {'saved s':>10}  {'evictions':>9}"
+    )
+    for size in args.sizes:
+        for policy in args.policies:
+            for ttl in args.ttls:
+                r = simulate(
+                    accesses, size, policy, ttl, latencies=latencies, sizes=sizes
+                )
+                print(
+                    f"{_format_size(size):>10}  {policy:<6}  "
+                    f"{'never' if ttl is None else f'{ttl:g}':>8}  "
+                    f"{r.hit_rate:>8.1%}  {r.backend_seconds:>10.1f}  "
+                    f"{r.saved_seconds:>10.1f}  {r.evictions:>9}"
+                )
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="atlas-mcp", description="Tools for the atlas-mcp server"
+    )
+    commands = parser.add_subparsers(dest="command")
+
+    snapshot = commands.add_parser(
+        "snapshot", help="Export or import the server's cached catalog"
+    )
+    snapshot_commands = snapshot.add_subparsers(dest="snapshot_command", required=True)
+
+    export_cmd = snapshot_commands.add_parser(
+        "export", help="Write the cache and indices to a snapshot file"
+    )
+    export_cmd.add_argument("path", help="Snapshot file to write")
+    export_cmd.set_defaults(func=_snapshot_export)
+
+    import_cmd = snapshot_commands.add_parser(
+        "import", help="Load a snapshot file into the cache and indices"
+    )
+    import_cmd.add_argument("path", help="Snapshot file to read")
+    import_cmd.add_argument(
+        "--overwrite",
+        action="store_true",
+        help="Replace entries that are already in the local cache",
+    )
+    import_cmd.set_defaults(func=_snapshot_import)
+
+    cache = commands.add_parser("cache", help="Size and tune the cache")
+    cache_commands = cache.add_subparsers(dest="cache_command", required=True)
+
+    simulate_cmd = cache_commands.add_parser(
+        "simulate",
+        help="Replay a cache access trace (ATLAS_MCP_CACHE_TRACE_FILE) against "
+        "other cache configurations",
+    )
+    simulate_cmd.add_argument("path", help="Access trace to replay")
+    simulate_cmd.add_argument(
+        "--sizes",
+        type=lambda t: [_parse_size(s) for s in t.split(",")],
+        default=[None],
+        help="Comma separated cache sizes, e.g. 10M,100M,1G (default: unbounded)",
+    )
+    simulate_cmd.add_argument(
+        "--policies",
+        type=_parse_policies,
+        default=["lru"],
+        help="Comma separated eviction policies: lru, lfu, fifo (default: lru)",
+    )
+    simulate_cmd.add_argument(
+        "--ttls",
+        type=lambda t: [_parse_ttl(s) for s in t.split(",")],
+        default=[None],
+        help="Comma separated entry lifetimes in seconds, or none (default: none)",
+    )
+    simulate_cmd.set_defaults(func=_cache_simulate)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return
+    args.func(args)
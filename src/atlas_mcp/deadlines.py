@@ -0,0 +1,463 @@
+import asyncio
+import codecs
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Deque, Iterator, List, Optional, Tuple, TypeVar
+
+from atlas_mcp import profiling, tracing
+
+T = TypeVar("T")
+
+# How long a backend (ami-helper) call may run before it is killed, in seconds, when
+# nothing more specific has been set. A hung AMI/Rucio call, or a grid proxy prompt
+# waiting on a terminal that is not there, would otherwise block forever.
+default_timeout = float(os.environ.get("ATLAS_MCP_BACKEND_TIMEOUT", "300"))
+
+# How often a running backend process is checked for an expired deadline or a
+# cancellation.
+poll_interval = 0.2
+
+# Inside `bounded_output`: a process printing more than this much (in all, kept or
+# not) is killed, and output kept past `spool_bytes` goes to a temporary file rather
+# than memory. Only the end of stderr, and of the output before the start marker, is
+# kept - enough for an error message.
+max_output_bytes = int(os.environ.get("ATLAS_MCP_BACKEND_MAX_OUTPUT_MB", "256")) << 20
+spool_bytes = int(os.environ.get("ATLAS_MCP_BACKEND_SPOOL_MB", "8")) << 20
+stderr_tail_bytes = 64 << 10
+pre_marker_tail_bytes = (
+    int(os.environ.get("ATLAS_MCP_BACKEND_PRE_MARKER_TAIL_KB", "64")) << 10
+)
+
+# How much stdout is read at a time when it is streamed.
+read_chunk_bytes = 64 << 10
+
+# The deadline (time.monotonic()) and the cancel flags of the current call. Both are
+# context variables, so they follow the call into threads started with
+# `asyncio.to_thread`.
+_deadline: ContextVar[Optional[float]] = ContextVar("atlas_mcp_deadline", default=None)
+_cancel: ContextVar[Tuple[threading.Event, ...]] = ContextVar(
+    "atlas_mcp_cancel", default=()
+)
+
+
+class BackendTimeoutError(TimeoutError):
+    "A backend call ran past its deadline and was killed"
+
+
+class BackendCancelledError(RuntimeError):
+    "A backend call was killed because the request that made it was cancelled"
+
+
+class BackendOutputTooLargeError(RuntimeError):
+    "A backend call printed more than `max_output_bytes` and was killed"
+
+
+class BoundedOutput:
+    """The stdout of the processes run inside `bounded_output`, taken a chunk at a
+    time as it is read.
+
+    Lines up to and including `start_marker` are dropped (only the last
+    `pre_marker_tail_bytes` are kept, in case it never comes); the rest is kept in
+    memory, then - past `spool_bytes` - in a temporary file, so it can be read back
+    a line at a time.
+    """
+
+    def __init__(
+        self,
+        start_marker: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        spool: Optional[int] = None,
+    ):
+        self.start_marker = start_marker
+        self.max_bytes = max_output_bytes if max_bytes is None else max_bytes
+        self.bytes_read = 0
+        self.started = start_marker is None
+        self._file = tempfile.SpooledTemporaryFile(
+            max_size=spool_bytes if spool is None else spool,
+            mode="w+",
+            encoding="utf-8",
+            newline="",
+        )
+        self._before: Deque[str] = deque()
+        self._before_bytes = 0
+        # The unfinished last line before the marker, and whether it was cut short
+        self._partial = ""
+        self._partial_cut = False
+
+    def feed(self, text: str, size: int) -> bool:
+        """Take the next piece of output, `size` bytes long as read. False once more
+        than `max_bytes` were read - checked on every piece, so a single runaway
+        line is caught too."""
+        self.bytes_read += size
+        if self.bytes_read > self.max_bytes:
+            return False
+        if self.started:
+            self._file.write(text)
+            return True
+
+        text = self._partial + text
+        start = 0
+        while (end := text.find("\n", start)) >= 0:
+            line = text[start : end + 1]
+            start = end + 1
+            cut, self._partial_cut = self._partial_cut, False
+            if not cut and line.rstrip("\r\n") == self.start_marker:
+                self.started = True
+                self._before.clear()
+                self._before_bytes = 0
+                self._partial = ""
+                self._file.write(text[start:])
+                return True
+            self._keep_before(line)
+
+        self._partial = text[start:]
+        if len(self._partial) > pre_marker_tail_bytes:
+            self._partial = self._partial[-pre_marker_tail_bytes:]
+            self._partial_cut = True
+        return True
+
+    def _keep_before(self, line: str) -> None:
+        self._before.append(line)
+        self._before_bytes += len(line.encode("utf-8"))
+        while self._before_bytes > pre_marker_tail_bytes and len(self._before) > 1:
+            self._before_bytes -= len(self._before.popleft().encode("utf-8"))
+
+    @property
+    def spooled(self) -> bool:
+        "True if the output has been moved to a temporary file"
+        return bool(getattr(self._file, "_rolled", False))
+
+    def lines(self) -> Iterator[str]:
+        """The lines kept, without their newlines: those after the start marker, or
+        if it never came, the last few read."""
+        if not self.started:
+            before = [*self._before, self._partial] if self._partial else self._before
+            yield from (line.rstrip("\r\n") for line in before)
+            return
+        self._file.seek(0)
+        for line in self._file:
+            yield line.rstrip("\r\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+_output: ContextVar[Optional[BoundedOutput]] = ContextVar(
+    "atlas_mcp_output", default=None
+)
+
+
+@contextmanager
+def bounded_output(
+    start_marker: Optional[str] = None, max_bytes: Optional[int] = None
+) -> Iterator[BoundedOutput]:
+    """Send the stdout of the processes `run_process` runs inside to a
+    `BoundedOutput`, rather than keeping it all in memory and returning it - their
+    `stdout` comes back empty. Read the output back from the `BoundedOutput` before
+    leaving the block.
+
+    Args:
+        start_marker (str, optional): Drop everything up to this line
+        max_bytes (int, optional): Kill a process that prints more than this
+            (`max_output_bytes` by default)
+    """
+    output = BoundedOutput(start_marker, max_bytes)
+    token = _output.set(output)
+    try:
+        yield output
+    finally:
+        _output.reset(token)
+        output.close()
+
+
+@contextmanager
+def deadline(seconds: Optional[float] = None) -> Iterator[threading.Event]:
+    """Run everything inside with a deadline `seconds` from now (`default_timeout` if
+    None). A deadline that is already in force and is sooner is kept.
+
+    Yields the event that cancels backend calls made inside - set it (from any
+    thread) and they are killed.
+    """
+    seconds = default_timeout if seconds is None else seconds
+    when = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        when = min(when, outer)
+
+    cancel = threading.Event()
+    deadline_token = _deadline.set(when)
+    cancel_token = _cancel.set(_cancel.get() + (cancel,))
+    try:
+        yield cancel
+    finally:
+        _cancel.reset(cancel_token)
+        _deadline.reset(deadline_token)
+
+
+def remaining() -> Optional[float]:
+    "Seconds left before the current deadline, or None if there is none"
+    when = _deadline.get()
+    return None if when is None else when - time.monotonic()
+
+
+def cancelled() -> bool:
+    "True if the current call has been cancelled"
+    return any(e.is_set() for e in _cancel.get())
+
+
+async def run_in_thread(fn: Callable[..., T], *args, **kwargs) -> T:
+    """Like `asyncio.to_thread`, but if the awaiting task is cancelled any backend
+    process the call is running is killed, rather than left to run to completion.
+
+    The current deadline, if any, applies inside the thread, and the thread is
+    included in the profile of the current tool call, if it is being profiled.
+    """
+
+    def call() -> T:
+        with profiling.track_thread():
+            return fn(*args, **kwargs)
+
+    with deadline(remaining()) as cancel:
+        try:
+            return await asyncio.to_thread(call)
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+
+
+def _kill_tree(proc: subprocess.Popen) -> None:
+    "Kill a process started by `run_process` and everything it started"
+    if sys.platform == "win32":
+        subprocess.run(
+            ["taskkill", "/T", "/F", "/PID", str(proc.pid)], capture_output=True
+        )
+    else:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    proc.kill()
+
+
+def run_process(
+    cmd: List[str],
+    description: str = "",
+    on_kill: Optional[Callable[[], None]] = None,
+    on_line: Optional[Callable[[str], None]] = None,
+) -> subprocess.CompletedProcess:
+    """Run `cmd`, capturing its output as text, until it exits, the current deadline
+    passes, or the current call is cancelled.
+
+    The process is started in its own process group (session on POSIX), so on a
+    timeout or cancel the whole tree it started is killed, not just `cmd` itself.
+
+    Args:
+        cmd (List[str]): Command to run
+        description (str): What is being run, for the timeout message
+        on_kill (Callable, optional): Called before the process is killed - used to
+            kill the parts of the tree the local OS cannot see (e.g. inside WSL)
+        on_line (Callable, optional): Called with each line of stdout (without its
+            newline) as soon as it is printed, from a reader thread. Everything is
+            still returned in `stdout`.
+
+    Inside `bounded_output`, stdout goes to its `BoundedOutput` instead (and
+    `stdout` is empty), and only the end of stderr is kept.
+
+    Returns:
+        subprocess.CompletedProcess: As from `subprocess.run`
+
+    Raises:
+        BackendTimeoutError: The deadline passed
+        BackendCancelledError: The call was cancelled
+        BackendOutputTooLargeError: The process printed too much
+    """
+    if _deadline.get() is None:
+        with deadline():
+            return run_process(cmd, description, on_kill, on_line)
+
+    description = description or " ".join(cmd)
+    if cancelled():
+        raise BackendCancelledError(f"Cancelled before it started: {description}")
+    if remaining() <= 0:
+        raise BackendTimeoutError(f"No time left to run: {description}")
+
+    output = _output.get()
+    with tracing.span("subprocess", {"process.command": description}) as span:
+        read_before = output.bytes_read if output is not None else 0
+        result = _run_process(cmd, description, on_kill, on_line)
+        span.set_attribute("process.exit_code", result.returncode)
+        span.set_attribute(
+            "process.stdout_bytes",
+            (
+                output.bytes_read - read_before
+                if output is not None
+                else len(result.stdout)
+            ),
+        )
+        return result
+
+
+def _run_process(
+    cmd: List[str],
+    description: str,
+    on_kill: Optional[Callable[[], None]],
+    on_line: Optional[Callable[[str], None]],
+) -> subprocess.CompletedProcess:
+    started = time.monotonic()
+    if sys.platform == "win32":
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            creationflags=subprocess.CREATE_NEW_PROCESS_GROUP,
+        )
+    else:
+        proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+        )
+
+    output = _output.get()
+    if on_line is not None or output is not None:
+        return _run_streaming(proc, cmd, description, on_kill, on_line, started, output)
+
+    while True:
+        left = remaining()
+        try:
+            stdout, stderr = proc.communicate(
+                timeout=max(0.0, min(poll_interval, left))
+            )
+            return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+        except subprocess.TimeoutExpired:
+            # (communicate can be called again after a timeout without losing output)
+            pass
+
+        is_cancelled = cancelled()
+        if not is_cancelled and remaining() > 0:
+            continue
+
+        _kill(proc, on_kill)
+        proc.communicate()
+        _raise_killed(description, is_cancelled, started)
+
+
+def _run_streaming(
+    proc: subprocess.Popen,
+    cmd: List[str],
+    description: str,
+    on_kill: Optional[Callable[[], None]],
+    on_line: Optional[Callable[[str], None]],
+    started: float,
+    output: Optional[BoundedOutput] = None,
+) -> subprocess.CompletedProcess:
+    """`_run_process`, reading stdout in chunks as it is printed - so `output` can
+    stop a runaway process part way through a line - and handing `on_line` each
+    line as it completes."""
+    stdout: List[str] = []
+    stderr: List[str] = []
+    too_large = threading.Event()
+
+    def read_stdout():
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        raw = proc.stdout.buffer  # type: ignore[union-attr]
+        partial: List[str] = []
+        while True:
+            data = raw.read1(read_chunk_bytes)
+            text = decoder.decode(data, final=not data)
+            if output is None:
+                stdout.append(text)
+            elif not output.feed(text, len(data)):
+                too_large.set()
+                return
+            if on_line is not None and text:
+                pieces = text.split("\n")
+                if len(pieces) > 1:
+                    _send_lines(on_line, ["".join(partial) + pieces[0], *pieces[1:-1]])
+                    partial = []
+                partial.append(pieces[-1])
+            if not data:
+                break
+        if on_line is not None and "".join(partial):
+            _send_lines(on_line, ["".join(partial)])
+
+    def read_stderr():
+        if output is None:
+            stderr.append(proc.stderr.read())  # type: ignore[union-attr]
+            return
+        tail = ""
+        while chunk := proc.stderr.read(8192):  # type: ignore[union-attr]
+            tail = (tail + chunk)[-stderr_tail_bytes:]
+        stderr.append(tail)
+
+    readers = [
+        threading.Thread(target=read_stdout, daemon=True),
+        threading.Thread(target=read_stderr, daemon=True),
+    ]
+    for reader in readers:
+        reader.start()
+
+    while True:
+        try:
+            proc.wait(timeout=max(0.0, min(poll_interval, remaining())))
+            for reader in readers:
+                reader.join()
+            if not too_large.is_set():
+                return subprocess.CompletedProcess(
+                    cmd, proc.returncode, "".join(stdout), "".join(stderr)
+                )
+        except subprocess.TimeoutExpired:
+            pass
+
+        is_cancelled = cancelled()
+        if not too_large.is_set() and not is_cancelled and remaining() > 0:
+            continue
+
+        _kill(proc, on_kill)
+        proc.wait()
+        for reader in readers:
+            reader.join()
+        if too_large.is_set():
+            raise BackendOutputTooLargeError(
+                "Backend call printed more than "
+                f"{output.max_bytes / (1 << 20):g} MB and was killed: {description}"
+            )
+        _raise_killed(description, is_cancelled, started)
+
+
+def _send_lines(on_line: Callable[[str], None], lines: List[str]) -> None:
+    for line in lines:
+        try:
+            on_line(line.rstrip("\r"))
+        except Exception:
+            pass
+
+
+def _kill(proc: subprocess.Popen, on_kill: Optional[Callable[[], None]]) -> None:
+    if on_kill is not None:
+        try:
+            on_kill()
+        except Exception:
+            pass
+    _kill_tree(proc)
+
+
+def _raise_killed(description: str, is_cancelled: bool, started: float) -> None:
+    if is_cancelled:
+        raise BackendCancelledError(f"Cancelled: {description}")
+    raise BackendTimeoutError(
+        f"Backend call timed out after {time.monotonic() - started:.0f}s and was "
+        f"killed: {description}. AMI/Rucio may not be responding, or the grid "
+        "proxy may have expired (renew it with voms-proxy-init)."
+    )
@@ -0,0 +1,176 @@
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+# scope.DSID.physics_short.step.tier.tags[.anything else], with an optional
+# leading `scope:`. Anchored per line so a whole batch can be scanned in one go.
+_DID_RE = re.compile(
+    r"^(?:[^:\n]+:)?"
+    r"(?P<scope>[^.:\n]+)\.(?P<dsid>\d+)\.(?P<physics_short>[^.\n]+)\."
+    r"(?P<step>[^.\n]+)\.(?P<tier>[^.\n]+)\.(?P<tags>[^.\n]+)(?:\.[^\n]*)?$",
+    re.MULTILINE,
+)
+_TAG_RE = re.compile(r"([esarp])(\d+)")
+
+TAG_LETTERS = ("e", "s", "a", "r", "p")
+
+
+class ParsedDID(BaseModel):
+    scope: str = Field(description="Data scope name")
+    dsid: str = Field(description="Run number (DSID)")
+    physics_short: str = Field(description="Physics short name")
+    step: str = Field(description="Production step - evgen, simul, recon, deriv")
+    tier: str = Field(description="Data tier - EVNT, HITS, AOD, DAOD_PHYS, ...")
+    tags: str = Field(description="The full AMI tag string, e.g. e8514_s4369_r16083")
+
+
+def split_tags(tags: str) -> Dict[str, str]:
+    """Split an AMI tag string into one entry per tag letter.
+
+    Repeated letters (merged productions, e.g. `e8514_e8528_s4162_s4114`) are kept,
+    joined with `_`, in the order they appear.
+    """
+    found: Dict[str, List[str]] = defaultdict(list)
+    for letter, number in _TAG_RE.findall(tags):
+        found[letter].append(letter + number)
+    return {k: "_".join(v) for k, v in found.items()}
+
+
+def parse_did(name: str) -> Optional[ParsedDID]:
+    """Parse a single rucio DID, returning None if it does not look like an ATLAS
+    production dataset name."""
+    m = _DID_RE.match(name.strip())
+    if m is None:
+        return None
+    return ParsedDID(**m.groupdict())
+
+
+class DIDTable(BaseModel):
+    """Column-oriented batch of parsed DIDs - one list per field, all the same length.
+
+    Names that could not be parsed are kept, unparsed, in `invalid`.
+    """
+
+    did: List[str] = Field(default_factory=list)
+    scope: List[str] = Field(default_factory=list)
+    dsid: List[str] = Field(default_factory=list)
+    physics_short: List[str] = Field(default_factory=list)
+    step: List[str] = Field(default_factory=list)
+    tier: List[str] = Field(default_factory=list)
+    tags: List[str] = Field(default_factory=list)
+    e_tag: List[str] = Field(default_factory=list)
+    s_tag: List[str] = Field(default_factory=list)
+    a_tag: List[str] = Field(default_factory=list)
+    r_tag: List[str] = Field(default_factory=list)
+    p_tag: List[str] = Field(default_factory=list)
+    invalid: List[str] = Field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.did)
+
+    def take(self, rows: Sequence[int]) -> "DIDTable":
+        "A new table with just the given rows (invalid names are dropped)"
+        columns = {
+            name: [getattr(self, name)[i] for i in rows]
+            for name in DIDTable.model_fields
+            if name != "invalid"
+        }
+        return DIDTable.model_construct(invalid=[], **columns)
+
+    def filter(
+        self,
+        physics_short_contains: str = "",
+        tier: str = "",
+        dsid: str = "",
+    ) -> "DIDTable":
+        """Rows matching all the given criteria (empty criteria match everything).
+
+        `physics_short_contains` is a case-insensitive substring match; `tier` and
+        `dsid` must match exactly.
+        """
+        needle = physics_short_contains.lower()
+        rows = [
+            i
+            for i in range(len(self))
+            if (not needle or needle in self.physics_short[i].lower())
+            and (not tier or self.tier[i] == tier)
+            and (not dsid or self.dsid[i] == dsid)
+        ]
+        return self.take(rows)
+
+    def group_by(self, column: str) -> Dict[str, List[str]]:
+        "The DIDs, grouped by the value of one column"
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for key, did in zip(getattr(self, column), self.did):
+            groups[key].append(did)
+        return dict(groups)
+
+    def latest_p_tag(self) -> "DIDTable":
+        """Keep only the newest derivation (highest p-tag) of each sample.
+
+        Rows are grouped by everything but the p-tag; rows without a p-tag are kept.
+        """
+        best: Dict[tuple, int] = {}
+        keep: List[int] = []
+        for i in range(len(self)):
+            if not self.p_tag[i]:
+                keep.append(i)
+                continue
+            key = (
+                self.scope[i],
+                self.dsid[i],
+                self.tier[i],
+                self.e_tag[i],
+                self.s_tag[i],
+                self.a_tag[i],
+                self.r_tag[i],
+            )
+            current = best.get(key)
+            if current is None or _p_number(self.p_tag[i]) > _p_number(
+                self.p_tag[current]
+            ):
+                best[key] = i
+        rows = sorted(keep + list(best.values()))
+        return self.take(rows)
+
+
+def _p_number(p_tag: str) -> int:
+    # Merged derivations carry several p-tags; the last one is the newest step.
+    return int(p_tag.split("_")[-1][1:])
+
+
+def parse_dids(names: Iterable[str]) -> DIDTable:
+    """Parse a batch of rucio DIDs into a `DIDTable`.
+
+    The whole batch is scanned with one compiled regular expression, which keeps
+    this fast for tens of thousands of names.
+
+    Args:
+        names (Iterable[str]): DIDs, with or without a leading `scope:`
+
+    Returns:
+        DIDTable: The parsed columns, plus any names that could not be parsed
+    """
+    names = [n.strip() for n in names if n.strip()]
+    table = DIDTable()
+    columns = {
+        group: getattr(table, group)
+        for group in ("scope", "dsid", "physics_short", "step", "tier", "tags")
+    }
+    tag_columns = {letter: getattr(table, f"{letter}_tag") for letter in TAG_LETTERS}
+
+    matched = set()
+    for m in _DID_RE.finditer("\n".join(names)):
+        did = m.group(0)
+        matched.add(did)
+        table.did.append(did)
+        for group, column in columns.items():
+            column.append(m.group(group))
+        tags = split_tags(m.group("tags"))
+        for letter, column in tag_columns.items():
+            column.append(tags.get(letter, ""))
+
+    table.invalid.extend(n for n in names if n not in matched)
+    return table
@@ -0,0 +1,130 @@
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Any, Dict, List, Sequence
+
+from atlas_mcp.did_parser import parse_dids
+
+# Output formats the listing tools accept.
+FORMATS = ("json", "columns", "tsv")
+
+DID_FIELDS = ("scope", "dsid", "physics_short", "step", "tier", "tags")
+DID_TEMPLATE = ".".join("{" + f + "}" for f in DID_FIELDS)
+
+# Only factor a shared prefix out of a column if it saves at least this much per row
+_MIN_PREFIX = 4
+_BOUNDARY = re.compile(r"[_.\- ]")
+
+
+def _shared_prefix(values: Sequence[str]) -> str:
+    "The common prefix of `values`, cut back to the last `_`, `.`, `-` or space"
+    prefix = os.path.commonprefix(list(values))
+    ends = [m.end() for m in _BOUNDARY.finditer(prefix)]
+    prefix = prefix[: ends[-1]] if ends else ""
+    return prefix if len(prefix) >= _MIN_PREFIX else ""
+
+
+def columnar(rows: Sequence[Dict[str, Any]], key: str = "dataset") -> Dict[str, Any]:
+    """Turn a listing of datasets into per-column arrays.
+
+    The dataset name (`key`) is split into its fields (see `did_parser`) and
+    dropped - it can be rebuilt with `did_template`. Columns with the same value in
+    every row are moved to `constant`, and a prefix shared by every value of a
+    column (e.g. the `e8514_s4369_r16083_` of the tags) is moved to `prefix`. Rows
+    whose name can't be parsed are passed through untouched in `unparsed`.
+
+    Args:
+        rows (Sequence[Dict[str, Any]]): Listing rows, each with the name in `key`
+        key (str): Which field holds the dataset name
+
+    Returns:
+        Dict[str, Any]: The columnar listing
+    """
+    names = [str(r[key]).strip() for r in rows]
+    table = parse_dids(names)
+
+    # parse_dids keeps the input order of the names it could parse
+    table_rows: Dict[str, List[int]] = defaultdict(list)
+    for i, did in enumerate(table.did):
+        table_rows[did].append(i)
+
+    columns: Dict[str, List[Any]] = {f: [] for f in DID_FIELDS}
+    parsed: List[int] = []
+    for row, name in enumerate(names):
+        if not table_rows.get(name):
+            continue
+        i = table_rows[name].pop(0)
+        fields = {f: getattr(table, f)[i] for f in DID_FIELDS}
+        # Names with anything after the tags would not round trip
+        if DID_TEMPLATE.format(**fields) != name.split(":", 1)[-1]:
+            continue
+        parsed.append(row)
+        for f in DID_FIELDS:
+            columns[f].append(fields[f])
+    parsed_set = set(parsed)
+
+    extra_keys: List[str] = []
+    for r in rows:
+        for k in r:
+            if k != key and k not in extra_keys:
+                extra_keys.append(k)
+    for k in extra_keys:
+        columns[k] = [rows[row].get(k, "") for row in parsed]
+
+    result: Dict[str, Any] = {
+        "format": "columns",
+        "rows": len(parsed),
+        "did_template": DID_TEMPLATE,
+        "constant": {},
+        "prefix": {},
+        "columns": {},
+        "unparsed": [rows[i] for i in range(len(rows)) if i not in parsed_set],
+    }
+    for name, values in columns.items():
+        # With a single row everything would be "constant", leaving no columns
+        if len(values) > 1 and all(v == values[0] for v in values):
+            result["constant"][name] = values[0]
+            continue
+        if values and all(isinstance(v, str) for v in values):
+            prefix = _shared_prefix(values)
+            if prefix:
+                result["prefix"][name] = prefix
+                values = [v[len(prefix) :] for v in values]
+        result["columns"][name] = values
+    return result
+
+
+def to_tsv(listing: Dict[str, Any]) -> str:
+    """Render a `columnar` listing as tab separated values: `#` header lines with the
+    constants and prefixes (tab separated `name=value`), the DID template and any
+    unparsed rows, then a line of column names and one line per row."""
+    lines = []
+    for section in ("constant", "prefix"):
+        if listing[section]:
+            values = "\t".join(f"{k}={v}" for k, v in listing[section].items())
+            lines.append(f"# {section}:\t{values}")
+    lines.append(f"# did: {listing['did_template']}")
+    for row in listing["unparsed"]:
+        lines.append(f"# unparsed: {json.dumps(row)}")
+
+    names = list(listing["columns"])
+    lines.append("\t".join(names))
+    for values in zip(*(listing["columns"][n] for n in names)):
+        lines.append("\t".join(str(v) for v in values))
+    return "\n".join(lines) + "\n"
+
+
+def render(rows: Sequence[Dict[str, Any]], format: str, key: str = "dataset") -> str:
+    """Render a dataset listing in one of `FORMATS`.
+
+    `json` is the rows as they are; `columns` is the JSON of `columnar`; `tsv` is
+    `to_tsv` of that.
+    """
+    if format == "json":
+        return json.dumps(list(rows))
+    if format == "columns":
+        return json.dumps(columnar(rows, key))
+    if format == "tsv":
+        return to_tsv(columnar(rows, key))
+    raise ValueError(f"Unknown format `{format}` - must be one of {', '.join(FORMATS)}")
@@ -0,0 +1,212 @@
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pydantic import BaseModel, Field
+
+# Common ways of asking for a physics process, mapped to the spelling used in the
+# PMG hashtags and the physics short names. Keys are matched against the lower-cased
+# query, either as a full phrase or as a single token.
+SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    "top pair": ("ttbar",),
+    "top pairs": ("ttbar",),
+    "top quark pair": ("ttbar",),
+    "tt": ("ttbar",),
+    "tt~": ("ttbar",),
+    "t tbar": ("ttbar",),
+    "single top": ("singletop",),
+    "dijets": ("dijet",),
+    "multijet": ("dijet", "jj"),
+    "qcd": ("dijet", "jj"),
+    "w+jets": ("wjets",),
+    "w+jet": ("wjets",),
+    "z+jets": ("zjets",),
+    "z+jet": ("zjets",),
+    "drell-yan": ("zjets", "dy"),
+    "drell yan": ("zjets", "dy"),
+    "diboson": ("diboson", "vv"),
+    "triboson": ("triboson", "vvv"),
+    "gamma+jets": ("gammajet", "photonjet"),
+    "photon+jets": ("gammajet", "photonjet"),
+    "higgs": ("higgs", "h125"),
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_CAMEL_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+\d*|\d+")
+
+# BM25 parameters - the usual defaults.
+_K1 = 1.2
+_B = 0.75
+
+# Minimum trigram similarity for a fuzzy term match.
+_MIN_SIMILARITY = 0.35
+
+
+class SearchHit(BaseModel):
+    kind: str = Field(
+        description="'address' for a hashtag 4-tuple, 'sample' for an EVNT"
+    )
+    scope: str = Field(description="Data scope name")
+    hash_tags: Tuple[str, ...] = Field(
+        description="Hashtag 4-tuple (for samples, the address it was found under)"
+    )
+    name: Optional[str] = Field(
+        default=None, description="EVNT rucio dataset name, for sample hits"
+    )
+    score: float = Field(description="Relevance score, larger is better")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split a hashtag or sample name into lower-case search terms.
+
+    Camel-case words (`JetPhoton`, `PowhegPythia8`) are indexed both whole and as
+    their parts, so `photon` finds `JetPhoton`.
+    """
+    terms = []
+    for word in re.split(r"[^A-Za-z0-9]+", text):
+        if not word:
+            continue
+        terms.append(word.lower())
+        parts = [p.lower() for p in _CAMEL_RE.findall(word) if len(p) >= 3]
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+def expand_query_groups(query: str) -> List[List[str]]:
+    """Apply the synonym table to a query, keeping the alternatives for each word (or
+    synonym phrase) of the query together: `"diboson allhad"` ->
+    `[["diboson", "vv"], ["allhad"]]`. A document answers the query if it matches
+    one term of every group."""
+    q = query.lower().strip()
+    groups: List[List[str]] = []
+    for phrase, replacement in SYNONYMS.items():
+        if " " in phrase and phrase in q:
+            q = q.replace(phrase, " ")
+            groups.append(list(replacement))
+
+    for word in q.split():
+        if word in SYNONYMS:
+            groups.append(list(SYNONYMS[word]))
+        else:
+            groups.extend([t] for t in _TOKEN_RE.findall(word))
+    return groups
+
+
+def expand_query(query: str) -> List[str]:
+    """Apply the synonym table to a query and return the terms to search for."""
+    # Keep order, drop duplicates
+    return list(dict.fromkeys(t for group in expand_query_groups(query) for t in group))
+
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: str, b: str) -> float:
+    """Trigram (Jaccard) similarity between two terms, with a bonus for prefixes."""
+    if a == b:
+        return 1.0
+    ta, tb = trigrams(a), trigrams(b)
+    score = len(ta & tb) / len(ta | tb)
+    if len(a) >= 2 and b.startswith(a):
+        score = max(score, len(a) / len(b))
+    return score
+
+
+class FuzzyIndex:
+    """In-memory BM25 index with trigram fuzzy term matching.
+
+    Documents are keyed (adding the same key twice is a no-op), and carry an
+    arbitrary payload that is handed back with the search results. Documents may be
+    added and searched from several threads at once.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: Dict[object, int] = {}
+        self._payloads: List[object] = []
+        self._lengths: List[int] = []
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def add(self, key: object, text: str, payload: object) -> bool:
+        """Add a document. Returns False if the key was already indexed."""
+        terms = tokenize(text)
+        with self._lock:
+            if key in self._keys:
+                return False
+            doc_id = len(self._payloads)
+            self._keys[key] = doc_id
+            self._payloads.append(payload)
+
+            self._lengths.append(len(terms))
+            for t in terms:
+                posting = self._postings[t]
+                if not posting:
+                    for g in trigrams(t):
+                        self._trigrams[g].add(t)
+                posting[doc_id] = posting.get(doc_id, 0) + 1
+        return True
+
+    def _matching_terms(self, q: str, min_similarity: float) -> Dict[str, float]:
+        "Index terms that match the query term, with their similarity"
+        candidates: Set[str] = set()
+        for g in trigrams(q):
+            candidates |= self._trigrams.get(g, set())
+        matches = {}
+        for t in candidates:
+            s = similarity(q, t)
+            if s >= min_similarity:
+                matches[t] = s
+        return matches
+
+    def search(
+        self,
+        terms: Iterable[str],
+        limit: Optional[int] = 20,
+        min_similarity: float = _MIN_SIMILARITY,
+    ) -> List[Tuple[object, float]]:
+        """Rank documents against the (already expanded) query terms.
+
+        Returns (payload, score) pairs, best first. A `limit` of None returns all.
+        Index terms less similar than `min_similarity` to a query term don't match
+        it.
+        """
+        with self._lock:
+            return self._search(list(terms), limit, min_similarity)
+
+    def _search(
+        self, terms: List[str], limit: Optional[int], min_similarity: float
+    ) -> List[Tuple[object, float]]:
+        n_docs = len(self._payloads)
+        if n_docs == 0:
+            return []
+        avg_len = sum(self._lengths) / n_docs
+
+        scores: Dict[int, float] = defaultdict(float)
+        for q in terms:
+            # A document scores once per query term - with its best matching term.
+            best: Dict[int, float] = {}
+            for t, sim in self._matching_terms(q, min_similarity).items():
+                posting = self._postings[t]
+                idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                for doc_id, tf in posting.items():
+                    norm = _K1 * (1 - _B + _B * self._lengths[doc_id] / avg_len)
+                    s = sim * idf * tf * (_K1 + 1) / (tf + norm)
+                    if s > best.get(doc_id, 0.0):
+                        best[doc_id] = s
+            for doc_id, s in best.items():
+                scores[doc_id] += s
+
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        return [(self._payloads[doc_id], score) for doc_id, score in ranked[:limit]]
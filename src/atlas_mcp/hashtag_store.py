@@ -0,0 +1,102 @@
+from array import array
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+# Hashtag addresses are always 4 levels deep.
+LEVELS = 4
+
+
+class HashtagStore:
+    """Column-oriented store of hashtag 4-tuples.
+
+    Each distinct tag string is interned once, with its lower-cased form, and each
+    level is an array of tag ids - so a full scope's worth of addresses costs a few
+    integers per row rather than a model object. Keyword filtering scans the
+    distinct tags (not every row), then uses a tag -> rows index.
+    """
+
+    def __init__(self):
+        self.tags: List[str] = []
+        self.lowered: List[str] = []
+        self.levels: List[array] = [array("I") for _ in range(LEVELS)]
+        self._ids: Dict[str, int] = {}
+        self._rows: Dict[Tuple[int, ...], int] = {}
+        self._postings: List[List[int]] = []
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str]) -> "HashtagStore":
+        "Build a store from `hashtags find` output - lines of 4 space separated tags"
+        store = cls()
+        for ln in lines:
+            parts = ln.split()
+            if len(parts) == LEVELS:
+                store.add(parts)
+        return store
+
+    def __len__(self) -> int:
+        return len(self.levels[0])
+
+    def intern(self, tag: str) -> int:
+        tag_id = self._ids.get(tag)
+        if tag_id is None:
+            tag_id = len(self.tags)
+            self._ids[tag] = tag_id
+            self.tags.append(tag)
+            self.lowered.append(tag.lower())
+            self._postings.append([])
+        return tag_id
+
+    def add(self, tags: Sequence[str]) -> int:
+        "Add a 4-tuple (if it is not already there), returning its row"
+        ids = tuple(self.intern(t) for t in tags)
+        row = self._rows.get(ids)
+        if row is not None:
+            return row
+        row = len(self)
+        self._rows[ids] = row
+        for level, tag_id in zip(self.levels, ids):
+            level.append(tag_id)
+        for tag_id in set(ids):
+            self._postings[tag_id].append(row)
+        return row
+
+    def row(self, row: int) -> Tuple[str, ...]:
+        return tuple(self.tags[level[row]] for level in self.levels)
+
+    def rows(self) -> List[Tuple[str, ...]]:
+        "Every 4-tuple, in the order they were added"
+        columns = [[self.tags[i] for i in level] for level in self.levels]
+        return list(zip(*columns))
+
+    def matching_tags(self, keyword: str) -> List[int]:
+        "Ids of the tags that contain `keyword` (case-insensitive)"
+        needle = keyword.lower()
+        return [i for i, t in enumerate(self.lowered) if needle in t]
+
+    def select(self, keywords: Sequence[str], level3: str = "") -> List[int]:
+        """Rows in which every keyword is contained (case-insensitive) in at least
+        one of the tags, in the order they were added.
+
+        Args:
+            keywords (Sequence[str]): Keywords that must all match
+            level3 (str): If given, the third tag must be exactly this (e.g.
+                `Baseline`)
+
+        Returns:
+            List[int]: Matching rows
+        """
+        selected: Set[int] = set(range(len(self)))
+        for keyword in keywords:
+            rows: Set[int] = set()
+            for tag_id in self.matching_tags(keyword):
+                rows.update(self._postings[tag_id])
+            selected &= rows
+            if not selected:
+                return []
+
+        if level3:
+            level3_id = self._ids.get(level3)
+            if level3_id is None:
+                return []
+            column = self.levels[2]
+            selected = {r for r in selected if column[r] == level3_id}
+        return sorted(selected)
@@ -0,0 +1,237 @@
+import asyncio
+import math
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence
+
+from pydantic import BaseModel, Field
+
+import atlas_mcp.central_page as cp
+from atlas_mcp import campaigns, deadlines, scheduler
+from atlas_mcp.did_parser import parse_dids
+from atlas_mcp.scheduler import Priority
+
+# Default number of metadata lookups in flight at once.
+default_max_concurrency = 4
+
+
+class SampleNormalization(BaseModel):
+    did: str = Field(description="Rucio dataset name")
+    dsid: str = Field(description="Run number (DSID)")
+    period: str = Field(description="MC campaign - mc20a, mc23e, etc. ('' if unknown)")
+    x_sec: float = Field(description="Cross section in pb")
+    filter_eff: float = Field(description="Generator filter efficiency")
+    k_factor: float = Field(description="K-factor")
+    sigma_eff: float = Field(description="x_sec * filter_eff * k_factor, in pb")
+    lumi: float = Field(description="Luminosity of the campaign, in fb^-1")
+    expected_events: float = Field(
+        description="Events expected in `lumi` (sigma_eff * lumi)"
+    )
+    sum_of_weights: Optional[float] = Field(
+        default=None, description="Sum of generator weights of the sample, if given"
+    )
+    weight: float = Field(
+        description=(
+            "Per-event weight, expected_events / sum_of_weights (NaN if unknown)"
+        )
+    )
+    effective_lumi: float = Field(
+        description="Luminosity the sample is equivalent to, sum_of_weights / "
+        "sigma_eff, in fb^-1 (NaN if unknown)"
+    )
+
+
+class CampaignNormalization(BaseModel):
+    period: str = Field(description="MC campaign ('' for samples without one)")
+    lumi: float = Field(description="Luminosity of the campaign, in fb^-1")
+    lumi_fraction: float = Field(description="Fraction of the total luminosity")
+    samples: int = Field(description="Number of samples in the campaign")
+    expected_events: float = Field(description="Sum of the samples' expected events")
+
+
+class Normalization(BaseModel):
+    samples: List[SampleNormalization] = Field(description="One entry per dataset")
+    campaigns: List[CampaignNormalization] = Field(
+        description="Per-campaign luminosity split and totals"
+    )
+    total_lumi: float = Field(description="Luminosity of all campaigns, in fb^-1")
+    expected_events: float = Field(description="Sum of every sample's expected events")
+    missing_metadata: List[str] = Field(
+        default_factory=list, description="Datasets without a cross section"
+    )
+    missing_lumi: List[str] = Field(
+        default_factory=list,
+        description="Datasets whose campaign has no luminosity given",
+    )
+    failed: Dict[str, str] = Field(
+        default_factory=dict,
+        description="DSID -> error, for DSIDs whose metadata lookup failed",
+    )
+
+
+class MetadataLookup(BaseModel):
+    metadata: Dict[str, Dict[str, Any]] = Field(description="DSID -> AMI metadata")
+    failed: Dict[str, str] = Field(
+        default_factory=dict, description="DSID -> error, for lookups that failed"
+    )
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def normalize(
+    datasets: Sequence[str],
+    metadata: Dict[str, Dict[str, Any]],
+    lumi: Dict[str, float],
+    sum_of_weights: Optional[Dict[str, float]] = None,
+    k_factors: Optional[Dict[str, float]] = None,
+    failed: Optional[Dict[str, str]] = None,
+) -> Normalization:
+    """Compute normalization weights for a batch of samples.
+
+    The names are parsed in one pass (see `did_parser.parse_dids`) and each quantity
+    is built as a column over all samples, so thousands of samples take a fraction
+    of a second. Cross sections come from the AMI metadata (quoted in nb).
+
+    Args:
+        datasets (Sequence[str]): Rucio dataset names
+        metadata (Dict[str, Dict[str, Any]]): DSID -> AMI metadata, as from
+            `get_metadata`
+        lumi (Dict[str, float]): MC campaign (`mc20a`, `mc23e`, ...) -> luminosity,
+            in fb^-1
+        sum_of_weights (Dict[str, float], optional): Dataset name -> sum of
+            generator weights (or number of events)
+        k_factors (Dict[str, float], optional): DSID -> k-factor (1.0 if missing -
+            AMI does not carry them)
+        failed (Dict[str, str], optional): DSID -> error of its metadata lookup,
+            passed through so the result says why those samples have no cross
+            section
+
+    Returns:
+        Normalization: Per-sample weights, per-campaign split and totals
+    """
+    sum_of_weights = sum_of_weights or {}
+    k_factors = k_factors or {}
+
+    table = parse_dids(datasets)
+    row = {did: i for i, did in enumerate(table.did)}
+    dids = list(datasets)
+    dsids = [table.dsid[row[d]] if d in row else "" for d in dids]
+    tags = [table.tags[row[d]] if d in row else "" for d in dids]
+
+    # Samples share a handful of tag strings, so look each one up once
+    period_of = {}
+    for t in set(tags):
+        found = campaigns.campaign_for_tags(t) if t else None
+        period_of[t] = found.period if found is not None else ""
+    periods = [period_of[t] for t in tags]
+    meta = [metadata.get(d, {}) for d in dsids]
+    x_sec = [_as_float(m.get("Cross Section (nb)")) * 1000.0 for m in meta]
+    filter_eff = [_as_float(m.get("Filter Efficiency")) for m in meta]
+    k_factor = [float(k_factors.get(d, 1.0)) for d in dsids]
+    sigma_eff = [x * e * k for x, e, k in zip(x_sec, filter_eff, k_factor)]
+    sample_lumi = [float(lumi.get(p, math.nan)) for p in periods]
+    # fb^-1 * pb: 1 fb^-1 = 1000 pb^-1
+    expected = [s * lu * 1000.0 for s, lu in zip(sigma_eff, sample_lumi)]
+    sow = [sum_of_weights.get(d) for d in dids]
+    weight = [e / n if n else math.nan for e, n in zip(expected, sow)]
+    effective_lumi = [
+        n / s / 1000.0 if n and s > 0 else math.nan for n, s in zip(sow, sigma_eff)
+    ]
+
+    samples = [
+        SampleNormalization.model_construct(
+            did=dids[i],
+            dsid=dsids[i],
+            period=periods[i],
+            x_sec=x_sec[i],
+            filter_eff=filter_eff[i],
+            k_factor=k_factor[i],
+            sigma_eff=sigma_eff[i],
+            lumi=sample_lumi[i],
+            expected_events=expected[i],
+            sum_of_weights=sow[i],
+            weight=weight[i],
+            effective_lumi=effective_lumi[i],
+        )
+        for i in range(len(dids))
+    ]
+
+    by_period: Dict[str, List[int]] = defaultdict(list)
+    for i, p in enumerate(periods):
+        by_period[p].append(i)
+    total_lumi = math.fsum(lumi.get(p, 0.0) for p in by_period)
+    split = [
+        CampaignNormalization(
+            period=p,
+            lumi=lumi.get(p, math.nan),
+            lumi_fraction=lumi.get(p, 0.0) / total_lumi if total_lumi else math.nan,
+            samples=len(rows),
+            expected_events=math.fsum(
+                expected[i] for i in rows if not math.isnan(expected[i])
+            ),
+        )
+        for p, rows in sorted(by_period.items())
+    ]
+
+    return Normalization(
+        samples=samples,
+        campaigns=split,
+        total_lumi=total_lumi,
+        expected_events=math.fsum(e for e in expected if not math.isnan(e)),
+        missing_metadata=[d for d, x in zip(dids, x_sec) if math.isnan(x)],
+        missing_lumi=[d for d, lu in zip(dids, sample_lumi) if math.isnan(lu)],
+        failed=failed or {},
+    )
+
+
+async def fetch_metadata(
+    scope: str,
+    datasets: Sequence[str],
+    max_concurrency: int = default_max_concurrency,
+    priority: Priority = Priority.BATCH,
+) -> MetadataLookup:
+    """The AMI metadata of each DSID in `datasets`, fetched once per DSID (from the
+    cache where possible), with at most `max_concurrency` lookups in flight.
+
+    Derived datasets are looked up at the top of their provenance (the EVNT), where
+    the cross section lives. A DSID whose lookup fails (or does not return
+    metadata) is reported in `failed` rather than failing the others.
+
+    Returns:
+        MetadataLookup: DSID -> metadata, and DSID -> error for the failures
+    """
+    table = parse_dids(datasets)
+    first: Dict[str, int] = {}
+    for i, dsid in enumerate(table.dsid):
+        # Prefer the EVNT if it is in the list - no provenance lookup needed
+        if dsid not in first or table.step[i] == "evgen":
+            first[dsid] = i
+    slots = asyncio.Semaphore(max_concurrency)
+
+    async def fetch(i: int) -> Dict[str, Any]:
+        async with slots:
+            with scheduler.priority(priority):
+                return await deadlines.run_in_thread(
+                    cp.get_metadata,
+                    scope,
+                    table.did[i],
+                    use_top_of_provenance=table.step[i] != "evgen",
+                )
+
+    dsids = list(first)
+    results = await asyncio.gather(
+        *(fetch(first[d]) for d in dsids), return_exceptions=True
+    )
+    result = MetadataLookup(metadata={})
+    for dsid, r in zip(dsids, results):
+        if isinstance(r, dict):
+            result.metadata[dsid] = r
+        elif isinstance(r, BaseException):
+            result.failed[dsid] = f"{type(r).__name__}: {r}"
+        else:
+            result.failed[dsid] = f"Expected metadata, got {type(r).__name__}"
+    return result
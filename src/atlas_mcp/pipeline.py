@@ -0,0 +1,347 @@
+import asyncio
+import math
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from pydantic import BaseModel, Field
+
+import atlas_mcp.central_page as cp
+from atlas_mcp import campaigns, deadlines, scheduler
+from atlas_mcp.central_page import CentralPageAddress, DIDInfo
+from atlas_mcp.did_parser import parse_did
+from atlas_mcp.scheduler import Priority
+
+# Default number of backend calls the pipeline will have in flight at once.
+default_max_concurrency = 4
+
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _split_campaign(campaign: str) -> Tuple[str, str]:
+    "'mc23a - FS' -> ('mc23a', 'FS')"
+    period, _, s_type = campaign.partition(" - ")
+    return period.strip(), s_type.strip()
+
+
+def make_did_info(dataset: str, campaign: str, metadata: Dict[str, Any]) -> DIDInfo:
+    """Build a `DIDInfo` from a `get_samples_for_run` row and the run's metadata.
+
+    AMI quotes the cross section in nb, `DIDInfo` wants pb. AMI carries no k-factor,
+    so it is reported as 1.0. Missing numbers come back as NaN.
+    """
+    period, s_type = _split_campaign(campaign)
+    known = campaigns.campaign_for_did(dataset)
+    if known is not None:
+        period, s_type = known.period, known.sim_type
+    parsed = parse_did(dataset)
+    return DIDInfo(
+        did=dataset,
+        x_sec=_as_float(metadata.get("Cross Section (nb)")) * 1000.0,
+        generator_filter_eff=_as_float(metadata.get("Filter Efficiency")),
+        k_factor=1.0,
+        d_type=parsed.tier if parsed is not None else "",
+        s_type=s_type,
+        period=period,
+    )
+
+
+async def find_runs(scope: str, hashtags: Sequence[str]) -> Dict[str, str]:
+    """Run numbers (and their EVNT dataset) for a hashtag address.
+
+    Returns:
+        Dict[str, str]: run number -> EVNT dataset name
+    """
+    cpa = CentralPageAddress(scope=scope, hash_tags=tuple(hashtags))
+    evnts = await deadlines.run_in_thread(cp.get_evtgen_for_address, cpa)
+    return {ds.split(".")[1]: ds for ds in evnts if ds.count(".") >= 2}
+
+
+async def iter_resolve_samples(
+    scope: str,
+    run_numbers: Sequence[str],
+    data_tier: str,
+    evnt_names: Optional[Dict[str, str]] = None,
+    max_concurrency: int = default_max_concurrency,
+    priority: Priority = Priority.BATCH,
+) -> AsyncIterator[Tuple[str, List[DIDInfo], Optional[str]]]:
+    """Resolve runs to `DIDInfo` records, yielding each run as soon as it is done.
+
+    For every run the samples of `data_tier` are listed, and the run's metadata is
+    fetched once (from the EVNT if known, otherwise from the top of the first
+    sample's provenance). Runs are processed concurrently, with at most
+    `max_concurrency` backend calls in flight. Samples without an MC campaign are
+    dropped. A run that fails (or whose backend results are not the expected shape)
+    is yielded with its error, and the others carry on.
+
+    Args:
+        scope (str): Scope name
+        run_numbers (Sequence[str]): Runs to resolve
+        data_tier (str): Tier, as for `get_samples_for_run`
+        evnt_names (Dict[str, str], optional): run number -> EVNT dataset name
+        max_concurrency (int): Maximum number of backend calls in flight
+        priority (Priority): Priority of the backend calls - batch by default, so
+            interactive tool calls are not stuck behind a large resolve
+
+    Yields:
+        Tuple[str, List[DIDInfo], Optional[str]]: The run number, its records and
+        the error if it failed (then with no records), in completion order
+    """
+    evnt_names = evnt_names or {}
+    slots = asyncio.Semaphore(max_concurrency)
+
+    async def call(fn, *args, **kwargs):
+        async with slots:
+            with scheduler.priority(priority):
+                return await deadlines.run_in_thread(fn, *args, **kwargs)
+
+    async def resolve_run(run_number: str) -> List[DIDInfo]:
+        samples = await call(cp.get_samples_for_run, scope, run_number, data_tier)
+        if not isinstance(samples, list):
+            raise ValueError(
+                f"Expected a list of samples, got {type(samples).__name__}"
+            )
+        rows = [
+            r
+            for r in samples
+            if isinstance(r, dict) and r.get("campaign") and r.get("dataset")
+        ]
+        if not rows:
+            return []
+
+        evnt = evnt_names.get(run_number)
+        if evnt is not None:
+            metadata = await call(cp.get_metadata, scope, evnt)
+        else:
+            metadata = await call(
+                cp.get_metadata, scope, rows[0]["dataset"], use_top_of_provenance=True
+            )
+        if not isinstance(metadata, dict):
+            raise ValueError(f"Expected metadata, got {type(metadata).__name__}")
+        return [make_did_info(r["dataset"], r["campaign"], metadata) for r in rows]
+
+    async def resolve(run_number: str) -> Tuple[str, List[DIDInfo], Optional[str]]:
+        try:
+            return run_number, await resolve_run(run_number), None
+        except Exception as e:
+            return run_number, [], f"{type(e).__name__}: {e}"
+
+    tasks = [asyncio.create_task(resolve(r)) for r in run_numbers]
+    try:
+        for done in asyncio.as_completed(tasks):
+            yield await done
+    finally:
+        for t in tasks:
+            t.cancel()
+
+
+class ResolvedSamples(BaseModel):
+    samples: List[DIDInfo] = Field(description="One record per sample, grouped by run")
+    failed: Dict[str, str] = Field(
+        default_factory=dict, description="Run number -> error, for runs that failed"
+    )
+
+
+async def resolve_samples(
+    scope: str,
+    data_tier: str,
+    hashtags: Optional[Sequence[str]] = None,
+    run_numbers: Optional[Sequence[str]] = None,
+    max_concurrency: int = default_max_concurrency,
+    priority: Priority = Priority.BATCH,
+    on_run_done: Optional[
+        Callable[[str, List[DIDInfo], int, int], Awaitable[None]]
+    ] = None,
+) -> ResolvedSamples:
+    """Resolve a hashtag address (or explicit run numbers) to a list of `DIDInfo`.
+
+    This runs the whole EVNT listing -> per-run samples -> metadata chain in one go.
+    See `iter_resolve_samples` for a streaming version. A run that fails is reported
+    in `failed` rather than failing the others.
+
+    Args:
+        scope (str): Scope name
+        data_tier (str): Tier, as for `get_samples_for_run`
+        hashtags (Sequence[str], optional): Hashtag 4-tuple to resolve
+        run_numbers (Sequence[str], optional): Run numbers to resolve (in addition to
+            those found from `hashtags`)
+        max_concurrency (int): Maximum number of backend calls in flight
+        priority (Priority): Priority of the per-run backend calls
+        on_run_done (Callable, optional): Awaited with (run number, its records,
+            runs done, total runs) as each run completes - or fails, with no records
+
+    Returns:
+        ResolvedSamples: The records and any failed runs
+    """
+    if hashtags is None and run_numbers is None:
+        raise ValueError("Either `hashtags` or `run_numbers` must be given")
+
+    evnt_names = await find_runs(scope, hashtags) if hashtags is not None else {}
+    runs = list(dict.fromkeys([*evnt_names.keys(), *(run_numbers or [])]))
+
+    by_run: Dict[str, List[DIDInfo]] = {}
+    failed: Dict[str, str] = {}
+    async for run_number, infos, error in iter_resolve_samples(
+        scope,
+        runs,
+        data_tier,
+        evnt_names,
+        max_concurrency=max_concurrency,
+        priority=priority,
+    ):
+        if error is not None:
+            failed[run_number] = error
+        else:
+            by_run[run_number] = infos
+        if on_run_done is not None:
+            await on_run_done(run_number, infos, len(by_run) + len(failed), len(runs))
+    return ResolvedSamples(
+        samples=[info for r in runs for info in by_run.get(r, [])], failed=failed
+    )
+
+
+class ScopeSearch(BaseModel):
+    addresses: List[CentralPageAddress] = Field(
+        description="Matching addresses of every scope searched, each with its scope"
+    )
+    failed: Dict[str, str] = Field(
+        default_factory=dict, description="Scope -> error, for scopes that failed"
+    )
+
+
+async def search_scopes(
+    keyword: str,
+    scopes: Optional[Sequence[str]] = None,
+    level3: str = "",
+    on_scope_done: Optional[
+        Callable[[str, List[CentralPageAddress], int, int], Awaitable[None]]
+    ] = None,
+) -> ScopeSearch:
+    """Search several scopes for hashtag addresses containing `keyword`, all at once.
+
+    One `get_address_for_keyword` runs per scope, concurrently (the backend
+    scheduler still caps how many reach ami-helper), so the search takes about as
+    long as the slowest scope. A scope that fails is reported in `failed` rather
+    than failing the others.
+
+    Args:
+        keyword (str): Keyword to search for in hash tags
+        scopes (Sequence[str], optional): Scopes to search - all allowed scopes if
+            not given
+        level3 (str): Only return addresses whose third tag is this (e.g. `Baseline`)
+        on_scope_done (Callable, optional): Awaited with (scope, its addresses,
+            scopes done, total scopes) as each scope completes
+
+    Returns:
+        ScopeSearch: The addresses, in the order of `scopes`, and any failures
+    """
+    if scopes is None:
+        scopes = [s.scope for s in cp.get_allowed_scopes()]
+    scopes = list(dict.fromkeys(scopes))
+
+    async def search(scope: str) -> Tuple[str, Any]:
+        try:
+            found = await deadlines.run_in_thread(
+                cp.get_address_for_keyword, scope, keyword, level3=level3
+            )
+        except Exception as e:
+            return scope, e
+        return scope, found
+
+    by_scope: Dict[str, List[CentralPageAddress]] = {}
+    failed: Dict[str, str] = {}
+    tasks = [asyncio.create_task(search(s)) for s in scopes]
+    try:
+        for done in asyncio.as_completed(tasks):
+            scope, found = await done
+            if isinstance(found, Exception):
+                failed[scope] = f"{type(found).__name__}: {found}"
+                found = []
+            else:
+                by_scope[scope] = found
+            if on_scope_done is not None:
+                await on_scope_done(
+                    scope, found, len(by_scope) + len(failed), len(scopes)
+                )
+    finally:
+        for t in tasks:
+            t.cancel()
+
+    return ScopeSearch(
+        addresses=[a for s in scopes for a in by_scope.get(s, [])], failed=failed
+    )
+
+
+class RunSamples(BaseModel):
+    samples: Dict[str, Dict[str, List[Dict[str, Any]]]] = Field(
+        description="Run number -> tier -> the rows of `get_samples_for_run`"
+    )
+    failed: Dict[str, Dict[str, str]] = Field(
+        default_factory=dict,
+        description="Run number -> tier -> error, for lookups that failed",
+    )
+
+
+async def get_samples_for_runs(
+    scope: str,
+    run_numbers: Sequence[str],
+    tiers: Sequence[str],
+    max_concurrency: int = default_max_concurrency,
+    priority: Priority = Priority.BATCH,
+) -> RunSamples:
+    """List the samples of several tiers for several runs.
+
+    There is no backend query for more than one run or tier, so this is one
+    `get_samples_for_run` per (run, tier), at most `max_concurrency` in flight.
+    Each is cached on its own, so pairs already looked up cost nothing and later
+    single lookups are served from the cache. A failed lookup is reported in
+    `failed` rather than failing the rest.
+
+    Args:
+        scope (str): Scope name
+        run_numbers (Sequence[str]): Runs to list
+        tiers (Sequence[str]): Tiers, as for `get_samples_for_run`
+        max_concurrency (int): Maximum number of backend calls in flight
+        priority (Priority): Priority of the backend calls
+
+    Returns:
+        RunSamples: The rows grouped by run and tier, in the order given
+    """
+    runs = list(dict.fromkeys(run_numbers))
+    tiers = list(dict.fromkeys(tiers))
+    slots = asyncio.Semaphore(max_concurrency)
+
+    async def lookup(run_number: str, tier: str) -> Any:
+        async with slots:
+            with scheduler.priority(priority):
+                try:
+                    return await deadlines.run_in_thread(
+                        cp.get_samples_for_run, scope, run_number, tier
+                    )
+                except Exception as e:
+                    return e
+
+    pairs = [(r, t) for r in runs for t in tiers]
+    found = await asyncio.gather(*(lookup(r, t) for r, t in pairs))
+
+    result = RunSamples(samples={r: {} for r in runs})
+    for (run_number, tier), rows in zip(pairs, found):
+        if isinstance(rows, Exception):
+            error = f"{type(rows).__name__}: {rows}"
+            result.failed.setdefault(run_number, {})[tier] = error
+        else:
+            result.samples[run_number][tier] = rows if isinstance(rows, list) else []
+    return result
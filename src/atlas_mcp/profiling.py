@@ -0,0 +1,247 @@
+import asyncio
+import functools
+import inspect
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from types import FrameType
+from typing import Callable, FrozenSet, Iterable, Iterator, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+# Tool calls are profiled only when their name is in ATLAS_MCP_PROFILE (comma
+# separated, `*` for every tool), or after `configure` has been called (the
+# `set_profiling` tool). Profiles go to ATLAS_MCP_PROFILE_DIR.
+_enabled: FrozenSet[str] = frozenset(
+    t.strip() for t in os.environ.get("ATLAS_MCP_PROFILE", "").split(",") if t.strip()
+)
+_directory = Path(
+    os.environ.get(
+        "ATLAS_MCP_PROFILE_DIR", Path.home() / ".cache" / "atlas_mcp_profiles"
+    )
+)
+_interval = float(os.environ.get("ATLAS_MCP_PROFILE_INTERVAL_MS", "5")) / 1000.0
+
+_active: ContextVar[Optional["_CallProfile"]] = ContextVar(
+    "atlas_mcp_profile", default=None
+)
+_seq = itertools.count()
+_write_lock = threading.Lock()
+
+
+class ProfilingStatus(BaseModel):
+    tools: List[str] = Field(description="Tools being profiled (`*` for all)")
+    directory: str = Field(description="Where profiles are written")
+    interval_ms: float = Field(description="Sampling interval")
+
+
+def configure(
+    tools: Iterable[str],
+    directory: Optional[Path] = None,
+    interval_ms: Optional[float] = None,
+) -> ProfilingStatus:
+    """Profile calls to `tools` from now on (an empty list turns profiling off).
+
+    Args:
+        tools (Iterable[str]): Tool names, or `*` for every tool
+        directory (Path, optional): Where to write profiles
+        interval_ms (float, optional): How often to sample stacks
+
+    Returns:
+        ProfilingStatus: The new settings
+    """
+    global _enabled, _directory, _interval
+    _enabled = frozenset(tools)
+    if directory is not None:
+        _directory = Path(directory)
+    if interval_ms is not None:
+        _interval = interval_ms / 1000.0
+    return status()
+
+
+def status() -> ProfilingStatus:
+    return ProfilingStatus(
+        tools=sorted(_enabled), directory=str(_directory), interval_ms=_interval * 1000
+    )
+
+
+def is_enabled(tool: str) -> bool:
+    return bool(_enabled) and (tool in _enabled or "*" in _enabled)
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({Path(code.co_filename).name})"
+
+
+def _folded_stack(frame: Optional[FrameType]) -> str:
+    "Root-first `a;b;c` stack, as used by flamegraph.pl and speedscope"
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+def _idle(frame: FrameType) -> bool:
+    # The event loop waiting for something to do
+    return Path(frame.f_code.co_filename).name == "selectors.py"
+
+
+class _CallProfile:
+    "Samples the stacks of the threads working on one tool call"
+
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.samples: Counter = Counter()
+        self.started = time.time()
+        self.duration = 0.0
+        self.error = ""
+        self._threads: Set[int] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(
+            target=self._run, name=f"profile-{tool}", daemon=True
+        )
+
+    def add_thread(self, ident: int) -> None:
+        with self._lock:
+            self._threads.add(ident)
+
+    def remove_thread(self, ident: int) -> None:
+        with self._lock:
+            self._threads.discard(ident)
+
+    def _run(self) -> None:
+        while not self._stop.wait(_interval):
+            frames = sys._current_frames()
+            with self._lock:
+                threads = list(self._threads)
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None and not _idle(frame):
+                    self.samples[_folded_stack(frame)] += 1
+
+    def start(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._sampler.join()
+
+
+@contextmanager
+def track_thread() -> Iterator[None]:
+    """Include the current thread in the profile of the tool call it is working for,
+    if that call is being profiled. Used by `deadlines.run_in_thread`."""
+    call = _active.get()
+    if call is None:
+        yield
+        return
+    ident = threading.get_ident()
+    call.add_thread(ident)
+    try:
+        yield
+    finally:
+        call.remove_thread(ident)
+
+
+def _write(call: _CallProfile) -> Path:
+    """Write the call's folded stacks, merge them into the tool's aggregate file, and
+    log the call to `calls.jsonl`."""
+    tool_dir = _directory / call.tool
+    tool_dir.mkdir(parents=True, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(call.started))
+    path = tool_dir / f"{stamp}-{next(_seq)}.folded"
+    path.write_text("".join(f"{s} {n}\n" for s, n in call.samples.most_common()))
+
+    with _write_lock:
+        aggregate_path = _directory / f"{call.tool}.folded"
+        aggregate: Counter = Counter()
+        if aggregate_path.exists():
+            for line in aggregate_path.read_text().splitlines():
+                stack, _, count = line.rpartition(" ")
+                aggregate[stack] += int(count)
+        aggregate.update(call.samples)
+        aggregate_path.write_text(
+            "".join(f"{s} {n}\n" for s, n in aggregate.most_common())
+        )
+
+        with open(_directory / "calls.jsonl", "a", encoding="utf-8") as f:
+            record = {
+                "tool": call.tool,
+                "started": call.started,
+                "duration_ms": call.duration * 1000,
+                "samples": sum(call.samples.values()),
+                "profile": str(path),
+                "error": call.error,
+            }
+            f.write(json.dumps(record) + "\n")
+    return path
+
+
+@contextmanager
+def _sampling(call: _CallProfile) -> Iterator[None]:
+    "Sample the threads added to `call` while the block runs"
+    token = _active.set(call)
+    t0 = time.perf_counter()
+    call.start()
+    try:
+        yield
+    except BaseException as e:
+        call.error = type(e).__name__
+        raise
+    finally:
+        call.stop()
+        call.duration = time.perf_counter() - t0
+        _active.reset(token)
+
+
+def profiled(fn: Callable) -> Callable:
+    """Profile calls to a tool function when profiling is turned on for it.
+
+    For a plain function the calling thread is sampled, along with any worker
+    threads the call uses (via `deadlines.run_in_thread`). For a coroutine only
+    those worker threads are: the event loop thread it runs on is shared with every
+    other request, so its samples could not be told apart - time spent in the
+    coroutine itself does not show up. When profiling is off the only cost is a set
+    lookup.
+    """
+    name = fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if not is_enabled(name):
+                return await fn(*args, **kwargs)
+            call = _CallProfile(name)
+            try:
+                with _sampling(call):
+                    return await fn(*args, **kwargs)
+            finally:
+                # Not on the event loop - the aggregate file can be large
+                await asyncio.to_thread(_write, call)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not is_enabled(name):
+            return fn(*args, **kwargs)
+        call = _CallProfile(name)
+        call.add_thread(threading.get_ident())
+        try:
+            with _sampling(call):
+                return fn(*args, **kwargs)
+        finally:
+            _write(call)
+
+    return wrapper
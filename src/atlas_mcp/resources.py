@@ -0,0 +1,307 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import weakref
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from urllib.parse import quote
+
+from mcp.server.fastmcp import FastMCP
+from mcp.server.lowlevel.helper_types import ReadResourceContents
+from mcp.server.lowlevel.server import NotificationOptions
+from mcp.types import Resource, ServerCapabilities
+from pydantic import AnyUrl
+
+import atlas_mcp.central_page as cp
+
+# The cached catalogs published as MCP resources:
+#   atlas://scopes                                  - the allowed scopes
+#   atlas://{scope}/hashtags                        - every hashtag 4-tuple seen
+#   atlas://{scope}/evnt/{tag1}/{tag2}/{tag3}/{tag4} - the EVNT samples of an address
+# Each carries an `etag` (a hash of its content) in `_meta`, in both the listing and
+# the read result, and subscribers are sent `resources/updated` when it changes.
+SCOPES_URI = "atlas://scopes"
+HASHTAGS_URI = "atlas://{scope}/hashtags"
+EVNT_URI = "atlas://{scope}/evnt/{tag1}/{tag2}/{tag3}/{tag4}"
+
+logger = logging.getLogger(__name__)
+
+
+def etag(content: str) -> str:
+    "Content hash used as the resource's ETag"
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+
+
+def hashtags_uri(scope: str) -> str:
+    return f"atlas://{scope}/hashtags"
+
+
+def evnt_uri(scope: str, hash_tags: Sequence[str]) -> str:
+    # Tags are plain words, but quote them anyway so a `/` can't split a segment
+    return f"atlas://{scope}/evnt/" + "/".join(quote(t, safe="") for t in hash_tags)
+
+
+def scopes_json() -> str:
+    return json.dumps([s.model_dump() for s in cp.get_allowed_scopes()])
+
+
+def hashtag_tree(scope: str) -> Dict[str, Any]:
+    """The hashtag 4-tuples seen so far for `scope`, as a nested tree: level 1 ->
+    level 2 -> level 3 -> sorted list of level 4 tags. Built from the cache only.
+    """
+    tree: Dict[str, Any] = {}
+    for tags in cp.cache.get(("fuzzy_search", scope, "addresses"), []):
+        level3 = tree.setdefault(tags[0], {}).setdefault(tags[1], {})
+        level3.setdefault(tags[2], []).append(tags[3])
+    for level2 in tree.values():
+        for level3 in level2.values():
+            for name, leaves in level3.items():
+                level3[name] = sorted(set(leaves))
+    return tree
+
+
+def hashtag_tree_json(scope: str) -> str:
+    return json.dumps(hashtag_tree(scope), sort_keys=True)
+
+
+def cached_evnt(scope: str, hash_tags: Sequence[str]) -> Optional[List[str]]:
+    "The cached EVNT listing of an address, or None - never calls the backend"
+    cpa = cp.CentralPageAddress(scope=scope, hash_tags=tuple(hash_tags))
+    return cp.cache.get(cp.get_evtgen_for_address.__cache_key__(cpa))
+
+
+def catalog_listing() -> List[Tuple[str, str, str]]:
+    """The concrete resources currently available from the cache, as (uri, name,
+    content) - the scope list, the hashtag tree of each scope something is known
+    about, and each cached EVNT listing.
+    """
+    listing = [(SCOPES_URI, "scopes", scopes_json())]
+    for scope in (s.scope for s in cp.get_allowed_scopes()):
+        if cp.cache.get(("fuzzy_search", scope, "addresses")):
+            listing.append(
+                (hashtags_uri(scope), f"{scope} hashtags", hashtag_tree_json(scope))
+            )
+        addresses = set(
+            tuple(t)
+            for t in cp.cache.get(("fuzzy_search", scope, "samples"), {}).values()
+        )
+        for tags in sorted(addresses):
+            samples = cached_evnt(scope, tags)
+            if samples is not None:
+                listing.append(
+                    (
+                        evnt_uri(scope, tags),
+                        f"{scope} {' '.join(tags)} EVNT",
+                        json.dumps(samples),
+                    )
+                )
+    return listing
+
+
+def catalog_entry(
+    scope: Optional[str], hash_tags: Optional[Tuple[str, ...]]
+) -> Tuple[str, Optional[str]]:
+    """The uri and content of one catalog resource (as named by
+    `central_page.catalog_changed`), the content None if it is not cached.
+    """
+    if scope is None:
+        return SCOPES_URI, scopes_json()
+    if hash_tags is None:
+        known = cp.cache.get(("fuzzy_search", scope, "addresses"))
+        return hashtags_uri(scope), hashtag_tree_json(scope) if known else None
+    samples = cached_evnt(scope, hash_tags)
+    return evnt_uri(scope, hash_tags), (
+        json.dumps(samples) if samples is not None else None
+    )
+
+
+class ResourceNotifier:
+    """Tracks which sessions list and subscribe to the catalog resources, and tells
+    them when the cache changes: `resources/list_changed` when a resource appears,
+    `resources/updated` to the subscribers of one whose ETag changed.
+
+    The cache writers in `central_page` report each catalog they change
+    (`mark_changed`), and `publish` - called after every tool call, as those are what
+    fill the cache - re-hashes only those and compares against the ETags it last
+    saw. When nothing was written it does no work at all.
+    """
+
+    def __init__(self):
+        self._sessions: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._subscribers: Dict[str, "weakref.WeakSet[Any]"] = {}
+        self._etags: Optional[Dict[str, str]] = None
+        self._lock = asyncio.Lock()
+        # (scope, hash_tags) of the catalogs written since the last publish; written
+        # from worker threads
+        self._changed: Set[Tuple[Optional[str], Optional[Tuple[str, ...]]]] = set()
+        self._everything_changed = False
+        self._changed_lock = threading.Lock()
+
+    def mark_changed(
+        self, scope: Optional[str], hash_tags: Optional[Tuple[str, ...]] = None
+    ) -> None:
+        """Note a catalog written to the cache - see `central_page.catalog_changed`.
+        Safe to call from any thread."""
+        if not self._sessions:
+            # Nobody is watching; `watch` starts again from a fresh baseline
+            return
+        with self._changed_lock:
+            if scope is None:
+                self._everything_changed = True
+            else:
+                self._changed.add((scope, tuple(hash_tags) if hash_tags else None))
+
+    def _take_changed(self) -> Tuple[bool, Set[Tuple[Any, Any]]]:
+        with self._changed_lock:
+            everything, changed = self._everything_changed, self._changed
+            self._everything_changed, self._changed = False, set()
+        return everything, changed
+
+    async def watch(self, session: Any) -> None:
+        "Send `session` list_changed notifications from now on"
+        if not self._sessions:
+            # Nobody was watching, so the last ETags seen may be long out of date
+            async with self._lock:
+                self._take_changed()
+                self._etags = await asyncio.to_thread(self._current_etags)
+        self._sessions.add(session)
+
+    async def subscribe(self, session: Any, uri: str) -> None:
+        await self.watch(session)
+        self._subscribers.setdefault(uri, weakref.WeakSet()).add(session)
+
+    def unsubscribe(self, session: Any, uri: str) -> None:
+        subscribers = self._subscribers.get(uri)
+        if subscribers is not None:
+            subscribers.discard(session)
+            if not subscribers:
+                del self._subscribers[uri]
+
+    @staticmethod
+    def _current_etags() -> Dict[str, str]:
+        return {uri: etag(content) for uri, _, content in catalog_listing()}
+
+    def _updated_etags(
+        self, previous: Dict[str, str], changed: Set[Tuple[Any, Any]]
+    ) -> Dict[str, str]:
+        current = dict(previous)
+        for scope, hash_tags in changed:
+            uri, content = catalog_entry(scope, hash_tags)
+            if content is not None:
+                current[uri] = etag(content)
+            elif uri in current:
+                del current[uri]
+            else:
+                # Reported before the memoized value landed in the cache - look
+                # again next time
+                self.mark_changed(scope, hash_tags)
+        return current
+
+    async def publish(self) -> None:
+        "Notify sessions of any resources added or changed since the last call"
+        if not self._sessions:
+            return
+        everything, changed = self._take_changed()
+        if not everything and not changed:
+            return
+        async with self._lock:
+            previous = self._etags
+            if everything or previous is None:
+                current = await asyncio.to_thread(self._current_etags)
+            else:
+                current = await asyncio.to_thread(
+                    self._updated_etags, previous, changed
+                )
+            previous = previous if previous is not None else current
+            self._etags = current
+
+            if set(current) != set(previous):
+                for session in list(self._sessions):
+                    await self._send(session.send_resource_list_changed())
+            for uri, subscribers in list(self._subscribers.items()):
+                if current.get(uri) != previous.get(uri):
+                    for session in list(subscribers):
+                        await self._send(session.send_resource_updated(AnyUrl(uri)))
+
+    async def _send(self, notification) -> None:
+        # A session that has gone away is not our problem
+        try:
+            await notification
+        except Exception as e:
+            logger.debug(f"Could not send resource notification: {e}")
+
+
+class CatalogMCP(FastMCP):
+    """FastMCP with resource ETags, subscriptions and change notifications.
+
+    Resource reads carry `{"etag": ...}` in `_meta`, the resource listing includes
+    every catalog cached so far (with its ETag), and `resources/subscribe` is
+    supported.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.notifier = ResourceNotifier()
+        cp.on_catalog_change(self.notifier.mark_changed)
+        self._mcp_server.subscribe_resource()(self.subscribe_resource)
+        self._mcp_server.unsubscribe_resource()(self.unsubscribe_resource)
+
+        # The low level server does not advertise subscriptions or resource list
+        # changes, whatever handlers are registered.
+        get_capabilities = self._mcp_server.get_capabilities
+
+        def capabilities(notification_options, experimental) -> ServerCapabilities:
+            notification_options = NotificationOptions(
+                prompts_changed=notification_options.prompts_changed,
+                resources_changed=True,
+                tools_changed=notification_options.tools_changed,
+            )
+            result = get_capabilities(notification_options, experimental)
+            if result.resources is not None:
+                result.resources.subscribe = True
+            return result
+
+        self._mcp_server.get_capabilities = capabilities  # type: ignore[method-assign]
+
+    def _session(self) -> Any:
+        return self.get_context().session
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]):
+        result = await super().call_tool(name, arguments)
+        await self.notifier.publish()
+        return result
+
+    async def list_resources(self) -> List[Resource]:
+        await self.notifier.watch(self._session())
+        registered = {str(r.uri): r for r in await super().list_resources()}
+        resources = []
+        for uri, name, content in await asyncio.to_thread(catalog_listing):
+            r = registered.get(uri) or Resource(
+                uri=uri,  # type: ignore[arg-type]
+                name=name,
+                mimeType="application/json",
+            )
+            resources.append(
+                r.model_copy(update={"meta": {**(r.meta or {}), "etag": etag(content)}})
+            )
+        return resources
+
+    async def read_resource(self, uri) -> Iterable[ReadResourceContents]:
+        contents = [
+            ReadResourceContents(
+                content=c.content,
+                mime_type=c.mime_type,
+                meta={**(c.meta or {}), "etag": etag(str(c.content))},
+            )
+            for c in await super().read_resource(uri)
+        ]
+        # Reading an EVNT listing can fill the cache too
+        await self.notifier.publish()
+        return contents
+
+    async def subscribe_resource(self, uri: AnyUrl) -> None:
+        await self.notifier.subscribe(self._session(), str(uri))
+
+    async def unsubscribe_resource(self, uri: AnyUrl) -> None:
+        self.notifier.unsubscribe(self._session(), str(uri))
@@ -0,0 +1,230 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from atlas_mcp import deadlines, tracing
+
+
+class Priority(IntEnum):
+    "Who a backend call is for - lower values are served first"
+
+    INTERACTIVE = 0
+    BATCH = 1
+    PREWARM = 2
+
+
+_priority: ContextVar[Priority] = ContextVar(
+    "atlas_mcp_priority", default=Priority.INTERACTIVE
+)
+
+
+@contextmanager
+def priority(p: Priority) -> Iterator[None]:
+    """Backend calls made inside (including in threads started with
+    `asyncio.to_thread`) are queued at priority `p`. Calls are interactive unless
+    told otherwise."""
+    token = _priority.set(p)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _priority.get()
+
+
+class TokenBucket:
+    "Allows `rate` calls a second on average, in bursts of up to `burst`. Not locked."
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token if there is one, returning 0, otherwise return how many
+        seconds until there will be one."""
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class PriorityStats(BaseModel):
+    queued: int = Field(default=0, description="Calls waiting for a slot")
+    served: int = Field(default=0, description="Calls that have been given a slot")
+    wait_p95_ms: float = Field(default=0.0, description="p95 queue wait, recent calls")
+    wait_max_ms: float = Field(
+        default=0.0, description="Longest queue wait, recent calls"
+    )
+
+
+class SchedulerStats(BaseModel):
+    backend: str = Field(description="Backend name")
+    running: int = Field(description="Calls running now")
+    max_concurrent: int = Field(description="Most calls allowed to run at once")
+    rate: float = Field(description="Calls a second allowed, on average")
+    by_priority: Dict[str, PriorityStats] = Field(
+        description="Queue depth and waits, per priority class"
+    )
+
+
+class Scheduler:
+    """Admits calls to one backend in priority order (interactive, then batch, then
+    prewarm; first come first served within a class), at most `max_concurrent` at
+    once and no faster than the token bucket allows.
+
+    Time spent queued counts against the caller's deadline (see `deadlines`).
+    """
+
+    def __init__(self, name: str, max_concurrent: int, rate: float, burst: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self._bucket = TokenBucket(rate, burst)
+        self._cond = threading.Condition()
+        self._queue: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._running = 0
+        self._queued = {p: 0 for p in Priority}
+        self._served = {p: 0 for p in Priority}
+        self._waits: Dict[Priority, Deque[float]] = {
+            p: deque(maxlen=1000) for p in Priority
+        }
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        "Wait for this backend to be free for a call, and hold it while inside"
+        self._acquire()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    def _acquire(self) -> None:
+        p = current_priority()
+        attributes = {"scheduler.backend": self.name, "scheduler.priority": p.name}
+        with tracing.span("scheduler.wait", attributes):
+            self._wait_for_slot(p)
+
+    def _wait_for_slot(self, p: Priority) -> None:
+        queued_at = time.monotonic()
+        with self._cond:
+            entry = (int(p), next(self._seq))
+            heapq.heappush(self._queue, entry)
+            self._queued[p] += 1
+            try:
+                while True:
+                    if deadlines.cancelled():
+                        raise deadlines.BackendCancelledError(
+                            f"Cancelled while waiting for the {self.name} backend"
+                        )
+                    left = deadlines.remaining()
+                    if left is not None and left <= 0:
+                        raise deadlines.BackendTimeoutError(
+                            f"Timed out after {time.monotonic() - queued_at:.0f}s "
+                            f"waiting for the {self.name} backend - it is busy"
+                        )
+
+                    wait = deadlines.poll_interval
+                    if self._queue[0] == entry and self._running < self.max_concurrent:
+                        delay = self._bucket.take()
+                        if delay == 0:
+                            break
+                        wait = min(wait, delay)
+                    if left is not None:
+                        wait = min(wait, left)
+                    self._cond.wait(wait)
+            except BaseException:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+            finally:
+                self._queued[p] -= 1
+
+            heapq.heappop(self._queue)
+            self._running += 1
+            self._served[p] += 1
+            self._waits[p].append(time.monotonic() - queued_at)
+            # The next in line may be able to go too
+            self._cond.notify_all()
+
+    def stats(self) -> SchedulerStats:
+        with self._cond:
+            by_priority = {}
+            for p in Priority:
+                waits = sorted(self._waits[p])
+                by_priority[p.name.lower()] = PriorityStats(
+                    queued=self._queued[p],
+                    served=self._served[p],
+                    wait_p95_ms=(
+                        waits[int(0.95 * (len(waits) - 1))] * 1000 if waits else 0.0
+                    ),
+                    wait_max_ms=waits[-1] * 1000 if waits else 0.0,
+                )
+            return SchedulerStats(
+                backend=self.name,
+                running=self._running,
+                max_concurrent=self.max_concurrent,
+                rate=self._bucket.rate,
+                by_priority=by_priority,
+            )
+
+
+def _from_env(name: str, setting: str, default: float) -> float:
+    return float(os.environ.get(f"ATLAS_MCP_{name.upper()}_{setting}", default))
+
+
+_schedulers: Dict[str, Scheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(name: str) -> Scheduler:
+    """The scheduler for backend `name`, created on first use.
+
+    Limits come from ATLAS_MCP_<NAME>_CONCURRENCY (default 4), ATLAS_MCP_<NAME>_RATE
+    (calls a second, default 2) and ATLAS_MCP_<NAME>_BURST (default 5).
+    """
+    with _schedulers_lock:
+        s = _schedulers.get(name)
+        if s is None:
+            s = Scheduler(
+                name,
+                max_concurrent=int(_from_env(name, "CONCURRENCY", 4)),
+                rate=_from_env(name, "RATE", 2.0),
+                burst=_from_env(name, "BURST", 5.0),
+            )
+            _schedulers[name] = s
+        return s
+
+
+def all_stats() -> List[SchedulerStats]:
+    "Stats for every backend that has been used"
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    return [s.stats() for s in schedulers]
+
+
+def reset(name: Optional[str] = None) -> None:
+    "Forget the scheduler for `name` (or all of them) - limits are re-read on next use"
+    with _schedulers_lock:
+        if name is None:
+            _schedulers.clear()
+        else:
+            _schedulers.pop(name, None)
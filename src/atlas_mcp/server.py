@@ -1,15 +1,78 @@
 import json
-from typing import List
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import unquote
 
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import Context
 
 import atlas_mcp.central_page as cp
+from atlas_mcp import (
+    breaker,
+    campaigns,
+    deadlines,
+    formats,
+    normalization,
+    pipeline,
+    profiling,
+    resources,
+    scheduler,
+    streaming,
+    tracing,
+)
+from atlas_mcp.did_parser import parse_dids
 from atlas_mcp import prompts as myprompts
 
-mcp = FastMCP("atlas_standard_MonteCarlo_catalog")
+mcp = resources.CatalogMCP("atlas_standard_MonteCarlo_catalog")
+
+# `resolve_samples` makes many backend calls, so it gets a longer deadline than the
+# single-call tools (`deadlines.default_timeout`, ATLAS_MCP_BACKEND_TIMEOUT).
+resolve_samples_timeout = float(os.environ.get("ATLAS_MCP_RESOLVE_TIMEOUT", "1800"))
+
+
+def _report_lines(
+    ctx: Optional[Context], keep: Callable[[str], bool] = lambda line: True
+) -> Optional[Callable[[str], Awaitable[None]]]:
+    """Report each line of backend output `keep` accepts as a progress notification
+    (for `streaming.run_streaming`), so clients see results as they come in."""
+    if ctx is None:
+        return None
+    count = 0
+
+    async def report(line: str) -> None:
+        nonlocal count
+        if line.strip() and keep(line):
+            count += 1
+            await ctx.report_progress(count, message=line)
+
+    return report
+
+
+def _annotate_samples(
+    results: List[Dict[str, Any]], latest_only: bool, campaign: str, sim_type: str
+) -> List[Dict[str, Any]]:
+    "Add `period` and `sim_type` to `get_samples_for_run` rows, and filter them"
+    annotated = []
+    for r in results:
+        c = campaigns.campaign_for_did(r["dataset"])
+        if not campaigns.matches(c, period=campaign, sim_type=sim_type):
+            continue
+        annotated.append(
+            {
+                **r,
+                "period": c.period if c is not None else "",
+                "sim_type": c.sim_type if c is not None else "",
+            }
+        )
+
+    if latest_only:
+        latest = set(parse_dids(r["dataset"] for r in annotated).latest_p_tag().did)
+        annotated = [r for r in annotated if r["dataset"] in latest]
+    return annotated
 
 
 @mcp.tool()
+@tracing.traced
+@profiling.profiled
 def get_allowed_scopes() -> str:
     """Returns a list of allowed scopes/data-taking-periods
     for the CentralPage MC Sample catalog.
@@ -20,8 +83,13 @@ def get_allowed_scopes() -> str:
 
 
 @mcp.tool()
-def get_addresses_for_keyword(
-    scope: str, keyword: str, baseline_only: bool = True
+@tracing.traced
+@profiling.profiled
+async def get_addresses_for_keyword(
+    scope: str,
+    keyword: str,
+    baseline_only: bool = True,
+    ctx: Optional[Context] = None,
 ) -> str:
     """Searches the PMG group's Standard Model Monte Carlo datasets for a hashtag that
     contains `keyword`. Only hashtags in `scope` are considered. Full 4-tuples hashtags
@@ -36,33 +104,172 @@ def get_addresses_for_keyword(
     If one needs samples that are alternative for for systematic comparisons, change the
     `baseline_only` parameter.
 
+    If progress is requested, each 4-tuple is also sent (space separated) as a
+    progress message as soon as the backend finds it.
+
     Returns json
     """
-    addresses = cp.get_address_for_keyword(scope, keyword)
+
+    def wanted(line: str) -> bool:
+        tags = line.split()
+        return len(tags) == 4 and (not baseline_only or tags[2] == "Baseline")
+
+    addresses = await streaming.run_streaming(
+        _report_lines(ctx, wanted),
+        cp.get_address_for_keyword,
+        scope,
+        keyword,
+        level3="Baseline" if baseline_only else "",
+    )
     if baseline_only:
         addresses = [addr for addr in addresses if addr.hash_tags[2] == "Baseline"]
     return json.dumps([addr.model_dump() for addr in addresses])
 
 
 @mcp.tool()
-def get_evtgen_for_address(scope: str, hashtags: List[str]) -> str:
+@tracing.traced
+@profiling.profiled
+async def get_addresses_for_keyword_all_scopes(
+    keyword: str,
+    scopes: Optional[List[str]] = None,
+    baseline_only: bool = True,
+    ctx: Optional[Context] = None,
+) -> str:
+    """Like `get_addresses_for_keyword`, but searches several scopes at once - all
+    the allowed scopes (see `get_allowed_scopes`), or just those in `scopes`. Use it
+    to compare what is available in, e.g., Run 2 and Run 3, rather than calling
+    `get_addresses_for_keyword` once per scope: the scopes are searched in parallel.
+
+    Returns json: `addresses`, the hashtag 4-tuples found, each with its `scope`
+    (grouped by scope, in the order of `scopes`), and `failed`, the error for any
+    scope that could not be searched. If progress is requested, a message is sent
+    as each scope finishes.
+    """
+
+    async def report(scope: str, found: list, done: int, total: int):
+        if ctx is not None:
+            await ctx.report_progress(
+                done, total, message=f"{scope}: {len(found)} addresses"
+            )
+
+    result = await pipeline.search_scopes(
+        keyword,
+        scopes,
+        level3="Baseline" if baseline_only else "",
+        on_scope_done=report,
+    )
+    return result.model_dump_json()
+
+
+@mcp.tool()
+@tracing.traced
+@profiling.profiled
+async def search_addresses(
+    scope: str, query: str, baseline_only: bool = True, limit: int = 20
+) -> str:
+    """Fuzzy, ranked search of the PMG hashtag 4-tuples and EVNT sample physics short
+    names in `scope`. Use this instead of retrying `get_addresses_for_keyword` with
+    different spellings: the query may be free-form ("top pair", "tt", "dijets",
+    "W+jets"), common synonyms are understood, and small typos are tolerated.
+
+    Each hit has a `kind` - "address" for a hashtag 4-tuple, or "sample" for an EVNT
+    dataset (its `name`, plus the 4-tuple it was found under) - and a `score`, best
+    first. By default only `Baseline` hashtag combinations are returned.
+
+    Returns json
+    """
+    hits = await deadlines.run_in_thread(cp.search_hashtags, scope, query, limit=None)
+    if baseline_only:
+        hits = [h for h in hits if h.hash_tags[2] == "Baseline"]
+    return json.dumps([h.model_dump() for h in hits[:limit]])
+
+
+@mcp.tool()
+@tracing.traced
+@profiling.profiled
+def search_datasets(scope: str, query: str, tier: str = "") -> str:
+    """Full-text search of the datasets this server has already seen in `scope` - every
+    EVNT, derivation and metadata result that has passed through the other tools. It
+    matches the dataset name, physics short name and description, and makes no
+    backend call, so try it first: most follow-up questions can be answered from it.
+
+    `tier` restricts the results ("EVNT", "PHYSLITE", "PHYS", "DAOD_LLP1", ...); leave
+    it empty for any tier. An empty result only means the dataset has not been seen
+    yet - fall back on the hashtag tools.
+
+    Returns json
+    """
+    records = cp.search_datasets(scope, query, tier=tier)
+    return json.dumps([r.model_dump() for r in records])
+
+
+@mcp.tool()
+@tracing.traced
+@profiling.profiled
+async def get_evtgen_for_address(
+    scope: str,
+    hashtags: List[str],
+    physics_short_contains: str = "",
+    format: str = "json",
+    ctx: Optional[Context] = None,
+) -> str:
     """Returns a list of event generator (evtgen) sample names for a given CentralPageAddress.
     These will be rucio dataset names, for datasets that contains the output of
     the MC generation step. All samples for this address are returned. Parse the sample
     names to find the ones required. Sample names often contain decay channels, etc.
 
-    Returns json
+    If `physics_short_contains` is given, only samples whose physics short name (the
+    third field of the name, e.g. `PhPy8EG_A14_ttbar_hdamp258p75_allhad`) contains it
+    (case-insensitive) are returned - use it to pick out a decay channel or slice
+    rather than downloading the full list.
+
+    For long listings use `format="columns"` (JSON with one array per column) or
+    `format="tsv"`: each dataset name is split into its fields (`did_template` shows
+    how to put them back together), values shared by every row are given once
+    under `constant`, and prefixes shared by every value of a column (e.g. the
+    `e8514_s4369_r16083_` of the AMI tags) once under `prefix`. These are several
+    times smaller than the default `json`.
+
+    If progress is requested, each sample name is also sent as a progress message as
+    soon as the backend lists it, so work can start before the listing is complete.
+
+    Returns json (or tsv)
     """
     if len(hashtags) != 4:
         raise ValueError("hashtags must be a list of 4 strings")
 
+    def wanted(line: str) -> bool:
+        return not physics_short_contains or bool(
+            parse_dids([line]).filter(physics_short_contains=physics_short_contains).did
+        )
+
     cpa = cp.CentralPageAddress(scope=scope, hash_tags=tuple(hashtags))
-    samples = cp.get_evtgen_for_address(cpa)
+    samples = await streaming.run_streaming(
+        _report_lines(ctx, wanted), cp.get_evtgen_for_address, cpa
+    )
+    if physics_short_contains:
+        samples = (
+            parse_dids(samples)
+            .filter(physics_short_contains=physics_short_contains)
+            .did
+        )
+    if format != "json":
+        return formats.render([{"dataset": ds} for ds in samples], format)
     return json.dumps(samples)
 
 
 @mcp.tool()
-def get_samples_for_run(scope: str, run_number: str, data_tier: str) -> str:
+@tracing.traced
+@profiling.profiled
+async def get_samples_for_run(
+    scope: str,
+    run_number: str,
+    data_tier: str,
+    latest_only: bool = False,
+    campaign: str = "",
+    sim_type: str = "",
+    format: str = "json",
+) -> str:
     """Returns a list of rucio dataset names of a particular data_tier for a given EVTGEN sample
     and scope.
 
@@ -72,16 +279,64 @@ def get_samples_for_run(scope: str, run_number: str, data_tier: str) -> str:
     otherwise requested.
 
     Returns the datasets and the ATLAS MC Campaigns. Those without a MC campaign should
-    probably be ignored.
+    probably be ignored. Each dataset is also annotated with its `period` (e.g. "mc23a")
+    and `sim_type` ("FS" full simulation, "AF3"/"AF2" fast simulation), decoded from its
+    AMI tags.
 
-    Returns json
+    Use `campaign` to only return one campaign ("mc23a", or "mc23" for all of Run 3),
+    and `sim_type` to only return "FS" or "AF3" samples. If `latest_only` is True, only
+    the newest derivation (highest p-tag) of each sample/campaign is returned.
+
+    `format` may be "columns" or "tsv" for a compact listing, as for
+    `get_evtgen_for_address` - the extra fields (campaign etc.) become columns too.
+
+    Returns json (or tsv)
+    """
+    results = await deadlines.run_in_thread(
+        cp.get_samples_for_run, scope, run_number, data_tier
+    )
+    if not isinstance(results, list):
+        return json.dumps(results)
+    return formats.render(
+        _annotate_samples(results, latest_only, campaign, sim_type), format
+    )
+
+
+@mcp.tool()
+@tracing.traced
+@profiling.profiled
+async def get_samples_for_runs(
+    scope: str,
+    run_numbers: List[str],
+    data_tiers: Optional[List[str]] = None,
+    latest_only: bool = False,
+    campaign: str = "",
+    sim_type: str = "",
+) -> str:
+    """Like `get_samples_for_run`, but for many runs and several data tiers at once -
+    use it instead of calling `get_samples_for_run` for each run and tier, e.g. to
+    list PHYSLITE and PHYS for every run of a hashtag address.
+
+    data_tiers defaults to ["PHYSLITE"]. `latest_only`, `campaign` and `sim_type`
+    filter as for `get_samples_for_run`.
+
+    Returns json: `samples`, run number -> data tier -> the datasets (annotated as
+    by `get_samples_for_run`), and `failed`, run number -> data tier -> error for
+    any lookup that failed.
     """
-    results = cp.get_samples_for_run(scope, run_number, data_tier)
-    return json.dumps(results)
+    result = await pipeline.get_samples_for_runs(
+        scope, run_numbers, data_tiers or ["PHYSLITE"]
+    )
+    for by_tier in result.samples.values():
+        for tier, rows in by_tier.items():
+            by_tier[tier] = _annotate_samples(rows, latest_only, campaign, sim_type)
+    return result.model_dump_json()
 
 
 @mcp.tool()
-def get_metadata(
+@tracing.traced
+@profiling.profiled
+async def get_metadata(
     scope: str, dataset_name: str, use_top_of_provenance: bool = False
 ) -> str:
     """Returns metadata for a given dataset as JSON. This includes cross section,
@@ -93,16 +348,209 @@ def get_metadata(
 
     Returns json
     """
-    md = cp.get_metadata(
-        scope, dataset_name, use_top_of_provenance=use_top_of_provenance
+    md = await deadlines.run_in_thread(
+        cp.get_metadata,
+        scope,
+        dataset_name,
+        use_top_of_provenance=use_top_of_provenance,
     )
     return json.dumps(md)
 
 
+@mcp.tool()
+@tracing.traced
+@profiling.profiled
+async def refresh_datasets(
+    scope: str,
+    hashtags: Optional[List[str]] = None,
+    run_number: str = "",
+    data_tier: str = "",
+) -> str:
+    """Checks the backend for datasets that have appeared since a listing was last
+    fetched, and merges them into the server's cached listing. Returns only the new
+    datasets (`added`), plus when the listing was previously synced.
+
+    Use this when a listing may be out of date (e.g. looking for a new derivation).
+    Give `hashtags` (a 4-tuple) to refresh an EVNT listing, or `run_number` and
+    `data_tier` to refresh the samples of a run.
+
+    Returns json
+    """
+    if hashtags is not None:
+        if len(hashtags) != 4:
+            raise ValueError("hashtags must be a list of 4 strings")
+        cpa = cp.CentralPageAddress(scope=scope, hash_tags=tuple(hashtags))
+        result = await deadlines.run_in_thread(cp.refresh_evtgen_for_address, cpa)
+    elif run_number and data_tier:
+        result = await deadlines.run_in_thread(
+            cp.refresh_samples_for_run, scope, run_number, data_tier
+        )
+    else:
+        raise ValueError("Give either `hashtags`, or `run_number` and `data_tier`")
+    return result.model_dump_json()
+
+
+@mcp.tool()
+@tracing.traced
+@profiling.profiled
+async def resolve_samples(
+    scope: str,
+    data_tier: str,
+    ctx: Context,
+    hashtags: Optional[List[str]] = None,
+    run_numbers: Optional[List[str]] = None,
+) -> str:
+    """One-shot lookup of the samples for a hashtag address (or a list of run numbers):
+    lists the EVNT samples, finds the `data_tier` datasets for each run, and fetches
+    each run's metadata, all in one call. Use this instead of chaining
+    `get_evtgen_for_address`, `get_samples_for_run` and `get_metadata` by hand.
+
+    `hashtags` is a 4-tuple as returned by `get_addresses_for_keyword`. data_tier should
+    be "PHYSLITE", "PHYS", "DAOD_LLP1", etc. Default to PHYSLITE unless otherwise
+    requested. Progress is reported as each run completes.
+
+    Each returned record has the dataset name (`did`), cross section in pb (`x_sec`),
+    `generator_filter_eff`, `k_factor` (always 1.0 - AMI does not carry it), the tier
+    (`d_type`), the simulation type (`s_type`, FS or AF3, etc.) and the MC campaign
+    (`period`). Datasets without an MC campaign are dropped. Runs that could not be
+    resolved are listed, with their error, in `failed` - the others are still
+    returned.
+
+    Returns json: {"samples": [records], "failed": {run number: error}}
+    """
+    if hashtags is not None and len(hashtags) != 4:
+        raise ValueError("hashtags must be a list of 4 strings")
+
+    async def report(run_number: str, infos: list, done: int, total: int):
+        await ctx.report_progress(
+            done, total, message=f"run {run_number}: {len(infos)} datasets"
+        )
+
+    with deadlines.deadline(resolve_samples_timeout):
+        result = await pipeline.resolve_samples(
+            scope,
+            data_tier,
+            hashtags=hashtags,
+            run_numbers=run_numbers,
+            on_run_done=report,
+        )
+    return result.model_dump_json()
+
+
+@mcp.tool()
+@tracing.traced
+@profiling.profiled
+async def normalize_samples(
+    scope: str,
+    datasets: List[str],
+    lumi: Dict[str, float],
+    sum_of_weights: Optional[Dict[str, float]] = None,
+    k_factors: Optional[Dict[str, float]] = None,
+) -> str:
+    """Computes the normalization of many MC samples at once - use it rather than
+    working out weights by hand from `get_metadata`.
+
+    `datasets` are rucio dataset names (any tier) in `scope`. `lumi` maps each MC
+    campaign ("mc20a", "mc23e", ...) to the integrated luminosity of the data it is
+    compared to, in fb^-1 - ask the user for these if they are not known.
+    `sum_of_weights` maps dataset name to the sum of generator weights (or number
+    of events) of the sample, and `k_factors` maps DSID to k-factor (1.0 if not
+    given - AMI does not carry them).
+
+    For each sample: `x_sec` (pb), `filter_eff`, `k_factor`, `sigma_eff` (their
+    product), `expected_events` (sigma_eff x lumi), and - if its sum of weights was
+    given - the per-event `weight` (expected_events / sum_of_weights) and
+    `effective_lumi` (fb^-1). `campaigns` has each campaign's share of the
+    luminosity and expected events. Datasets with no cross section or no luminosity
+    for their campaign are listed in `missing_metadata` and `missing_lumi`; `failed`
+    has the error for each DSID whose metadata could not be fetched.
+
+    Returns json
+    """
+    fetched = await normalization.fetch_metadata(scope, datasets)
+    result = normalization.normalize(
+        datasets,
+        fetched.metadata,
+        lumi,
+        sum_of_weights=sum_of_weights,
+        k_factors=k_factors,
+        failed=fetched.failed,
+    )
+    return result.model_dump_json()
+
+
+@mcp.tool()
+@tracing.traced
+@profiling.profiled
+def get_backend_status() -> str:
+    """Reports the health and load of the AMI backend. `breaker` says whether it is
+    up: "closed" is normal, "open" means it has been failing (an expired grid proxy,
+    a stopped WSL distro, AMI down) and calls fail straight away until `retry_in`
+    seconds have passed. `scheduler` has the calls running, calls queued and recent
+    queue waits for each priority class (interactive tool calls go ahead of batch
+    and prewarm work).
+
+    Use it to explain slow or failing answers - do not retry a failing tool in a
+    loop while the breaker is open.
+
+    Returns json
+    """
+    status: Dict[str, Dict[str, Any]] = {}
+    for s in scheduler.all_stats():
+        status.setdefault(s.backend, {"backend": s.backend})
+        status[s.backend]["scheduler"] = s.model_dump()
+    for b in breaker.all_stats():
+        status.setdefault(b.backend, {"backend": b.backend})
+        status[b.backend]["breaker"] = b.model_dump()
+    return json.dumps(list(status.values()))
+
+
+@mcp.tool()
+@tracing.traced
+def set_profiling(tools: List[str]) -> str:
+    """Admin tool: profile calls to the named tools (`*` for all of them) from now on,
+    or stop profiling with an empty list. Only use this when the user asks to
+    profile the server.
+
+    A folded-stack profile of each call is written to the profile directory, with a
+    per-tool aggregate (`<tool>.folded`, for flamegraph.pl or speedscope) and a log
+    of the calls (`calls.jsonl`).
+
+    Returns json
+    """
+    return profiling.configure(tools).model_dump_json()
+
+
 # Optional: register prompts so they appear as /mcp.myServer.greet
 myprompts.register(mcp)
 
 
+@mcp.resource(resources.SCOPES_URI, mime_type="application/json")
+def scopes_resource() -> str:
+    """The allowed scopes/data-taking-periods, as returned by `get_allowed_scopes`."""
+    return resources.scopes_json()
+
+
+@mcp.resource(resources.HASHTAGS_URI, mime_type="application/json")
+def hashtags_resource(scope: str) -> str:
+    """Every hashtag 4-tuple seen so far in `scope`, as a tree: level 1 -> level 2 ->
+    level 3 -> list of level 4 tags. Only what the server has already fetched - it
+    grows as `get_addresses_for_keyword` and `search_addresses` are used.
+    """
+    return resources.hashtag_tree_json(scope)
+
+
+@mcp.resource(resources.EVNT_URI, mime_type="application/json")
+async def evnt_resource(scope: str, tag1: str, tag2: str, tag3: str, tag4: str) -> str:
+    """The EVNT sample names for a hashtag 4-tuple, as returned by
+    `get_evtgen_for_address`.
+    """
+    cpa = cp.CentralPageAddress(
+        scope=scope, hash_tags=tuple(unquote(t) for t in (tag1, tag2, tag3, tag4))
+    )
+    return json.dumps(await deadlines.run_in_thread(cp.get_evtgen_for_address, cpa))
+
+
 def main() -> None:
     # stdio is the default; this runs the server loop
     mcp.run()
@@ -0,0 +1,165 @@
+import gzip
+import pickle
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from diskcache import Cache
+from pydantic import BaseModel, Field
+
+import atlas_mcp.central_page as cp
+from atlas_mcp.catalog_index import CatalogIndex
+
+SNAPSHOT_FORMAT = "atlas-mcp-snapshot"
+SNAPSHOT_VERSION = 1
+
+
+class SnapshotStats(BaseModel):
+    created: float = Field(description="When the snapshot was written (epoch seconds)")
+    entries: Dict[str, int] = Field(
+        default_factory=dict, description="Cache entries, by function/kind"
+    )
+    skipped_expired: int = Field(default=0, description="Entries that had expired")
+    catalog_datasets: int = Field(default=0, description="Catalog index datasets")
+
+
+def _entry_kind(key: Any) -> str:
+    "What a cache key is for - the memoized function name, or the index name"
+    if isinstance(key, tuple) and key and isinstance(key[0], str):
+        return key[0].rsplit(".", 1)[-1]
+    return "other"
+
+
+def export_snapshot(
+    path: Union[str, Path],
+    cache: Optional[Cache] = None,
+    catalog: Optional[CatalogIndex] = None,
+) -> SnapshotStats:
+    """Write the memoized backend results, the hashtag search index and the dataset
+    catalog to a single compressed snapshot file.
+
+    Every cache entry is written with its absolute expiry time, so entries keep
+    their remaining lifetime when loaded elsewhere.
+
+    Args:
+        path (Union[str, Path]): File to write
+        cache (Cache, optional): Cache to export, defaults to the server's
+        catalog (CatalogIndex, optional): Catalog to export, defaults to the server's
+
+    Returns:
+        SnapshotStats: What was written
+    """
+    cache = cache if cache is not None else cp.cache
+    catalog = catalog if catalog is not None else cp.catalog
+
+    now = time.time()
+    stats = SnapshotStats(created=now)
+    counts: Counter = Counter()
+    with gzip.open(path, "wb") as f:
+        pickle.dump(
+            {"format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION, "created": now},
+            f,
+        )
+        missing = object()
+        for key in cache.iterkeys():
+            value, expire_time = cache.get(key, default=missing, expire_time=True)
+            # (expired entries that have not been culled yet come back as `missing`)
+            if value is missing or (expire_time is not None and expire_time <= now):
+                stats.skipped_expired += 1
+                continue
+            pickle.dump(("cache", key, value, expire_time), f)
+            counts[_entry_kind(key)] += 1
+
+        rows = catalog.dump()
+        pickle.dump(("catalog", rows), f)
+        stats.catalog_datasets = len(rows["datasets"])
+
+    stats.entries = dict(counts)
+    return stats
+
+
+def _merge(existing: Any, value: Any) -> Any:
+    "Merge the recorded fuzzy search tuples/samples with an incoming set"
+    if isinstance(existing, dict):
+        return {**value, **existing}
+    return sorted(set(existing) | set(value))
+
+
+def import_snapshot(
+    path: Union[str, Path],
+    cache: Optional[Cache] = None,
+    catalog: Optional[CatalogIndex] = None,
+    overwrite: bool = False,
+) -> SnapshotStats:
+    """Bulk load a snapshot written by `export_snapshot`.
+
+    Entries that have expired since the snapshot was taken are skipped. By default
+    entries already in the local cache are kept (they are at least as fresh); the
+    recorded hashtag search data is merged either way.
+
+    Snapshots are pickles - only load ones you (or your own nightly job) wrote.
+
+    Args:
+        path (Union[str, Path]): Snapshot file
+        cache (Cache, optional): Cache to load into, defaults to the server's
+        catalog (CatalogIndex, optional): Catalog to load into, defaults to the server's
+        overwrite (bool): Replace entries that are already in the local cache
+
+    Returns:
+        SnapshotStats: What was loaded
+    """
+    cache = cache if cache is not None else cp.cache
+    catalog = catalog if catalog is not None else cp.catalog
+
+    now = time.time()
+    counts: Counter = Counter()
+    with gzip.open(path, "rb") as f:
+        header = pickle.load(f)
+        if not isinstance(header, dict) or header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} is not an atlas-mcp snapshot")
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot version {header.get('version')} "
+                f"(expected {SNAPSHOT_VERSION})"
+            )
+        stats = SnapshotStats(created=header["created"])
+
+        with cache.transact():
+            while True:
+                try:
+                    record = pickle.load(f)
+                except EOFError:
+                    break
+
+                if record[0] == "catalog":
+                    catalog.load(record[1])
+                    stats.catalog_datasets = len(record[1]["datasets"])
+                    continue
+
+                _, key, value, expire_time = record
+                expire = None
+                if expire_time is not None:
+                    expire = expire_time - now
+                    if expire <= 0:
+                        stats.skipped_expired += 1
+                        continue
+
+                kind = _entry_kind(key)
+                if kind == "fuzzy_search":
+                    existing = cache.get(key)
+                    if existing is not None:
+                        value = _merge(existing, value)
+                    cache.set(key, value, expire=expire)
+                elif overwrite:
+                    cache.set(key, value, expire=expire)
+                elif not cache.add(key, value, expire=expire):
+                    continue
+                counts[kind] += 1
+
+    # The in-memory search indices are now stale
+    cp._search_indices.clear()
+    cp.catalog_changed()
+
+    stats.entries = dict(counts)
+    return stats
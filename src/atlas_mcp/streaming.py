@@ -0,0 +1,81 @@
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterator, Optional, TypeVar
+
+from atlas_mcp import deadlines
+
+T = TypeVar("T")
+
+# Who wants to hear about backend output as it is printed. A context variable, so it
+# follows the call into the thread it runs in; `run_ami_helper` passes each line of
+# ami-helper output (after the start marker) to it.
+_listener: ContextVar[Optional[Callable[[str], None]]] = ContextVar(
+    "atlas_mcp_output_listener", default=None
+)
+
+
+@contextmanager
+def listen(callback: Callable[[str], None]) -> Iterator[None]:
+    "Send each line of backend output printed inside to `callback`"
+    token = _listener.set(callback)
+    try:
+        yield
+    finally:
+        _listener.reset(token)
+
+
+def listener() -> Optional[Callable[[str], None]]:
+    "The current backend output listener, if there is one"
+    return _listener.get()
+
+
+async def run_streaming(
+    on_line: Optional[Callable[[str], Awaitable[None]]],
+    fn: Callable[..., T],
+    *args,
+    **kwargs,
+) -> T:
+    """Run `fn` in a thread (see `deadlines.run_in_thread`), awaiting `on_line` on
+    the event loop for each line of backend output as it arrives - so results can
+    be passed on before the backend call is finished.
+
+    Nothing is streamed if the result comes from the cache. If `on_line` is None
+    this is just `deadlines.run_in_thread`.
+
+    Args:
+        on_line (Callable, optional): Called with each line of output
+        fn (Callable): The function to run
+
+    Returns:
+        T: What `fn` returns
+    """
+    if on_line is None:
+        return await deadlines.run_in_thread(fn, *args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    lines: asyncio.Queue = asyncio.Queue()
+
+    def put(line: str) -> None:
+        loop.call_soon_threadsafe(lines.put_nowait, line)
+
+    with listen(put):
+        call = asyncio.ensure_future(deadlines.run_in_thread(fn, *args, **kwargs))
+
+    next_line: Optional[asyncio.Future] = None
+    try:
+        while True:
+            next_line = asyncio.ensure_future(lines.get())
+            await asyncio.wait({call, next_line}, return_when=asyncio.FIRST_COMPLETED)
+            if not next_line.done():
+                break
+            await on_line(next_line.result())
+        # The call has finished; pass on whatever it printed last
+        while not lines.empty():
+            await on_line(lines.get_nowait())
+        return call.result()
+    finally:
+        if next_line is not None:
+            next_line.cancel()
+        if not call.done():
+            call.cancel()
@@ -0,0 +1,239 @@
+import functools
+import inspect
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+from atlas_mcp import cache_trace
+
+# Spans are written, one OTLP/JSON `ExportTraceServiceRequest` per line, to
+# ATLAS_MCP_TRACE_FILE. Nothing is recorded if it is not set (or `configure` has
+# not been called).
+SERVICE_NAME = "atlas-mcp"
+
+
+class Span:
+    "One timed hop of a request. Attributes are plain str/int/float/bool values."
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "attributes",
+        "start_ns",
+        "end_ns",
+        "error",
+    )
+
+    def __init__(
+        self, name: str, trace_id: str, parent_id: str, attributes: Dict[str, Any]
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.error = ""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    "What `span` yields when tracing is off"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        v: Dict[str, Any] = {"boolValue": value}
+    elif isinstance(value, int):
+        v = {"intValue": str(value)}
+    elif isinstance(value, float):
+        v = {"doubleValue": value}
+    else:
+        v = {"stringValue": str(value)}
+    return {"key": key, "value": v}
+
+
+class FileExporter:
+    "Appends finished spans to a file, as OTLP/JSON lines"
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        request = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            _otlp_attribute("service.name", SERVICE_NAME),
+                            _otlp_attribute("process.pid", os.getpid()),
+                        ]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": "atlas_mcp"}, "spans": [span.to_otlp()]}
+                    ],
+                }
+            ]
+        }
+        line = json.dumps(request) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+_exporter: Optional[FileExporter] = (
+    FileExporter(os.environ["ATLAS_MCP_TRACE_FILE"])
+    if os.environ.get("ATLAS_MCP_TRACE_FILE")
+    else None
+)
+
+# The span being run. A context variable, so it follows the request into threads
+# started with `asyncio.to_thread`.
+_current: ContextVar[Optional[Span]] = ContextVar("atlas_mcp_span", default=None)
+
+
+def configure(path: Optional[Union[str, Path]]) -> None:
+    "Write spans to `path` from now on, or stop tracing if it is None"
+    global _exporter
+    _exporter = FileExporter(path) if path is not None else None
+
+
+def enabled() -> bool:
+    return _exporter is not None
+
+
+def current_trace_id() -> Optional[str]:
+    s = _current.get()
+    return s.trace_id if s is not None else None
+
+
+@contextmanager
+def span(
+    name: str, attributes: Optional[Dict[str, Any]] = None
+) -> Iterator[Union[Span, _NoopSpan]]:
+    """Time everything inside as a span, a child of the current span if there is
+    one, otherwise the root of a new trace. Exceptions mark the span as failed.
+
+    Yields the span, so attributes can be added as they become known.
+    """
+    exporter = _exporter
+    if exporter is None:
+        yield _NOOP
+        return
+
+    parent = _current.get()
+    s = Span(
+        name,
+        trace_id=parent.trace_id if parent is not None else secrets.token_hex(16),
+        parent_id=parent.span_id if parent is not None else "",
+        attributes=dict(attributes or {}),
+    )
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current.reset(token)
+        exporter.export(s)
+
+
+def _request_attributes() -> Dict[str, Any]:
+    "The MCP request and session the current tool call belongs to, if any"
+    try:
+        from mcp.server.lowlevel.server import request_ctx
+
+        ctx = request_ctx.get()
+    except (ImportError, LookupError):
+        return {}
+    return {"mcp.request_id": str(ctx.request_id), "mcp.session": id(ctx.session)}
+
+
+def traced(fn: Callable) -> Callable:
+    "Run each call to a tool function as a span (the root of the request's trace)"
+    name = fn.__name__
+
+    if inspect.iscoroutinefunction(fn):
+
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            if _exporter is None:
+                return await fn(*args, **kwargs)
+            with span(f"tool {name}", {"mcp.tool": name, **_request_attributes()}):
+                return await fn(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _exporter is None:
+            return fn(*args, **kwargs)
+        with span(f"tool {name}", {"mcp.tool": name, **_request_attributes()}):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def traced_cache(cache: Any) -> Callable[[Callable], Callable]:
+    """Run each call to a `cache.memoize()` function as a span, recording whether the
+    result came from the cache (`cache.hit`).
+
+    The function must be wrapped in `cache_trace.detects_misses` under its
+    `cache.memoize()` - a hit is seen without reading the cache twice. The memoized
+    function's `__cache_key__` and `__wrapped__` (the function itself, bypassing the
+    cache) are kept.
+    """
+
+    def decorate(memoized: Callable) -> Callable:
+        name = memoized.__name__
+
+        @functools.wraps(memoized)
+        def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return memoized(*args, **kwargs)
+            with span(f"cache {name}", {"cache.function": name}) as s:
+                with cache_trace.lookup() as call:
+                    value = memoized(*args, **kwargs)
+                    s.set_attribute("cache.hit", call.hit)
+                return value
+
+        wrapper.__wrapped__ = memoized.__wrapped__  # type: ignore[attr-defined]
+        return wrapper
+
+    return decorate
@@ -0,0 +1,145 @@
+import subprocess
+
+import pytest
+
+import atlas_mcp.central_page as cp
+from atlas_mcp import breaker, deadlines
+from atlas_mcp.breaker import BackendUnavailableError, CircuitBreaker
+
+
+def _fail(
+    b: CircuitBreaker,
+    error: Exception = breaker.BackendInfrastructureError("proxy expired"),
+):
+    with pytest.raises(type(error)):
+        with b.guard():
+            raise error
+
+
+def test_opens_after_threshold():
+    b = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    _fail(b)
+    assert b.stats().state == "closed"
+    _fail(b)
+    assert b.stats().state == "open"
+
+    ran = []
+    with pytest.raises(BackendUnavailableError, match="proxy expired") as e:
+        with b.guard():
+            ran.append(True)
+    assert ran == []
+    assert 0 < e.value.retry_after <= 60
+    with pytest.raises(BackendUnavailableError):
+        b.check()
+
+
+def test_success_resets_count():
+    b = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    _fail(b)
+    with b.guard():
+        pass
+    _fail(b)
+    assert b.stats().state == "closed"
+    assert b.stats().consecutive_failures == 1
+
+
+def test_half_open_probe(mocker):
+    now = mocker.patch("atlas_mcp.breaker.time.monotonic", return_value=100.0)
+    b = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    _fail(b)
+
+    now.return_value = 131.0
+    b.check()  # does not use up the probe
+
+    with b.guard():
+        # Only the one probe goes through
+        assert b.stats().state == "half_open"
+        with pytest.raises(BackendUnavailableError):
+            with b.guard():
+                pass
+    assert b.stats().state == "closed"
+
+
+def test_failed_probe_reopens(mocker):
+    now = mocker.patch("atlas_mcp.breaker.time.monotonic", return_value=100.0)
+    b = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    for _ in range(3):
+        _fail(b)
+
+    now.return_value = 131.0
+    _fail(b)
+    assert b.stats().state == "open"
+    assert b.stats().retry_in == 30
+
+
+def test_cancel_not_counted():
+    b = CircuitBreaker("test", failure_threshold=1, reset_timeout=60)
+    _fail(b, deadlines.BackendCancelledError("cancelled"))
+    assert b.stats().state == "closed"
+
+
+def test_run_ami_helper_fails_fast(mocker):
+    breaker.reset("ami")
+    mocker.patch.dict("os.environ", {"ATLAS_MCP_AMI_FAILURE_THRESHOLD": "2"})
+    run = mocker.patch(
+        "atlas_mcp.central_page.run_on_wsl",
+        side_effect=breaker.BackendInfrastructureError("wsl is down"),
+    )
+    try:
+        for _ in range(2):
+            with pytest.raises(RuntimeError, match="wsl is down"):
+                cp.run_ami_helper("hashtags find mc23_13p6TeV top")
+        with pytest.raises(BackendUnavailableError):
+            cp.run_ami_helper("hashtags find mc23_13p6TeV top")
+        assert run.call_count == 2
+    finally:
+        breaker.reset("ami")
+
+
+def test_bad_queries_not_counted():
+    b = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    for _ in range(5):
+        _fail(b, breaker.BackendQueryError("command failed with return code 1"))
+        _fail(b, deadlines.BackendOutputTooLargeError("printed too much"))
+        _fail(b, ValueError("bad json"))
+    assert b.stats().state == "closed"
+    assert b.stats().consecutive_failures == 0
+
+
+def test_timeouts_and_launch_errors_counted():
+    b = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+    _fail(b, deadlines.BackendTimeoutError("timed out"))
+    _fail(b, FileNotFoundError("wsl"))
+    assert b.stats().state == "open"
+
+
+def test_bad_query_probe_lets_next_call_probe(mocker):
+    now = mocker.patch("atlas_mcp.breaker.time.monotonic", return_value=100.0)
+    b = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    _fail(b)
+
+    now.return_value = 131.0
+    _fail(b, breaker.BackendQueryError("no such scope"))
+    assert b.stats().state == "open"
+    with b.guard():
+        pass
+    assert b.stats().state == "closed"
+
+
+def test_run_on_wsl_classifies_failures(mocker):
+    run = mocker.patch("atlas_mcp.deadlines.run_process")
+    run.return_value = subprocess.CompletedProcess(
+        [], 1, "", "ERROR: dataset mc23_13p6TeV.999999 not found"
+    )
+    with pytest.raises(breaker.BackendQueryError, match="return code 1"):
+        cp.run_on_wsl("ami-helper datasets")
+
+    run.return_value = subprocess.CompletedProcess(
+        [], 1, "", "Error: your grid proxy has expired"
+    )
+    with pytest.raises(breaker.BackendInfrastructureError):
+        cp.run_on_wsl("ami-helper datasets")
+
+    run.return_value = subprocess.CompletedProcess([], 127, "", "uvx: not found")
+    with pytest.raises(breaker.BackendInfrastructureError):
+        cp.run_on_wsl("ami-helper datasets")
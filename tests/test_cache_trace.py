@@ -0,0 +1,144 @@
+import pytest
+
+import atlas_mcp.central_page as cp
+from atlas_mcp import cache_trace, cli
+from atlas_mcp.cache_trace import Access
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "cache_trace.jsonl"
+    cache_trace.configure(path)
+    yield path
+    cache_trace.configure(None)
+
+
+def test_records_misses_and_hits(trace_file, mocker):
+    cp.cache.clear()
+    mocker.patch(
+        "atlas_mcp.central_page.run_ami_helper", return_value=["a.b.c", "d.e.f"]
+    )
+    cpa = cp.CentralPageAddress(scope="mc23_13p6TeV", hash_tags=("a", "b", "c", "d"))
+
+    cp.get_evtgen_for_address(cpa)
+    cp.get_evtgen_for_address(cpa)
+
+    miss, hit = cache_trace.read_trace(trace_file)
+    assert (miss.function, miss.hit, hit.hit) == ("get_evtgen_for_address", 0, 1)
+    assert miss.key == hit.key and len(miss.key) == 16
+    assert "mc23" not in trace_file.read_text()
+    # Only a miss has its value measured
+    assert miss.size > 0 and hit.size == 0
+
+
+def test_disabled_is_noop(tmp_path, mocker):
+    cache_trace.configure(None)
+    cp.cache.clear()
+    mocker.patch("atlas_mcp.central_page.run_ami_helper", return_value=[])
+    cp.get_evtgen_for_address(
+        cp.CentralPageAddress(scope="mc23_13p6TeV", hash_tags=("a", "b", "c", "d"))
+    )
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_one_cache_read_per_call(trace_file, mocker):
+    """Tracing and the access trace share the hit check - no extra cache reads."""
+    cp.cache.clear()
+    mocker.patch("atlas_mcp.central_page.run_ami_helper", return_value=["a.b.c"])
+    cpa = cp.CentralPageAddress(scope="mc23_13p6TeV", hash_tags=("a", "b", "c", "d"))
+    cp.get_evtgen_for_address(cpa)
+
+    get = mocker.spy(cp.cache, "get")
+    cp.get_evtgen_for_address(cpa)
+    key = cp.get_evtgen_for_address.__cache_key__(cpa)
+    assert [c for c in get.call_args_list if c.args[0] == key] == [
+        mocker.call(key, default=mocker.ANY, retry=True)
+    ]
+    assert cache_trace.read_trace(trace_file)[-1].hit
+
+
+def test_recorded_keeps_memoize_attributes():
+    assert cp.get_samples_for_run.__wrapped__.__name__ == "get_samples_for_run"
+    assert cp.get_samples_for_run.__cache_key__("s", "1", "PHYS")
+
+
+def _trace():
+    # a and b cost 1s to fetch, c 2s; 1KB each
+    return [
+        Access(0.0, "f", "a", False, 1000, 1000.0),
+        Access(1.0, "f", "b", False, 1000, 1000.0),
+        Access(2.0, "f", "a", True, 1000, 0.1),
+        Access(3.0, "f", "c", False, 1000, 2000.0),
+        Access(4.0, "f", "a", True, 1000, 0.1),
+        Access(100.0, "f", "b", True, 1000, 0.1),
+    ]
+
+
+def test_simulate_unbounded():
+    r = cache_trace.simulate(_trace())
+    assert (r.requests, r.hits, r.evictions) == (6, 3, 0)
+    assert r.saved_seconds == pytest.approx(3.0)
+    assert r.backend_seconds == pytest.approx(4.0)
+
+
+def test_simulate_policies():
+    # Room for two entries: c evicts b under lru/lfu (a is in use), but a under
+    # fifo - which then misses a, evicting b, and misses b, evicting c
+    lru = cache_trace.simulate(_trace(), max_bytes=2000, policy="lru")
+    lfu = cache_trace.simulate(_trace(), max_bytes=2000, policy="lfu")
+    fifo = cache_trace.simulate(_trace(), max_bytes=2000, policy="fifo")
+    assert (lru.hits, lfu.hits, fifo.hits) == (2, 2, 1)
+    assert fifo.evictions == 3
+
+
+def test_simulate_ttl():
+    r = cache_trace.simulate(_trace(), ttl=50.0)
+    # b was stored at t=1 and has expired by t=100
+    assert r.hits == 2
+    assert r.backend_seconds == pytest.approx(5.0)
+
+
+def test_simulate_unknown_policy():
+    with pytest.raises(ValueError):
+        cache_trace.simulate(_trace(), policy="random")
+
+
+def test_simulate_sizes_hits_from_misses():
+    # A key only seen as a hit (size unmeasured) takes its function's mean size
+    trace = [
+        Access(0.0, "f", "a", False, 1000, 1.0),
+        Access(1.0, "f", "warm", True, 0, 0.1),
+        Access(2.0, "f", "a", True, 0, 0.1),
+    ]
+    assert cache_trace.value_sizes(trace) == {"a": 1000, "warm": 1000}
+    r = cache_trace.simulate(trace, max_bytes=1500)
+    assert (r.hits, r.evictions) == (0, 2)
+
+
+def test_backend_latencies_falls_back_to_function_mean():
+    latencies = cache_trace.backend_latencies(
+        [
+            Access(0.0, "f", "a", False, 1, 100.0),
+            Access(1.0, "f", "b", False, 1, 300.0),
+            Access(2.0, "f", "warm", True, 1, 0.1),
+        ]
+    )
+    assert latencies == {"a": 100.0, "b": 300.0, "warm": 200.0}
+
+
+def test_cli_simulate(tmp_path, capsys):
+    path = tmp_path / "trace.jsonl"
+    writer = cache_trace.TraceWriter(path)
+    for access in _trace():
+        writer.write(access)
+    with open(path, "a") as f:
+        f.write("not json\n")
+
+    cli.main(
+        ["cache", "simulate", str(path), "--sizes", "2K,none", "--policies", "lru"]
+    )
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0].startswith("6 lookups of 3 keys")
+    assert len(lines) == 4
+    assert "unbounded" in lines[3] and "50.0%" in lines[3]
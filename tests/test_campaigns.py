@@ -0,0 +1,63 @@
+import pytest
+
+from atlas_mcp.campaigns import (
+    RECO_TAG_INDEX,
+    SIM_TAG_INDEX,
+    Campaign,
+    campaign_for_did,
+    campaign_for_tags,
+    matches,
+)
+
+
+@pytest.mark.parametrize(
+    "tags, period, sim_type",
+    [
+        ("e8514_s4369_r16083_p6697", "mc23e", "FS"),
+        ("e8514_a934_r15540_p6697", "mc23a", "AF3"),
+        ("e8351_s4162_s4114_r15224_r15228_p6026", "mc23d", "FS"),
+        ("e6337_s3681_r13145_p5855", "mc20e", "FS"),
+        ("e6337_a907_r14859", "mc20a", "AF2"),
+        ("e5984_s3126_r10201", "mc16d", "FS"),
+    ],
+)
+def test_campaign_for_tags(tags, period, sim_type):
+    assert campaign_for_tags(tags) == Campaign(period=period, sim_type=sim_type)
+
+
+@pytest.mark.parametrize(
+    "tags",
+    [
+        "e8514",  # EVNT
+        "e8514_s4369",  # HITS
+        "e8514_s4369_r99999_p6697",  # unknown reco tag
+        "e8514_s4369_r14859_p6697",  # mc23 sim with mc20 reco
+    ],
+)
+def test_campaign_for_tags_unknown(tags):
+    assert campaign_for_tags(tags) is None
+
+
+def test_index_is_flat():
+    assert SIM_TAG_INDEX["a934"] == ("mc23", "AF3")
+    assert RECO_TAG_INDEX["r16083"] == ("mc23", "mc23e")
+
+
+def test_campaign_for_did():
+    name = (
+        "mc23_13p6TeV:mc23_13p6TeV.601237.PhPy8EG_A14_ttbar_hdamp258p75_allhad."
+        "deriv.DAOD_PHYSLITE.e8514_s4369_r16083_p6697"
+    )
+    assert campaign_for_did(name) == Campaign(period="mc23e", sim_type="FS")
+    assert campaign_for_did("garbage") is None
+
+
+def test_matches():
+    c = Campaign(period="mc23a", sim_type="AF3")
+    assert matches(c)
+    assert matches(None)
+    assert matches(c, period="mc23")
+    assert matches(c, period="MC23A", sim_type="af3")
+    assert not matches(c, period="mc23e")
+    assert not matches(c, sim_type="FS")
+    assert not matches(None, period="mc23")
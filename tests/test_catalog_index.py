@@ -0,0 +1,82 @@
+import pytest
+
+from atlas_mcp.catalog_index import CatalogIndex, normalize_tier
+
+EVNT = "mc23_13p6TeV.601237.PhPy8EG_A14_ttbar_hdamp258p75_allhad.evgen.EVNT.e8514"
+PHYSLITE = (
+    "mc23_13p6TeV.601237.PhPy8EG_A14_ttbar_hdamp258p75_allhad.deriv.DAOD_PHYSLITE."
+    "e8514_s4369_r16083_p6697"
+)
+DIJET = "mc23_13p6TeV.801174.Py8EG_A14NNPDF23LO_jj_JZ9incl.evgen.EVNT.e8514"
+
+
+@pytest.fixture
+def index(tmp_path):
+    return CatalogIndex(tmp_path / "catalog.sqlite")
+
+
+def test_search_by_name_and_tier(index):
+    index.record_datasets("mc23_13p6TeV", [EVNT, DIJET])
+    index.record_datasets(
+        "mc23_13p6TeV", [PHYSLITE], campaigns={PHYSLITE: "mc23e - FS"}
+    )
+
+    hits = index.search("mc23_13p6TeV", "ttbar allhad")
+    assert {h.name for h in hits} == {EVNT, PHYSLITE}
+
+    hits = index.search("mc23_13p6TeV", "ttbar", tier="PHYSLITE")
+    assert [h.name for h in hits] == [PHYSLITE]
+    assert hits[0].campaign == "mc23e - FS"
+    assert hits[0].run_number == "601237"
+
+    assert index.search("mc20_13TeV", "ttbar") == []
+
+
+def test_search_uses_synonyms_and_prefixes(index):
+    index.record_datasets("mc23_13p6TeV", [EVNT, DIJET])
+
+    assert [h.name for h in index.search("mc23_13p6TeV", "top pair")] == [EVNT]
+    assert [h.name for h in index.search("mc23_13p6TeV", "JZ9")] == [DIJET]
+
+
+def test_search_matches_any_synonym_alternative(index):
+    diboson = "mc23_13p6TeV.700600.Sh_2214_diboson_lllv.evgen.EVNT.e8514"
+    higgs = "mc23_13p6TeV.601318.PhPy8EG_PDF4LHC21_higgs_ZZ4l.evgen.EVNT.e8514"
+    index.record_datasets("mc23_13p6TeV", [diboson, higgs, DIJET])
+
+    # "diboson" -> diboson OR vv, "higgs" -> higgs OR h125, "qcd" -> dijet OR jj
+    assert [h.name for h in index.search("mc23_13p6TeV", "diboson")] == [diboson]
+    assert [h.name for h in index.search("mc23_13p6TeV", "higgs zz4l")] == [higgs]
+    assert [h.name for h in index.search("mc23_13p6TeV", "qcd")] == [DIJET]
+    assert index.search("mc23_13p6TeV", "higgs lllv") == []
+    assert index.search("mc23_13p6TeV", 'higgs"') != []
+
+
+def test_metadata_applies_to_whole_run(index):
+    index.record_datasets("mc23_13p6TeV", [PHYSLITE])
+    index.record_metadata(
+        "mc23_13p6TeV",
+        EVNT,
+        {
+            "Physics Short Name": "PhPy8EG_A14_ttbar_hdamp258p75_allhad",
+            "Physics Comment": "POWHEG+Pythia8 ttbar production, allhad events",
+        },
+    )
+
+    hits = index.search("mc23_13p6TeV", "powheg")
+    assert {h.name for h in hits} == {EVNT, PHYSLITE}
+    assert all(h.description.startswith("POWHEG") for h in hits)
+
+
+def test_record_datasets_is_idempotent(index):
+    assert index.record_datasets("mc23_13p6TeV", [EVNT, "not-a-dataset"]) == 1
+    assert index.record_datasets("mc23_13p6TeV", [EVNT]) == 0
+    assert len(index.search("mc23_13p6TeV", "ttbar")) == 1
+
+
+@pytest.mark.parametrize(
+    "tier, expected",
+    [("PHYSLITE", "DAOD_PHYSLITE"), ("phys", "DAOD_PHYS"), ("EVNT", "EVNT")],
+)
+def test_normalize_tier(tier, expected):
+    assert normalize_tier(tier) == expected
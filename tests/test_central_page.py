@@ -1,3 +1,5 @@
+import json
+
 import pytest
 import atlas_mcp.central_page as central_page_mod
 from atlas_mcp.central_page import (
@@ -9,8 +11,11 @@ from atlas_mcp.central_page import (
     get_provenance,
 )
 import subprocess
+import sys
 from pathlib import Path
 
+from atlas_mcp import deadlines
+
 
 def test_get_allowed_scopes():
     scopes = get_allowed_scopes()
@@ -65,8 +70,8 @@ def test_get_allowed_scopes():
 
 def test_run_on_wsl_with_files_mocked(mocker):
     """Test run_on_wsl with file copying functionality using mocked subprocess calls."""
-    # Mock subprocess.run to simulate successful file copying and command execution
-    mock_run = mocker.patch("subprocess.run")
+    # Mock the process runner to simulate successful file copying and command execution
+    mock_run = mocker.patch("atlas_mcp.deadlines.run_process")
 
     # First call for file copying, second call for main command
     mock_run.side_effect = [
@@ -89,6 +94,26 @@ def test_run_on_wsl_with_files_mocked(mocker):
     first_call = mock_run.call_args_list[0]
     assert "base64 -d > /tmp/input.txt" in first_call[0][0][-1]
 
+    # The command itself runs as its own session inside WSL, so it can be killed
+    main_cmd = mock_run.call_args_list[1][0][0]
+    assert main_cmd[3:5] == ["setsid", "-w"]
+    assert main_cmd[-1].endswith("cat /tmp/input.txt")
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="uses bash")
+def test_run_ami_helper_drops_setup_noise(mocker):
+    """Output before the start marker never reaches the result (or memory)."""
+
+    def fake_run_on_wsl(command, files=None, on_line=None):
+        script = "echo setting up atlas; " + command.replace(
+            "uvx --python=3.11 ami-helper", "echo"
+        )
+        return deadlines.run_process(["bash", "-c", script], on_line=on_line).stdout
+
+    mocker.patch("atlas_mcp.central_page.run_on_wsl", side_effect=fake_run_on_wsl)
+
+    assert central_page_mod.run_ami_helper("hashtags find") == ["hashtags find"]
+
 
 def test_run_on_wsl_file_not_found():
     """Test that run_on_wsl raises FileNotFoundError for non-existent Path files."""
@@ -370,3 +395,124 @@ def test_get_provenance_builds_correct_command(mocker):
     assert result[1].endswith("AOD.e8514_s4162_r14622")
     assert result[2].endswith("HITS.e8514_s4162")
     assert result[3].endswith("EVNT.e8514")
+
+
+def test_refresh_evtgen_for_address_merges(mocker):
+    """A refresh appends new samples to the cached listing and reports only those."""
+    central_page_mod.cache.clear()
+    cpa = CentralPageAddress(
+        scope="mc23_13p6TeV", hash_tags=("Top", "TTbar", "Baseline", "PowhegPythia")
+    )
+    first = ["mc23_13p6TeV.601237.PhPy8EG_ttbar_allhad.evgen.EVNT.e8514"]
+    new = "mc23_13p6TeV.601229.PhPy8EG_ttbar_SingleLep.evgen.EVNT.e8514"
+
+    mocked = mocker.patch(
+        "atlas_mcp.central_page.run_ami_helper", side_effect=[first, [new]]
+    )
+
+    assert central_page_mod.get_evtgen_for_address(cpa) == first
+    first_sync = central_page_mod.last_synced(
+        central_page_mod.get_evtgen_for_address, cpa
+    )
+    assert first_sync is not None
+
+    result = central_page_mod.refresh_evtgen_for_address(cpa)
+    assert result.added == [new]
+    assert result.total == 2
+    assert result.previous_sync == first_sync
+    assert result.synced_at >= first_sync
+
+    # The memoized listing now holds the merged result, without a backend call
+    assert central_page_mod.get_evtgen_for_address(cpa) == first + [new]
+    assert mocked.call_count == 2
+
+
+def test_refresh_samples_for_run_merges(mocker):
+    central_page_mod.cache.clear()
+    base = "mc23_13p6TeV.601237.PhPy8EG.deriv.DAOD_PHYSLITE.e8514_s4369_r16083_"
+    old_rows = [{"dataset": base + "p6266", "campaign": ""}]
+    new_rows = [
+        {"dataset": base + "p6266", "campaign": "mc23e - FS"},
+        {"dataset": base + "p6697", "campaign": "mc23e - FS"},
+    ]
+    mocker.patch(
+        "atlas_mcp.central_page.run_ami_helper",
+        side_effect=[[json.dumps(old_rows)], [json.dumps(new_rows)]],
+    )
+
+    get_samples_for_run("mc23_13p6TeV", "601237", "PHYSLITE")
+    result = central_page_mod.refresh_samples_for_run(
+        "mc23_13p6TeV", "601237", "PHYSLITE"
+    )
+
+    assert result.added == [base + "p6697"]
+    assert get_samples_for_run("mc23_13p6TeV", "601237", "PHYSLITE") == new_rows
+
+
+def test_get_address_for_keyword_serves_cache_when_unavailable(mocker):
+    central_page_mod.cache.clear()
+    central_page_mod.record_addresses(
+        "mc23_13p6TeV",
+        [("Top", "TTbar", "Baseline", "PowhegPythia"), ("QCD", "Dijet", "a", "b")],
+    )
+    mocker.patch(
+        "atlas_mcp.central_page.run_ami_helper",
+        side_effect=central_page_mod.breaker.BackendUnavailableError("down", 10),
+    )
+
+    found = central_page_mod.get_address_for_keyword("mc23_13p6TeV", "ttbar")
+    assert [a.hash_tags[1] for a in found] == ["TTbar"]
+
+    with pytest.raises(central_page_mod.breaker.BackendUnavailableError):
+        central_page_mod.get_address_for_keyword("mc20_13TeV", "ttbar")
+
+
+def test_refresh_stale_when_unavailable(mocker):
+    central_page_mod.cache.clear()
+    cpa = CentralPageAddress(scope="mc23_13p6TeV", hash_tags=("a", "b", "c", "d"))
+    mocker.patch(
+        "atlas_mcp.central_page.run_ami_helper",
+        side_effect=[["ds1"], central_page_mod.breaker.BackendUnavailableError("x", 1)],
+    )
+    central_page_mod.get_evtgen_for_address(cpa)
+
+    result = central_page_mod.refresh_evtgen_for_address(cpa)
+    assert result.stale
+    assert result.added == []
+    assert result.total == 1
+
+
+def test_get_address_for_keyword_filters(mocker):
+    central_page_mod.cache.clear()
+    mocker.patch(
+        "atlas_mcp.central_page.run_ami_helper",
+        return_value=[
+            "JetPhoton Dijet Systematic Sherpa2214",
+            "JetPhoton Dijet Baseline Pythia8",
+            "JetPhoton Dijet Alternative Herwig72",
+            "JetPhoton Dijet Baseline Sherpa",
+        ],
+    )
+
+    found = central_page_mod.get_address_for_keyword("mc23_13p6TeV", "Dijet")
+    assert len(found) == 4
+    assert found[0] == CentralPageAddress(
+        scope="mc23_13p6TeV",
+        hash_tags=("JetPhoton", "Dijet", "Systematic", "Sherpa2214"),
+    )
+
+    assert [
+        a.hash_tags[3]
+        for a in central_page_mod.get_address_for_keyword(
+            "mc23_13p6TeV", ["Dijet", "sherpa"]
+        )
+    ] == ["Sherpa2214", "Sherpa"]
+
+    baseline = central_page_mod.get_address_for_keyword(
+        "mc23_13p6TeV", "Dijet", level3="Baseline", limit=1
+    )
+    assert [a.hash_tags[3] for a in baseline] == ["Pythia8"]
+
+    # Everything seen is still recorded for fuzzy search
+    recorded = central_page_mod.cache.get(("fuzzy_search", "mc23_13p6TeV", "addresses"))
+    assert len(recorded) == 4
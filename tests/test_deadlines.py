@@ -0,0 +1,172 @@
+import asyncio
+import sys
+import threading
+import time
+
+import pytest
+
+from atlas_mcp import deadlines
+
+posix_only = pytest.mark.skipif(sys.platform == "win32", reason="uses sleep/bash")
+
+
+@posix_only
+def test_run_process_output():
+    result = deadlines.run_process(["bash", "-c", "echo hi; echo err >&2; exit 3"])
+    assert result.returncode == 3
+    assert result.stdout == "hi\n"
+    assert result.stderr == "err\n"
+
+
+@posix_only
+def test_run_process_streams_lines():
+    """Lines are passed on as they are printed, not when the process exits."""
+    seen = []
+
+    def on_line(line):
+        seen.append((line, time.monotonic()))
+
+    start = time.monotonic()
+    result = deadlines.run_process(
+        ["bash", "-c", "echo one; sleep 0.5; echo two; echo err >&2"], on_line=on_line
+    )
+    assert [line for line, _ in seen] == ["one", "two"]
+    assert seen[0][1] - start < 0.4
+    assert result.stdout == "one\ntwo\n"
+    assert result.stderr == "err\n"
+
+
+@posix_only
+def test_run_process_streaming_timeout():
+    seen = []
+    with deadlines.deadline(0.5):
+        with pytest.raises(deadlines.BackendTimeoutError):
+            deadlines.run_process(
+                ["bash", "-c", "echo first; sleep 30"], on_line=seen.append
+            )
+    assert seen == ["first"]
+
+
+@posix_only
+def test_run_process_timeout_kills_tree(tmp_path):
+    marker = tmp_path / "still-running"
+    killed = []
+
+    start = time.monotonic()
+    with deadlines.deadline(0.5):
+        with pytest.raises(deadlines.BackendTimeoutError, match="timed out"):
+            deadlines.run_process(
+                ["bash", "-c", f"(sleep 2; touch {marker}) & wait"],
+                on_kill=lambda: killed.append(True),
+            )
+    assert time.monotonic() - start < 2
+    assert killed == [True]
+
+    # The grandchild went with it
+    time.sleep(2)
+    assert not marker.exists()
+
+
+@posix_only
+def test_run_process_cancel():
+    with deadlines.deadline(30) as cancel:
+        threading.Timer(0.3, cancel.set).start()
+        start = time.monotonic()
+        with pytest.raises(deadlines.BackendCancelledError):
+            deadlines.run_process(["sleep", "30"])
+    assert time.monotonic() - start < 5
+
+
+@posix_only
+def test_bounded_output_drops_before_marker_and_spools(monkeypatch):
+    monkeypatch.setattr(deadlines, "spool_bytes", 1000)
+    script = "echo noise; echo more noise; echo --start--; seq 1 2000; echo err >&2"
+    with deadlines.bounded_output(start_marker="--start--") as output:
+        result = deadlines.run_process(["bash", "-c", script])
+        assert output.spooled
+        assert list(output.lines()) == [str(i) for i in range(1, 2001)]
+    assert result.stdout == ""
+    assert result.stderr == "err\n"
+
+
+@posix_only
+def test_bounded_output_without_marker_keeps_last_lines():
+    with deadlines.bounded_output(start_marker="--start--") as output:
+        deadlines.run_process(["bash", "-c", "echo setup failed"])
+        assert list(output.lines()) == ["setup failed"]
+
+
+@posix_only
+def test_bounded_output_kills_runaway_process():
+    start = time.monotonic()
+    with deadlines.bounded_output(max_bytes=100_000) as output:
+        with pytest.raises(deadlines.BackendOutputTooLargeError, match="printed more"):
+            deadlines.run_process(["yes"])
+    assert time.monotonic() - start < 5
+    assert output.bytes_read > 100_000
+
+
+@posix_only
+def test_bounded_output_caps_a_single_line(monkeypatch):
+    monkeypatch.setattr(deadlines, "read_chunk_bytes", 4096)
+    with deadlines.bounded_output(max_bytes=100_000) as output:
+        with pytest.raises(deadlines.BackendOutputTooLargeError):
+            deadlines.run_process(["bash", "-c", "tr '\\0' a < /dev/zero"])
+    # Stopped within a chunk or so, not at the end of a (never ending) line
+    assert output.bytes_read < 100_000 + 2 * 65536
+
+
+def test_bounded_output_pre_marker_tail(monkeypatch):
+    monkeypatch.setattr(deadlines, "pre_marker_tail_bytes", 10)
+    output = deadlines.BoundedOutput(start_marker="--start--")
+    for piece in ["one\ntwo\nthr", "ee\n", "x" * 50, "yz"]:
+        assert output.feed(piece, len(piece))
+    assert list(output.lines()) == ["two", "three", "x" * 8 + "yz"]
+    output.feed("\n--start--\nresult\n", 18)
+    assert list(output.lines()) == ["result"]
+
+
+def test_run_process_no_time_left(mocker):
+    popen = mocker.patch("subprocess.Popen")
+    with deadlines.deadline(0):
+        with pytest.raises(deadlines.BackendTimeoutError):
+            deadlines.run_process(["sleep", "1"])
+    popen.assert_not_called()
+
+
+def test_deadline_nesting_keeps_sooner():
+    assert deadlines.remaining() is None
+    with deadlines.deadline(10):
+        with deadlines.deadline(100):
+            assert deadlines.remaining() <= 10
+        with deadlines.deadline(1):
+            assert deadlines.remaining() <= 1
+    assert deadlines.remaining() is None
+
+
+@pytest.mark.asyncio
+async def test_run_in_thread_carries_deadline():
+    with deadlines.deadline(5):
+        left = await deadlines.run_in_thread(deadlines.remaining)
+    assert 0 < left <= 5
+
+
+@pytest.mark.asyncio
+async def test_run_in_thread_cancel_propagates():
+    started = threading.Event()
+    seen = []
+
+    def backend_call():
+        started.set()
+        while not deadlines.cancelled():
+            time.sleep(0.01)
+        seen.append("cancelled")
+
+    task = asyncio.create_task(deadlines.run_in_thread(backend_call))
+    await asyncio.to_thread(started.wait)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    await asyncio.to_thread(time.sleep, 0.1)
+    assert seen == ["cancelled"]
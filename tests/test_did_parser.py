@@ -0,0 +1,88 @@
+import pytest
+
+from atlas_mcp.did_parser import parse_did, parse_dids, split_tags
+
+PHYSLITE = (
+    "mc23_13p6TeV.601237.PhPy8EG_A14_ttbar_hdamp258p75_allhad.deriv.DAOD_PHYSLITE."
+    "e8514_s4369_r16083_p6697"
+)
+
+
+def test_parse_did():
+    parsed = parse_did(PHYSLITE)
+    assert parsed is not None
+    assert parsed.scope == "mc23_13p6TeV"
+    assert parsed.dsid == "601237"
+    assert parsed.physics_short == "PhPy8EG_A14_ttbar_hdamp258p75_allhad"
+    assert parsed.step == "deriv"
+    assert parsed.tier == "DAOD_PHYSLITE"
+    assert parsed.tags == "e8514_s4369_r16083_p6697"
+
+
+def test_parse_did_with_scope_prefix():
+    parsed = parse_did(f"mc23_13p6TeV:{PHYSLITE}")
+    assert parsed is not None
+    assert parsed.scope == "mc23_13p6TeV"
+    assert parsed.dsid == "601237"
+
+
+@pytest.mark.parametrize("name", ["", "not-a-dataset", "mc23_13p6TeV.601237.X"])
+def test_parse_did_invalid(name):
+    assert parse_did(name) is None
+
+
+def test_split_tags_merged():
+    assert split_tags("e8514_e8528_a934_r16083_p6697") == {
+        "e": "e8514_e8528",
+        "a": "a934",
+        "r": "r16083",
+        "p": "p6697",
+    }
+
+
+def test_parse_dids_columns():
+    table = parse_dids(
+        [
+            PHYSLITE,
+            "mc20_13TeV.410470.PhPy8EG_A14_ttbar_hdamp258p75_nonallhad.recon.AOD."
+            "e6337_a907_r14859",
+            "garbage",
+        ]
+    )
+    assert len(table) == 2
+    assert table.dsid == ["601237", "410470"]
+    assert table.tier == ["DAOD_PHYSLITE", "AOD"]
+    assert table.s_tag == ["s4369", ""]
+    assert table.a_tag == ["", "a907"]
+    assert table.p_tag == ["p6697", ""]
+    assert table.invalid == ["garbage"]
+
+
+def test_parse_dids_large_batch():
+    names = [PHYSLITE.replace("601237", str(600000 + i)) for i in range(20000)]
+    table = parse_dids(names)
+    assert len(table) == 20000
+    assert table.dsid[-1] == "619999"
+
+
+def test_filter_and_group():
+    table = parse_dids(
+        [
+            PHYSLITE,
+            PHYSLITE.replace("allhad", "SingleLep").replace("601237", "601229"),
+            PHYSLITE.replace("DAOD_PHYSLITE", "DAOD_PHYS"),
+        ]
+    )
+    assert table.filter(physics_short_contains="ALLHAD").dsid == ["601237", "601237"]
+    assert table.filter(tier="DAOD_PHYS").did == [
+        PHYSLITE.replace("DAOD_PHYSLITE", "DAOD_PHYS")
+    ]
+    assert sorted(table.group_by("dsid")) == ["601229", "601237"]
+    assert len(table.group_by("dsid")["601237"]) == 2
+
+
+def test_latest_p_tag():
+    older = PHYSLITE.replace("p6697", "p6266")
+    af3 = PHYSLITE.replace("s4369", "a934")
+    table = parse_dids([older, PHYSLITE, af3])
+    assert table.latest_p_tag().did == [PHYSLITE, af3]
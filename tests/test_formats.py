@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from atlas_mcp.formats import DID_TEMPLATE, columnar, render, to_tsv
+
+BASE = "mc23_13p6TeV.601237.PhPy8EG_A14_ttbar.deriv.DAOD_PHYSLITE.e8514_s4369_r16083_"
+
+
+def _rows():
+    return [
+        {"dataset": BASE + "p6266", "campaign": "mc23e - FS"},
+        {"dataset": BASE + "p6697", "campaign": "mc23e - FS"},
+        {"dataset": "not a dataset name", "campaign": ""},
+    ]
+
+
+def _rebuild(listing):
+    "The dataset names back from a columnar listing"
+    names = []
+    for i in range(listing["rows"]):
+        fields = dict(listing["constant"])
+        for name, values in listing["columns"].items():
+            fields[name] = listing["prefix"].get(name, "") + values[i]
+        names.append(DID_TEMPLATE.format(**fields))
+    return names
+
+
+def test_columnar_factors_constants_and_prefixes():
+    listing = columnar(_rows())
+
+    assert listing["rows"] == 2
+    assert listing["constant"]["dsid"] == "601237"
+    assert listing["constant"]["campaign"] == "mc23e - FS"
+    assert listing["prefix"] == {"tags": "e8514_s4369_r16083_"}
+    assert listing["columns"] == {"tags": ["p6266", "p6697"]}
+    assert listing["unparsed"] == [{"dataset": "not a dataset name", "campaign": ""}]
+
+
+def test_columnar_round_trips():
+    rows = [
+        {
+            "dataset": f"mc23_13p6TeV.{601000 + i}.PhPy8EG_A14_slice{i}.deriv."
+            f"DAOD_PHYSLITE.e8514_s4369_r16083_p{6266 + i}"
+        }
+        for i in range(50)
+    ]
+    listing = columnar(rows)
+
+    assert _rebuild(listing) == [r["dataset"] for r in rows]
+    assert len(json.dumps(listing)) < len(json.dumps(rows)) / 2
+
+
+def test_columnar_single_row_keeps_columns():
+    listing = columnar(_rows()[:1])
+
+    assert listing["constant"] == {}
+    assert _rebuild(listing) == [BASE + "p6266"]
+
+
+def test_to_tsv():
+    lines = to_tsv(columnar(_rows())).splitlines()
+
+    assert lines[0].startswith("# constant:\tscope=mc23_13p6TeV\t")
+    assert "campaign=mc23e - FS" in lines[0].split("\t")
+    assert lines[1] == "# prefix:\ttags=e8514_s4369_r16083_"
+    assert lines[2] == f"# did: {DID_TEMPLATE}"
+    assert lines[3].startswith("# unparsed: ")
+    assert lines[4:] == ["tags", "p6266", "p6697"]
+
+
+def test_render_unknown_format():
+    assert json.loads(render(_rows(), "json")) == _rows()
+    with pytest.raises(ValueError):
+        render(_rows(), "csv")
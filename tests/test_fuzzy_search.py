@@ -0,0 +1,158 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import atlas_mcp.central_page as central_page_mod
+from atlas_mcp.fuzzy_search import FuzzyIndex, expand_query, tokenize
+
+
+def test_tokenize_splits_camel_case():
+    assert tokenize("JetPhoton") == ["jetphoton", "jet", "photon"]
+    assert tokenize("PowhegPythia8") == ["powhegpythia8", "powheg", "pythia8"]
+    assert tokenize("PhPy8EG_A14_ttbar_allhad") == ["phpy8eg", "a14", "ttbar", "allhad"]
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [
+        ("top pair", ["ttbar"]),
+        ("tt", ["ttbar"]),
+        ("dijets", ["dijet"]),
+        ("W+jets", ["wjets"]),
+        ("top pair allhad", ["ttbar", "allhad"]),
+    ],
+)
+def test_expand_query_synonyms(query, expected):
+    assert expand_query(query) == expected
+
+
+def _address_index():
+    index = FuzzyIndex()
+    for tags in [
+        ("JetPhoton", "Dijet", "Baseline", "Pythia8"),
+        ("Top", "TTbar", "Baseline", "PowhegPythia"),
+        ("Top", "SingleTop", "Baseline", "PowhegPythia"),
+        ("WZjets", "Wjets", "Baseline", "Sherpa2214"),
+    ]:
+        index.add(tags, " ".join(tags), tags)
+    return index
+
+
+def test_index_ranks_best_match_first():
+    index = _address_index()
+    hits = index.search(expand_query("top pair"))
+    assert hits[0][0] == ("Top", "TTbar", "Baseline", "PowhegPythia")
+
+
+def test_index_tolerates_plurals_and_typos():
+    index = _address_index()
+    assert index.search(["dijets"])[0][0][1] == "Dijet"
+    assert index.search(["sherpa221"])[0][0][1] == "Wjets"
+
+
+def test_index_ignores_duplicate_keys():
+    index = FuzzyIndex()
+    assert index.add("a", "ttbar", 1)
+    assert not index.add("a", "ttbar", 1)
+    assert len(index) == 1
+
+
+def test_search_hashtags_seeds_and_reuses_index(mocker):
+    """A cold scope is seeded from the backend once, then answered locally."""
+    central_page_mod.cache.clear()
+    central_page_mod._search_indices.clear()
+
+    mocked = mocker.patch(
+        "atlas_mcp.central_page.run_ami_helper",
+        return_value=[
+            "Top TTbar Baseline PowhegPythia",
+            "Top TTbar Systematic aMCatNLOPythia",
+        ],
+    )
+
+    hits = central_page_mod.search_hashtags("mc23_13p6TeV", "tt")
+    assert mocked.call_count == 1
+    assert hits[0].kind == "address"
+    assert hits[0].hash_tags[1] == "TTbar"
+
+    # Second search is answered from the index, even after a restart
+    central_page_mod._search_indices.clear()
+    hits = central_page_mod.search_hashtags("mc23_13p6TeV", "top pair")
+    assert mocked.call_count == 1
+    assert len(hits) == 2
+
+
+def test_search_hashtags_finds_samples(mocker):
+    central_page_mod.cache.clear()
+    central_page_mod._search_indices.clear()
+
+    mocker.patch(
+        "atlas_mcp.central_page.run_ami_helper",
+        return_value=[
+            "mc23_13p6TeV.601237.PhPy8EG_A14_ttbar_hdamp258p75_allhad.evgen.EVNT.e8514",
+            "mc23_13p6TeV.601229.PhPy8EG_A14_ttbar_hdamp258p75_SingleLep.evgen.EVNT.e8514",
+        ],
+    )
+    cpa = central_page_mod.CentralPageAddress(
+        scope="mc23_13p6TeV", hash_tags=("Top", "TTbar", "Baseline", "PowhegPythia")
+    )
+    central_page_mod.get_evtgen_for_address(cpa)
+
+    hits = central_page_mod.search_hashtags("mc23_13p6TeV", "allhad")
+    assert hits[0].kind == "sample"
+    assert hits[0].name is not None and "allhad" in hits[0].name
+    assert hits[0].hash_tags == cpa.hash_tags
+
+
+def test_search_hashtags_falls_back_to_backend(mocker):
+    """A warm index that knows nothing matching the query still asks the backend."""
+    central_page_mod.cache.clear()
+    central_page_mod._search_indices.clear()
+    central_page_mod.record_addresses(
+        "mc23_13p6TeV", [("Top", "TTbar", "Baseline", "PowhegPythia")]
+    )
+
+    mocked = mocker.patch(
+        "atlas_mcp.central_page.run_ami_helper",
+        return_value=["Higgs ggF Baseline PowhegPythia"],
+    )
+    hits = central_page_mod.search_hashtags("mc23_13p6TeV", "higgs")
+    # One backend call per expanded term ("higgs", "h125")
+    assert mocked.call_count == 2
+    assert hits[0].hash_tags[0] == "Higgs"
+
+
+def test_record_samples_from_many_threads():
+    central_page_mod.cache.clear()
+    central_page_mod._search_indices.clear()
+    index = central_page_mod._get_search_index("mc23_13p6TeV")
+
+    def record(i):
+        cpa = central_page_mod.CentralPageAddress(
+            scope="mc23_13p6TeV", hash_tags=("Top", "TTbar", "Baseline", f"Gen{i}")
+        )
+        central_page_mod.record_samples(cpa, [f"mc23_13p6TeV.{i}.ttbar.evgen.EVNT"])
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(record, range(40)))
+
+    samples = central_page_mod.cache.get(("fuzzy_search", "mc23_13p6TeV", "samples"))
+    addresses = central_page_mod.cache.get(
+        ("fuzzy_search", "mc23_13p6TeV", "addresses")
+    )
+    assert len(samples) == 40 and len(addresses) == 40
+    assert len(index) == 80
+
+
+def test_known_addresses_are_not_rewritten(mocker):
+    central_page_mod.cache.clear()
+    central_page_mod._search_indices.clear()
+    mocker.patch(
+        "atlas_mcp.central_page.run_ami_helper",
+        return_value=["Top TTbar Baseline PowhegPythia"],
+    )
+    central_page_mod.get_address_for_keyword("mc23_13p6TeV", "ttbar")
+
+    transact = mocker.spy(central_page_mod.cache, "transact")
+    central_page_mod.get_address_for_keyword("mc23_13p6TeV", "ttbar")
+    assert transact.call_count == 0
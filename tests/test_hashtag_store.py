@@ -0,0 +1,36 @@
+from atlas_mcp.hashtag_store import HashtagStore
+
+LINES = [
+    "JetPhoton Dijet Systematic Sherpa2214",
+    "JetPhoton Dijet Baseline Pythia8",
+    "JetPhoton Dijet Alternative Herwig72",
+    "Top TTbar Baseline PowhegPythia8",
+    "not an address",
+    "JetPhoton Dijet Baseline Pythia8",
+]
+
+
+def test_from_lines_dedups_and_interns():
+    store = HashtagStore.from_lines(LINES)
+    assert len(store) == 4
+    assert store.row(1) == ("JetPhoton", "Dijet", "Baseline", "Pythia8")
+    # "JetPhoton", "Dijet" and "Baseline" are stored once each
+    assert store.tags.count("JetPhoton") == 1
+    assert len(store.tags) == 11
+    assert store.rows()[3] == ("Top", "TTbar", "Baseline", "PowhegPythia8")
+
+
+def test_select_keywords():
+    store = HashtagStore.from_lines(LINES)
+    assert store.select(["dijet"]) == [0, 1, 2]
+    assert store.select(["Dijet", "herwig"]) == [2]
+    assert store.select(["ttbar", "dijet"]) == []
+    assert store.select(["pythia8"]) == [1, 3]
+
+
+def test_select_level3():
+    store = HashtagStore.from_lines(LINES)
+    assert store.select(["dijet"], level3="Baseline") == [1]
+    assert store.select(["dijet"], level3="Specialised") == []
+    # level3 is an exact match on the third tag only
+    assert store.select(["jet"], level3="Dijet") == []
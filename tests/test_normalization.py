@@ -0,0 +1,106 @@
+import json
+import math
+
+import pytest
+
+from atlas_mcp import normalization, server
+
+MC23E = "mc23_13p6TeV.601237.PhPy8EG_ttbar.deriv.DAOD_PHYSLITE.e8514_s4369_r16083_p6697"
+MC23A = "mc23_13p6TeV.601237.PhPy8EG_ttbar.deriv.DAOD_PHYSLITE.e8514_s4162_r15540_p6697"
+OTHER = "mc23_13p6TeV.700000.Sh_Zee.deriv.DAOD_PHYSLITE.e8514_s4369_r16083_p6697"
+METADATA = {
+    "601237": {"Cross Section (nb)": "0.7298", "Filter Efficiency": 0.5},
+}
+
+
+def test_normalize_weights():
+    result = normalization.normalize(
+        [MC23E, MC23A, OTHER],
+        METADATA,
+        {"mc23e": 100.0, "mc23a": 25.0},
+        sum_of_weights={MC23E: 1.0e6},
+        k_factors={"601237": 1.2},
+    )
+
+    mc23e, mc23a, other = result.samples
+    assert mc23e.period == "mc23e"
+    assert mc23e.x_sec == pytest.approx(729.8)
+    assert mc23e.sigma_eff == pytest.approx(729.8 * 0.5 * 1.2)
+    assert mc23e.expected_events == pytest.approx(729.8 * 0.5 * 1.2 * 100.0e3)
+    assert mc23e.weight == pytest.approx(mc23e.expected_events / 1.0e6)
+    assert mc23e.effective_lumi == pytest.approx(1.0e6 / (729.8 * 0.6) / 1000.0)
+    assert math.isnan(mc23a.weight)
+
+    assert result.missing_metadata == [OTHER]
+    assert result.missing_lumi == []
+    assert result.total_lumi == pytest.approx(125.0)
+    assert [(c.period, c.lumi_fraction, c.samples) for c in result.campaigns] == [
+        ("mc23a", pytest.approx(0.2), 1),
+        ("mc23e", pytest.approx(0.8), 2),
+    ]
+    assert result.expected_events == pytest.approx(
+        mc23e.expected_events + mc23a.expected_events
+    )
+
+
+def test_normalize_missing_lumi_and_bad_names():
+    result = normalization.normalize(["not a dataset", MC23A], METADATA, {"mc23e": 1})
+
+    assert [s.did for s in result.samples] == ["not a dataset", MC23A]
+    assert result.missing_lumi == ["not a dataset", MC23A]
+    assert result.expected_events == 0.0
+
+
+@pytest.mark.asyncio
+async def test_fetch_metadata_once_per_dsid(mocker):
+    mocked = mocker.patch(
+        "atlas_mcp.central_page.get_metadata",
+        return_value=METADATA["601237"],
+    )
+    evnt = "mc23_13p6TeV.601237.PhPy8EG_ttbar.evgen.EVNT.e8514"
+
+    fetched = await normalization.fetch_metadata("mc23_13p6TeV", [MC23E, MC23A, evnt])
+
+    assert fetched.metadata == METADATA
+    assert fetched.failed == {}
+    mocked.assert_called_once_with("mc23_13p6TeV", evnt, use_top_of_provenance=False)
+
+
+@pytest.mark.asyncio
+async def test_fetch_metadata_reports_failures(mocker):
+    def get_metadata(scope, name, use_top_of_provenance=False):
+        if ".700000." in name:
+            raise RuntimeError("no such dataset")
+        if ".700001." in name:
+            return ["not", "metadata"]
+        return METADATA["601237"]
+
+    mocker.patch("atlas_mcp.central_page.get_metadata", side_effect=get_metadata)
+    broken = OTHER.replace(".700000.", ".700001.")
+
+    fetched = await normalization.fetch_metadata("mc23_13p6TeV", [MC23E, OTHER, broken])
+
+    assert fetched.metadata == METADATA
+    assert fetched.failed == {
+        "700000": "RuntimeError: no such dataset",
+        "700001": "Expected metadata, got list",
+    }
+
+
+@pytest.mark.asyncio
+async def test_normalize_samples_tool(mocker):
+    def get_metadata(scope, name, use_top_of_provenance=False):
+        if ".700000." in name:
+            raise RuntimeError("no such dataset")
+        return METADATA["601237"]
+
+    mocker.patch("atlas_mcp.central_page.get_metadata", side_effect=get_metadata)
+
+    result = json.loads(
+        await server.normalize_samples("mc23_13p6TeV", [MC23E, OTHER], {"mc23e": 100.0})
+    )
+
+    assert result["samples"][0]["expected_events"] == pytest.approx(729.8 * 0.5 * 1e5)
+    assert result["samples"][0]["weight"] is None
+    assert result["missing_metadata"] == [OTHER]
+    assert result["failed"] == {"700000": "RuntimeError: no such dataset"}
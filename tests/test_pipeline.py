@@ -0,0 +1,272 @@
+import math
+import threading
+import time
+
+import pytest
+
+from atlas_mcp import pipeline
+
+EVNTS = [
+    "mc23_13p6TeV.601237.PhPy8EG_A14_ttbar_hdamp258p75_allhad.evgen.EVNT.e8514",
+    "mc23_13p6TeV.601229.PhPy8EG_A14_ttbar_hdamp258p75_SingleLep.evgen.EVNT.e8514",
+]
+
+
+def _samples(scope, run_number, data_tier):
+    return [
+        {
+            "dataset": f"{scope}.{run_number}.PhPy8EG.deriv.DAOD_PHYSLITE."
+            "e8514_s4369_r16083_p6697",
+            "campaign": "mc23e - FS",
+        },
+        {
+            "dataset": f"{scope}.{run_number}.PhPy8EG.deriv.DAOD_PHYSLITE."
+            "e8514_a934_r16083_p6697",
+            "campaign": "mc23e - AF3",
+        },
+        {
+            "dataset": f"{scope}.{run_number}.PhPy8EG.deriv.DAOD_PHYSLITE."
+            "e8514_s4369_r99999_p6697",
+            "campaign": "",
+        },
+    ]
+
+
+def test_make_did_info_converts_units():
+    info = pipeline.make_did_info(
+        "mc23_13p6TeV.601237.PhPy8EG.deriv.DAOD_PHYSLITE.e8514_s4369_r16083_p6697",
+        "mc23e - FS",
+        {"Cross Section (nb)": "0.81129", "Filter Efficiency": 0.4561725},
+    )
+    assert info.x_sec == pytest.approx(811.29)
+    assert info.generator_filter_eff == pytest.approx(0.4561725)
+    assert info.k_factor == 1.0
+    assert info.d_type == "DAOD_PHYSLITE"
+    assert info.period == "mc23e"
+    assert info.s_type == "FS"
+
+
+def test_make_did_info_missing_metadata():
+    info = pipeline.make_did_info("mc23_13p6TeV.601237.X.deriv.DAOD_PHYS.e1", "", {})
+    assert math.isnan(info.x_sec)
+    assert info.period == ""
+
+
+@pytest.mark.asyncio
+async def test_resolve_samples_from_hashtags(mocker):
+    mocker.patch("atlas_mcp.central_page.get_evtgen_for_address", return_value=EVNTS)
+    mocker.patch("atlas_mcp.central_page.get_samples_for_run", side_effect=_samples)
+    metadata = mocker.patch(
+        "atlas_mcp.central_page.get_metadata",
+        return_value={"Cross Section (nb)": 1.0, "Filter Efficiency": 0.5},
+    )
+
+    progress = []
+
+    async def on_run_done(run_number, infos, done, total):
+        progress.append((run_number, len(infos), done, total))
+
+    result = await pipeline.resolve_samples(
+        "mc23_13p6TeV",
+        "PHYSLITE",
+        hashtags=["Top", "TTbar", "Baseline", "PowhegPythia"],
+        on_run_done=on_run_done,
+    )
+    infos = result.samples
+    assert result.failed == {}
+
+    # Two runs, two samples with a campaign each, in run order
+    assert [i.did.split(".")[1] for i in infos] == ["601237"] * 2 + ["601229"] * 2
+    assert {i.s_type for i in infos} == {"FS", "AF3"}
+
+    # Metadata is fetched once per run, from the EVNT
+    assert metadata.call_count == 2
+    metadata.assert_any_call("mc23_13p6TeV", EVNTS[0])
+
+    assert sorted(p[0] for p in progress) == ["601229", "601237"]
+    assert [p[2:] for p in progress] == [(1, 2), (2, 2)]
+
+
+@pytest.mark.asyncio
+async def test_resolve_samples_from_run_numbers(mocker):
+    mocker.patch("atlas_mcp.central_page.get_samples_for_run", side_effect=_samples)
+    metadata = mocker.patch("atlas_mcp.central_page.get_metadata", return_value={})
+
+    result = await pipeline.resolve_samples(
+        "mc23_13p6TeV", "PHYSLITE", run_numbers=["601237"]
+    )
+
+    assert len(result.samples) == 2
+    _, kwargs = metadata.call_args
+    assert kwargs == {"use_top_of_provenance": True}
+
+
+@pytest.mark.asyncio
+async def test_resolve_samples_bounds_concurrency(mocker):
+    in_flight = 0
+    max_seen = 0
+    lock = threading.Lock()
+
+    def slow_samples(scope, run_number, data_tier):
+        nonlocal in_flight, max_seen
+        with lock:
+            in_flight += 1
+            max_seen = max(max_seen, in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+        return []
+
+    mocker.patch("atlas_mcp.central_page.get_samples_for_run", side_effect=slow_samples)
+
+    await pipeline.resolve_samples(
+        "mc23_13p6TeV",
+        "PHYSLITE",
+        run_numbers=[str(r) for r in range(10)],
+        max_concurrency=3,
+    )
+
+    assert max_seen == 3
+
+
+@pytest.mark.asyncio
+async def test_resolve_samples_needs_input():
+    with pytest.raises(ValueError):
+        await pipeline.resolve_samples("mc23_13p6TeV", "PHYSLITE")
+
+
+@pytest.mark.asyncio
+async def test_iter_resolve_samples_streams_fast_runs_first(mocker):
+    def samples(scope, run_number, data_tier):
+        time.sleep(0.1 if run_number == "slow" else 0.0)
+        return _samples(scope, run_number, data_tier)
+
+    mocker.patch("atlas_mcp.central_page.get_samples_for_run", side_effect=samples)
+    mocker.patch("atlas_mcp.central_page.get_metadata", return_value={})
+
+    order = [
+        run
+        async for run, _, _ in pipeline.iter_resolve_samples(
+            "mc23_13p6TeV", ["slow", "fast"], "PHYSLITE"
+        )
+    ]
+    assert order == ["fast", "slow"]
+
+
+@pytest.mark.asyncio
+async def test_resolve_samples_keeps_going_past_failed_runs(mocker):
+    def samples(scope, run_number, data_tier):
+        if run_number == "broken":
+            raise RuntimeError("command failed with return code 1")
+        if run_number == "odd":
+            return {"error": "not a list"}
+        return _samples(scope, run_number, data_tier)
+
+    mocker.patch("atlas_mcp.central_page.get_samples_for_run", side_effect=samples)
+    mocker.patch("atlas_mcp.central_page.get_metadata", return_value={})
+    progress = []
+
+    async def on_run_done(run_number, infos, done, total):
+        progress.append((done, total))
+
+    result = await pipeline.resolve_samples(
+        "mc23_13p6TeV",
+        "PHYSLITE",
+        run_numbers=["broken", "601237", "odd"],
+        on_run_done=on_run_done,
+    )
+
+    assert len(result.samples) == 2
+    assert set(result.failed) == {"broken", "odd"}
+    assert result.failed["broken"].startswith("RuntimeError: command failed")
+    assert result.failed["odd"].startswith("ValueError")
+    assert sorted(progress) == [(1, 3), (2, 3), (3, 3)]
+
+
+@pytest.mark.asyncio
+async def test_search_scopes_runs_scopes_concurrently(mocker):
+    def find(scope, keyword, level3=""):
+        time.sleep(0.2)
+        return [
+            pipeline.CentralPageAddress(
+                scope=scope, hash_tags=("Top", "TTbar", "Baseline", "PowhegPythia")
+            )
+        ]
+
+    mocker.patch("atlas_mcp.central_page.get_address_for_keyword", side_effect=find)
+    scopes = ["mc23_13p6TeV", "mc20_13TeV", "mc16_13TeV"]
+
+    start = time.monotonic()
+    result = await pipeline.search_scopes("ttbar", scopes, level3="Baseline")
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.5
+    assert [a.scope for a in result.addresses] == scopes
+    assert result.failed == {}
+
+
+@pytest.mark.asyncio
+async def test_search_scopes_reports_failed_scopes(mocker):
+    def find(scope, keyword, level3=""):
+        if scope == "mc20_13TeV":
+            raise RuntimeError("ami-helper failed")
+        return [
+            pipeline.CentralPageAddress(scope=scope, hash_tags=("a", "b", "c", "d"))
+        ]
+
+    mocker.patch("atlas_mcp.central_page.get_address_for_keyword", side_effect=find)
+    mocker.patch(
+        "atlas_mcp.central_page.get_allowed_scopes",
+        return_value=[
+            mocker.Mock(scope="mc23_13p6TeV"),
+            mocker.Mock(scope="mc20_13TeV"),
+        ],
+    )
+
+    progress = []
+
+    async def on_scope_done(scope, found, done, total):
+        progress.append((scope, len(found), total))
+
+    result = await pipeline.search_scopes("ttbar", on_scope_done=on_scope_done)
+
+    assert [a.scope for a in result.addresses] == ["mc23_13p6TeV"]
+    assert result.failed == {"mc20_13TeV": "RuntimeError: ami-helper failed"}
+    assert sorted(progress) == [("mc20_13TeV", 0, 2), ("mc23_13p6TeV", 1, 2)]
+
+
+@pytest.mark.asyncio
+async def test_get_samples_for_runs_bounds_concurrency(mocker):
+    in_flight = 0
+    most = 0
+    lock = threading.Lock()
+
+    def samples(scope, run_number, data_tier):
+        nonlocal in_flight, most
+        with lock:
+            in_flight += 1
+            most = max(most, in_flight)
+        time.sleep(0.02)
+        with lock:
+            in_flight -= 1
+        if run_number == "bad":
+            raise RuntimeError("no such run")
+        return _samples(scope, run_number, data_tier)
+
+    mocker.patch("atlas_mcp.central_page.get_samples_for_run", side_effect=samples)
+    runs = [str(600000 + i) for i in range(8)] + ["bad"]
+
+    result = await pipeline.get_samples_for_runs(
+        "mc23_13p6TeV", runs, ["PHYSLITE", "PHYS"], max_concurrency=3
+    )
+
+    assert most <= 3
+    assert list(result.samples) == runs
+    assert len(result.samples["600000"]["PHYS"]) == 3
+    assert result.samples["bad"] == {}
+    assert result.failed == {
+        "bad": {
+            "PHYSLITE": "RuntimeError: no such run",
+            "PHYS": "RuntimeError: no such run",
+        }
+    }
@@ -0,0 +1,100 @@
+import json
+import time
+
+import pytest
+
+from atlas_mcp import deadlines, profiling
+
+
+@pytest.fixture
+def profile_dir(tmp_path):
+    old = profiling.status()
+    yield tmp_path
+    profiling.configure(old.tools, old.directory, old.interval_ms)
+
+
+def busy_helper(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return "done"
+
+
+def test_disabled_writes_nothing(profile_dir):
+    profiling.configure([], directory=profile_dir)
+
+    @profiling.profiled
+    def tool():
+        return busy_helper(0.01)
+
+    assert tool() == "done"
+    assert list(profile_dir.iterdir()) == []
+
+
+def test_sync_tool_profile(profile_dir):
+    profiling.configure(["tool"], directory=profile_dir, interval_ms=1)
+
+    @profiling.profiled
+    def tool():
+        return busy_helper(0.1)
+
+    assert tool() == "done"
+
+    per_call = list((profile_dir / "tool").glob("*.folded"))
+    assert len(per_call) == 1
+    assert "busy_helper (test_profiling.py)" in per_call[0].read_text()
+
+    tool()
+    aggregate = (profile_dir / "tool.folded").read_text().splitlines()
+    total = sum(int(line.rpartition(" ")[2]) for line in aggregate)
+    assert total >= 2
+
+    calls = [json.loads(line) for line in open(profile_dir / "calls.jsonl")]
+    assert [c["tool"] for c in calls] == ["tool", "tool"]
+    assert calls[0]["duration_ms"] >= 100
+
+
+@pytest.mark.asyncio
+async def test_async_tool_follows_worker_threads(profile_dir):
+    profiling.configure(["*"], directory=profile_dir, interval_ms=1)
+
+    @profiling.profiled
+    async def tool():
+        return await deadlines.run_in_thread(busy_helper, 0.1)
+
+    assert await tool() == "done"
+    (per_call,) = (profile_dir / "tool").glob("*.folded")
+    assert "busy_helper" in per_call.read_text()
+
+
+def other_request(seconds: float):
+    return busy_helper(seconds)
+
+
+@pytest.mark.asyncio
+async def test_async_tool_skips_event_loop(profile_dir):
+    """Work on the event loop may belong to any request, so it is not sampled."""
+    profiling.configure(["tool"], directory=profile_dir, interval_ms=1)
+
+    @profiling.profiled
+    async def tool():
+        other_request(0.05)
+        return await deadlines.run_in_thread(busy_helper, 0.05)
+
+    assert await tool() == "done"
+    (per_call,) = (profile_dir / "tool").glob("*.folded")
+    assert "busy_helper" in per_call.read_text()
+    assert "other_request" not in per_call.read_text()
+
+
+def test_errors_are_logged(profile_dir):
+    profiling.configure(["tool"], directory=profile_dir)
+
+    @profiling.profiled
+    def tool():
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        tool()
+    (call,) = [json.loads(line) for line in open(profile_dir / "calls.jsonl")]
+    assert call["error"] == "ValueError"
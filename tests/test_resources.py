@@ -0,0 +1,119 @@
+import json
+
+import pytest
+from mcp import types
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import atlas_mcp.central_page as central_page_mod
+from atlas_mcp import resources, server
+
+SCOPE = "mc23_13p6TeV"
+TAGS = ("Top", "TTbar", "Baseline", "PowhegPythia")
+EVNT = ["mc23_13p6TeV.601237.PhPy8EG_ttbar_allhad.evgen.EVNT.e8514"]
+
+
+def test_hashtag_tree():
+    central_page_mod.cache.clear()
+    central_page_mod._search_indices.clear()
+    central_page_mod.record_addresses(
+        SCOPE,
+        [
+            TAGS,
+            ("Top", "TTbar", "Baseline", "Sherpa"),
+            ("Jets", "Dijet", "Systematic", "Pythia"),
+        ],
+    )
+
+    assert resources.hashtag_tree(SCOPE) == {
+        "Jets": {"Dijet": {"Systematic": ["Pythia"]}},
+        "Top": {"TTbar": {"Baseline": ["PowhegPythia", "Sherpa"]}},
+    }
+    assert resources.hashtag_tree("mc20_13TeV") == {}
+
+
+def test_catalog_listing_only_has_cached_catalogs(mocker):
+    central_page_mod.cache.clear()
+    central_page_mod._search_indices.clear()
+    assert [uri for uri, _, _ in resources.catalog_listing()] == [resources.SCOPES_URI]
+
+    mocker.patch("atlas_mcp.central_page.run_ami_helper", return_value=EVNT)
+    cpa = central_page_mod.CentralPageAddress(scope=SCOPE, hash_tags=TAGS)
+    central_page_mod.get_evtgen_for_address(cpa)
+
+    listing = {uri: content for uri, _, content in resources.catalog_listing()}
+    evnt_uri = resources.evnt_uri(SCOPE, TAGS)
+    assert evnt_uri == "atlas://mc23_13p6TeV/evnt/Top/TTbar/Baseline/PowhegPythia"
+    assert json.loads(listing[evnt_uri]) == EVNT
+    assert resources.hashtags_uri(SCOPE) in listing
+
+
+@pytest.mark.asyncio
+async def test_resources_etags_and_notifications(mocker):
+    central_page_mod.cache.clear()
+    central_page_mod._search_indices.clear()
+    mocker.patch("atlas_mcp.central_page.run_ami_helper", return_value=EVNT)
+    notifications = []
+
+    async def message_handler(message):
+        if isinstance(message, types.ServerNotification):
+            notifications.append(message.root)
+
+    async with create_connected_server_and_client_session(
+        server.mcp, message_handler=message_handler
+    ) as client:
+        caps = client.get_server_capabilities()
+        assert caps.resources.subscribe and caps.resources.listChanged
+
+        listed = (await client.list_resources()).resources
+        assert [str(r.uri) for r in listed] == [resources.SCOPES_URI]
+
+        scopes = (await client.read_resource(resources.SCOPES_URI)).contents[0]
+        assert scopes.meta["etag"] == resources.etag(scopes.text)
+        assert scopes.meta["etag"] == listed[0].meta["etag"]
+
+        evnt_uri = resources.evnt_uri(SCOPE, TAGS)
+        await client.subscribe_resource(evnt_uri)
+        await client.call_tool(
+            "get_evtgen_for_address", {"scope": SCOPE, "hashtags": list(TAGS)}
+        )
+
+        kinds = {type(n) for n in notifications}
+        assert types.ResourceListChangedNotification in kinds
+        assert [
+            str(n.params.uri)
+            for n in notifications
+            if isinstance(n, types.ResourceUpdatedNotification)
+        ] == [evnt_uri]
+
+        listed = {str(r.uri): r for r in (await client.list_resources()).resources}
+        evnt = (await client.read_resource(evnt_uri)).contents[0]
+        assert json.loads(evnt.text) == EVNT
+        assert evnt.meta["etag"] == listed[evnt_uri].meta["etag"]
+
+        # Nothing changed, so nothing more to hear about
+        notifications.clear()
+        await client.call_tool(
+            "get_evtgen_for_address", {"scope": SCOPE, "hashtags": list(TAGS)}
+        )
+        assert notifications == []
+
+
+@pytest.mark.asyncio
+async def test_publish_only_hashes_changed_catalogs(mocker):
+    central_page_mod.cache.clear()
+    central_page_mod._search_indices.clear()
+    notifier = resources.ResourceNotifier()
+    session = mocker.AsyncMock()
+    await notifier.watch(session)
+
+    listing = mocker.spy(resources, "catalog_listing")
+    entry = mocker.spy(resources, "catalog_entry")
+    await notifier.publish()
+    assert listing.call_count == 0 and entry.call_count == 0
+
+    notifier.mark_changed(SCOPE)
+    central_page_mod.cache.set(("fuzzy_search", SCOPE, "addresses"), [TAGS])
+    await notifier.publish()
+    assert listing.call_count == 0
+    assert [c.args for c in entry.call_args_list] == [(SCOPE, None)]
+    session.send_resource_list_changed.assert_called_once()
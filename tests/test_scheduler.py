@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from atlas_mcp import deadlines, scheduler
+from atlas_mcp.scheduler import Priority, Scheduler, TokenBucket
+
+
+def _wait_for_queued(s: Scheduler, n: int):
+    for _ in range(200):
+        if sum(p.queued for p in s.stats().by_priority.values()) == n:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"never saw {n} queued calls")
+
+
+def test_priority_order():
+    s = Scheduler("test", max_concurrent=1, rate=1000, burst=1000)
+    order = []
+
+    def call(p: Priority):
+        with scheduler.priority(p):
+            with s.slot():
+                order.append(p)
+
+    with s.slot():
+        threads = []
+        for n, p in enumerate([Priority.PREWARM, Priority.BATCH, Priority.INTERACTIVE]):
+            t = threading.Thread(target=call, args=(p,))
+            t.start()
+            threads.append(t)
+            _wait_for_queued(s, n + 1)
+    for t in threads:
+        t.join(5)
+
+    assert order == [Priority.INTERACTIVE, Priority.BATCH, Priority.PREWARM]
+    stats = s.stats()
+    assert stats.running == 0
+    assert stats.by_priority["interactive"].served == 2
+    assert stats.by_priority["prewarm"].wait_max_ms > 0
+
+
+def test_fifo_within_a_class():
+    s = Scheduler("test", max_concurrent=1, rate=1000, burst=1000)
+    order = []
+
+    def call(n: int):
+        with s.slot():
+            order.append(n)
+
+    with s.slot():
+        threads = []
+        for n in range(3):
+            t = threading.Thread(target=call, args=(n,))
+            t.start()
+            threads.append(t)
+            _wait_for_queued(s, n + 1)
+    for t in threads:
+        t.join(5)
+    assert order == [0, 1, 2]
+
+
+def test_rate_limit():
+    s = Scheduler("test", max_concurrent=10, rate=10, burst=1)
+    start = time.monotonic()
+    for _ in range(3):
+        with s.slot():
+            pass
+    # One from the burst, then two more at 10/s
+    assert time.monotonic() - start >= 0.15
+
+
+def test_token_bucket_delay():
+    bucket = TokenBucket(rate=2, burst=1)
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.5, abs=0.05)
+
+
+def test_deadline_while_queued():
+    s = Scheduler("test", max_concurrent=1, rate=1000, burst=1000)
+    with s.slot():
+        with deadlines.deadline(0.2):
+            with pytest.raises(deadlines.BackendTimeoutError, match="busy"):
+                with s.slot():
+                    pass
+    stats = s.stats()
+    assert stats.by_priority["interactive"].queued == 0
+    assert stats.running == 0
+
+    # And the queue still works afterwards
+    with s.slot():
+        assert s.stats().running == 1
+
+
+def test_get_scheduler_env(monkeypatch):
+    monkeypatch.setenv("ATLAS_MCP_TESTBACKEND_CONCURRENCY", "2")
+    scheduler.reset("testbackend")
+    try:
+        s = scheduler.get_scheduler("testbackend")
+        assert s.max_concurrent == 2
+        assert scheduler.get_scheduler("testbackend") is s
+        assert any(st.backend == "testbackend" for st in scheduler.all_stats())
+    finally:
+        scheduler.reset("testbackend")
@@ -1,6 +1,17 @@
 import json
-from atlas_mcp.central_page import CentralPageAddress, CentralPageScope
-from atlas_mcp import server
+import sys
+
+import pytest
+
+from atlas_mcp.catalog_index import DatasetRecord
+from atlas_mcp.central_page import (
+    CentralPageAddress,
+    CentralPageScope,
+    DIDInfo,
+    RefreshResult,
+)
+from atlas_mcp.fuzzy_search import SearchHit
+from atlas_mcp import breaker, deadlines, pipeline, profiling, scheduler, server
 
 
 def test_get_allowed_scopes(mocker):
@@ -32,7 +43,8 @@ def test_get_allowed_scopes(mocker):
     assert parsed[0]["description"] == "Run 3 MC"
 
 
-def test_get_addresses_for_keyword_baseline_only(mocker):
+@pytest.mark.asyncio
+async def test_get_addresses_for_keyword_baseline_only(mocker):
     """Test get_addresses_for_keyword with baseline_only=True (default)."""
     # Create mock data with mix of Baseline, Systematic, and Alternative
     mock_addresses = [
@@ -61,7 +73,7 @@ def test_get_addresses_for_keyword_baseline_only(mocker):
     )
 
     # Call the server function with baseline_only=True (default)
-    result = server.get_addresses_for_keyword("mc23_13p6TeV", "Dijet")
+    result = await server.get_addresses_for_keyword("mc23_13p6TeV", "Dijet")
 
     # Verify the result is valid JSON
     parsed = json.loads(result)
@@ -77,7 +89,30 @@ def test_get_addresses_for_keyword_baseline_only(mocker):
         assert "Dijet" in addr.hash_tags
 
 
-def test_get_addresses_for_keyword_all_types(mocker):
+@pytest.mark.asyncio
+async def test_get_addresses_for_keyword_all_scopes(mocker):
+    """Test get_addresses_for_keyword_all_scopes merges the scopes' results."""
+
+    def find(scope, keyword, level3=""):
+        return [
+            CentralPageAddress(
+                scope=scope, hash_tags=("JetPhoton", "Dijet", "Baseline", "Pythia8")
+            )
+        ]
+
+    mocker.patch("atlas_mcp.central_page.get_address_for_keyword", side_effect=find)
+
+    result = await server.get_addresses_for_keyword_all_scopes(
+        "Dijet", scopes=["mc23_13p6TeV", "mc20_13TeV"]
+    )
+    parsed = json.loads(result)
+
+    assert [a["scope"] for a in parsed["addresses"]] == ["mc23_13p6TeV", "mc20_13TeV"]
+    assert parsed["failed"] == {}
+
+
+@pytest.mark.asyncio
+async def test_get_addresses_for_keyword_all_types(mocker):
     """Test get_addresses_for_keyword with baseline_only=False."""
     # Create mock data with mix of Baseline, Systematic, and Alternative
     mock_addresses = [
@@ -106,7 +141,7 @@ def test_get_addresses_for_keyword_all_types(mocker):
     )
 
     # Call the server function with baseline_only=False
-    result = server.get_addresses_for_keyword(
+    result = await server.get_addresses_for_keyword(
         "mc23_13p6TeV", "Dijet", baseline_only=False
     )
 
@@ -128,7 +163,8 @@ def test_get_addresses_for_keyword_all_types(mocker):
     assert types_found == {"Baseline", "Systematic", "Alternative"}
 
 
-def test_get_metadata_tool(mocker):
+@pytest.mark.asyncio
+async def test_get_metadata_tool(mocker):
     """Server get_metadata tool returns JSON and passes through flag."""
     mocked = mocker.patch(
         "atlas_mcp.central_page.get_metadata",
@@ -140,7 +176,7 @@ def test_get_metadata_tool(mocker):
 
     scope = "mc23_13p6TeV"
     dataset = "mc23_13p6TeV.123456.Pythia8...DAOD_PHYS.e8514_s4162_r14622_p5855"
-    result = server.get_metadata(scope, dataset, use_top_of_provenance=True)
+    result = await server.get_metadata(scope, dataset, use_top_of_provenance=True)
 
     parsed = json.loads(result)
     assert parsed["Physics Comment"] == "NULL"
@@ -149,3 +185,315 @@ def test_get_metadata_tool(mocker):
     mocked.assert_called_once_with(
         scope, dataset, use_top_of_provenance=True
     )
+
+
+@pytest.mark.asyncio
+async def test_search_addresses_baseline_only(mocker):
+    """search_addresses drops non-Baseline hits and applies the limit afterwards."""
+    mocked = mocker.patch(
+        "atlas_mcp.central_page.search_hashtags",
+        return_value=[
+            SearchHit(
+                kind="address",
+                scope="mc23_13p6TeV",
+                hash_tags=("Top", "TTbar", "Systematic", "Herwig7"),
+                score=3.0,
+            ),
+            SearchHit(
+                kind="address",
+                scope="mc23_13p6TeV",
+                hash_tags=("Top", "TTbar", "Baseline", "PowhegPythia"),
+                score=2.0,
+            ),
+        ],
+    )
+
+    parsed = json.loads(await server.search_addresses("mc23_13p6TeV", "tt", limit=1))
+
+    assert len(parsed) == 1
+    assert parsed[0]["hash_tags"][2] == "Baseline"
+    mocked.assert_called_once_with("mc23_13p6TeV", "tt", limit=None)
+
+
+def test_search_datasets_tool(mocker):
+    """search_datasets passes the tier through and returns the records as json."""
+    mocked = mocker.patch(
+        "atlas_mcp.central_page.search_datasets",
+        return_value=[
+            DatasetRecord(
+                scope="mc23_13p6TeV",
+                name="mc23_13p6TeV.601237.PhPy8EG_ttbar.deriv.DAOD_PHYSLITE.e1_s2_r3_p4",
+                tier="DAOD_PHYSLITE",
+                run_number="601237",
+            )
+        ],
+    )
+
+    parsed = json.loads(server.search_datasets("mc23_13p6TeV", "ttbar", "PHYSLITE"))
+
+    assert parsed[0]["run_number"] == "601237"
+    mocked.assert_called_once_with("mc23_13p6TeV", "ttbar", tier="PHYSLITE")
+
+
+@pytest.mark.asyncio
+async def test_resolve_samples_tool_reports_progress(mocker):
+    """resolve_samples returns the DIDInfo records and reports per-run progress."""
+
+    async def fake_resolve(scope, data_tier, hashtags, run_numbers, on_run_done):
+        info = DIDInfo(
+            did="mc23_13p6TeV.601237.X.deriv.DAOD_PHYSLITE.e8514_s4369_r16083_p6697",
+            x_sec=811.29,
+            generator_filter_eff=0.45,
+            k_factor=1.0,
+            d_type="DAOD_PHYSLITE",
+            s_type="FS",
+            period="mc23e",
+        )
+        await on_run_done("601237", [info], 1, 2)
+        await on_run_done("601229", [], 2, 2)
+        return pipeline.ResolvedSamples(samples=[info], failed={"601229": "boom"})
+
+    mocker.patch("atlas_mcp.pipeline.resolve_samples", side_effect=fake_resolve)
+    ctx = mocker.AsyncMock()
+
+    result = await server.resolve_samples(
+        "mc23_13p6TeV", "PHYSLITE", ctx, run_numbers=["601237"]
+    )
+
+    parsed = json.loads(result)
+    assert parsed["samples"][0]["period"] == "mc23e"
+    assert parsed["failed"] == {"601229": "boom"}
+    ctx.report_progress.assert_any_await(1, 2, message="run 601237: 1 datasets")
+
+
+@pytest.mark.asyncio
+async def test_resolve_samples_tool_checks_hashtags(mocker):
+    with pytest.raises(ValueError):
+        await server.resolve_samples(
+            "mc23_13p6TeV", "PHYSLITE", mocker.AsyncMock(), hashtags=["Top"]
+        )
+
+
+@pytest.mark.asyncio
+async def test_get_evtgen_for_address_filters_physics_short(mocker):
+    mocker.patch(
+        "atlas_mcp.central_page.get_evtgen_for_address",
+        return_value=[
+            "mc23_13p6TeV.601237.PhPy8EG_A14_ttbar_hdamp258p75_allhad.evgen.EVNT.e8514",
+            "mc23_13p6TeV.601229.PhPy8EG_A14_ttbar_hdamp258p75_SingleLep.evgen.EVNT.e8514",
+        ],
+    )
+
+    result = await server.get_evtgen_for_address(
+        "mc23_13p6TeV",
+        ["Top", "TTbar", "Baseline", "PowhegPythia"],
+        physics_short_contains="singlelep",
+    )
+
+    assert [ds.split(".")[1] for ds in json.loads(result)] == ["601229"]
+
+
+@pytest.mark.asyncio
+async def test_get_evtgen_for_address_reports_progress(mocker):
+    """Samples are sent as progress messages as ami-helper prints them."""
+    import atlas_mcp.central_page as cp
+
+    cp.cache.clear()
+    samples = [
+        "mc23_13p6TeV.601237.PhPy8EG_A14_ttbar_hdamp258p75_allhad.evgen.EVNT.e8514",
+        "mc23_13p6TeV.601229.PhPy8EG_A14_ttbar_hdamp258p75_SingleLep.evgen.EVNT.e8514",
+    ]
+
+    def fake_run_on_wsl(command, files=None, on_line=None):
+        stdout = "\n".join(["setting up atlas", "--start--"] + samples) + "\n"
+        echo = [sys.executable, "-c", "import sys; sys.stdout.write(sys.argv[1])"]
+        return deadlines.run_process([*echo, stdout], on_line=on_line).stdout
+
+    mocker.patch("atlas_mcp.central_page.run_on_wsl", side_effect=fake_run_on_wsl)
+    ctx = mocker.AsyncMock()
+
+    result = await server.get_evtgen_for_address(
+        "mc23_13p6TeV",
+        ["Top", "TTbar", "Baseline", "PowhegPythia"],
+        physics_short_contains="singlelep",
+        ctx=ctx,
+    )
+
+    assert json.loads(result) == samples[1:]
+    ctx.report_progress.assert_awaited_once_with(1, message=samples[1])
+
+
+@pytest.mark.asyncio
+async def test_get_samples_for_run_latest_only(mocker):
+    base = "mc23_13p6TeV.601237.PhPy8EG.deriv.DAOD_PHYSLITE.e8514_s4369_r16083_"
+    mocker.patch(
+        "atlas_mcp.central_page.get_samples_for_run",
+        return_value=[
+            {"dataset": base + "p6266", "campaign": "mc23e - FS"},
+            {"dataset": base + "p6697", "campaign": "mc23e - FS"},
+        ],
+    )
+
+    result = await server.get_samples_for_run(
+        "mc23_13p6TeV", "601237", "PHYSLITE", latest_only=True
+    )
+
+    assert [r["dataset"] for r in json.loads(result)] == [base + "p6697"]
+
+
+@pytest.mark.asyncio
+async def test_get_samples_for_run_campaign_filter(mocker):
+    """Datasets are annotated with period/sim_type and can be filtered on them."""
+    base = "mc23_13p6TeV.601237.PhPy8EG.deriv.DAOD_PHYSLITE.e8514_"
+    mocker.patch(
+        "atlas_mcp.central_page.get_samples_for_run",
+        return_value=[
+            {"dataset": base + "s4369_r16083_p6697", "campaign": "mc23e - FS"},
+            {"dataset": base + "a934_r16083_p6697", "campaign": "mc23e - AF3"},
+            {"dataset": base + "s4162_r15540_p6697", "campaign": "mc23a - FS"},
+            {"dataset": base + "s4162_r99999_p6697", "campaign": ""},
+        ],
+    )
+
+    everything = json.loads(
+        await server.get_samples_for_run("mc23_13p6TeV", "601237", "PHYSLITE")
+    )
+    assert len(everything) == 4
+    assert everything[1]["period"] == "mc23e"
+    assert everything[1]["sim_type"] == "AF3"
+    assert everything[3]["period"] == ""
+
+    fs_23e = json.loads(
+        await server.get_samples_for_run(
+            "mc23_13p6TeV", "601237", "PHYSLITE", campaign="mc23e", sim_type="FS"
+        )
+    )
+    assert [r["dataset"] for r in fs_23e] == [base + "s4369_r16083_p6697"]
+
+    run3_fs = json.loads(
+        await server.get_samples_for_run(
+            "mc23_13p6TeV", "601237", "PHYSLITE", campaign="mc23", sim_type="fs"
+        )
+    )
+    assert len(run3_fs) == 2
+
+
+@pytest.mark.asyncio
+async def test_get_samples_for_run_columns_format(mocker):
+    base = "mc23_13p6TeV.601237.PhPy8EG.deriv.DAOD_PHYSLITE.e8514_s4369_r16083_"
+    mocker.patch(
+        "atlas_mcp.central_page.get_samples_for_run",
+        return_value=[
+            {"dataset": base + "p6266", "campaign": "mc23e - FS"},
+            {"dataset": base + "p6697", "campaign": "mc23e - FS"},
+        ],
+    )
+
+    result = json.loads(
+        await server.get_samples_for_run(
+            "mc23_13p6TeV", "601237", "PHYSLITE", format="columns"
+        )
+    )
+
+    assert result["format"] == "columns"
+    assert result["constant"]["period"] == "mc23e"
+    assert result["columns"] == {"tags": ["p6266", "p6697"]}
+
+    tsv = await server.get_samples_for_run(
+        "mc23_13p6TeV", "601237", "PHYSLITE", format="tsv"
+    )
+    assert tsv.splitlines()[-2:] == ["p6266", "p6697"]
+
+
+@pytest.mark.asyncio
+async def test_get_samples_for_runs(mocker):
+    """Runs and tiers are looked up together and grouped by run, then tier."""
+
+    def samples(scope, run_number, data_tier):
+        return [
+            {
+                "dataset": f"{scope}.{run_number}.PhPy8EG.deriv.DAOD_{data_tier}."
+                "e8514_s4369_r16083_p6697",
+                "campaign": "mc23e - FS",
+            }
+        ]
+
+    lookup = mocker.patch(
+        "atlas_mcp.central_page.get_samples_for_run", side_effect=samples
+    )
+
+    result = json.loads(
+        await server.get_samples_for_runs(
+            "mc23_13p6TeV", ["601237", "601229"], ["PHYSLITE", "PHYS"]
+        )
+    )
+
+    assert lookup.call_count == 4
+    assert list(result["samples"]) == ["601237", "601229"]
+    assert list(result["samples"]["601229"]) == ["PHYSLITE", "PHYS"]
+    row = result["samples"]["601229"]["PHYS"][0]
+    assert ".601229." in row["dataset"] and "DAOD_PHYS." in row["dataset"]
+    assert row["period"] == "mc23e"
+    assert result["failed"] == {}
+
+
+@pytest.mark.asyncio
+async def test_refresh_datasets_tool(mocker):
+    mocked = mocker.patch(
+        "atlas_mcp.central_page.refresh_samples_for_run",
+        return_value=RefreshResult(added=["ds2"], total=2, synced_at=2.0),
+    )
+
+    parsed = json.loads(
+        await server.refresh_datasets(
+            "mc23_13p6TeV", run_number="601237", data_tier="PHYS"
+        )
+    )
+
+    assert parsed["added"] == ["ds2"]
+    mocked.assert_called_once_with("mc23_13p6TeV", "601237", "PHYS")
+
+    with pytest.raises(ValueError):
+        await server.refresh_datasets("mc23_13p6TeV")
+
+
+def test_get_backend_status(mocker):
+    mocker.patch(
+        "atlas_mcp.scheduler.all_stats",
+        return_value=[
+            scheduler.SchedulerStats(
+                backend="ami",
+                running=1,
+                max_concurrent=4,
+                rate=2.0,
+                by_priority={"interactive": scheduler.PriorityStats(queued=2)},
+            )
+        ],
+    )
+
+    mocker.patch(
+        "atlas_mcp.breaker.all_stats",
+        return_value=[
+            breaker.BreakerStats(backend="ami", state="open", consecutive_failures=3)
+        ],
+    )
+
+    parsed = json.loads(server.get_backend_status())
+
+    assert parsed[0]["backend"] == "ami"
+    assert parsed[0]["scheduler"]["by_priority"]["interactive"]["queued"] == 2
+    assert parsed[0]["breaker"]["state"] == "open"
+
+
+def test_set_profiling_tool(mocker):
+    mocked = mocker.patch(
+        "atlas_mcp.profiling.configure",
+        return_value=profiling.ProfilingStatus(
+            tools=["get_metadata"], directory="/tmp/p", interval_ms=5
+        ),
+    )
+
+    parsed = json.loads(server.set_profiling(["get_metadata"]))
+
+    assert parsed["tools"] == ["get_metadata"]
+    mocked.assert_called_once_with(["get_metadata"])
@@ -0,0 +1,115 @@
+import gzip
+import pickle
+import time
+
+import pytest
+from diskcache import Cache
+
+from atlas_mcp import cli
+from atlas_mcp.catalog_index import CatalogIndex
+from atlas_mcp.snapshot import export_snapshot, import_snapshot
+
+EVNT = "mc23_13p6TeV.601237.PhPy8EG_A14_ttbar_hdamp258p75_allhad.evgen.EVNT.e8514"
+PROV_KEY = ("atlas_mcp.central_page.get_provenance", "mc23_13p6TeV", EVNT)
+
+
+@pytest.fixture
+def source(tmp_path):
+    cache = Cache(str(tmp_path / "src_cache"))
+    catalog = CatalogIndex(tmp_path / "src_catalog.sqlite")
+    cache.set(PROV_KEY, [EVNT])
+    cache.set(("atlas_mcp.central_page.get_metadata", "x"), {"a": 1}, expire=3600)
+    cache.set(("atlas_mcp.central_page.get_metadata", "old"), {"a": 2}, expire=0.01)
+    cache.set(
+        ("fuzzy_search", "mc23_13p6TeV", "addresses"),
+        [("Top", "TTbar", "Baseline", "PowhegPythia")],
+    )
+    catalog.record_datasets("mc23_13p6TeV", [EVNT])
+    time.sleep(0.02)
+    return cache, catalog
+
+
+@pytest.fixture
+def target(tmp_path):
+    return Cache(str(tmp_path / "dst_cache")), CatalogIndex(tmp_path / "dst.sqlite")
+
+
+def test_round_trip(tmp_path, source, target):
+    snapshot = tmp_path / "snap.gz"
+    out_stats = export_snapshot(snapshot, *source)
+    assert out_stats.entries == {
+        "get_provenance": 1,
+        "get_metadata": 1,
+        "fuzzy_search": 1,
+    }
+    assert out_stats.skipped_expired == 1
+    assert out_stats.catalog_datasets == 1
+
+    cache, catalog = target
+    in_stats = import_snapshot(snapshot, cache, catalog)
+    assert in_stats.entries == out_stats.entries
+
+    assert cache.get(PROV_KEY) == [EVNT]
+    _, expire_time = cache.get(
+        ("atlas_mcp.central_page.get_metadata", "x"), expire_time=True
+    )
+    assert expire_time is not None and expire_time <= time.time() + 3600
+    assert [r.name for r in catalog.search("mc23_13p6TeV", "ttbar")] == [EVNT]
+
+
+def test_import_keeps_local_entries_and_merges_search_data(tmp_path, source, target):
+    snapshot = tmp_path / "snap.gz"
+    export_snapshot(snapshot, *source)
+
+    cache, catalog = target
+    cache.set(PROV_KEY, ["local"])
+    cache.set(
+        ("fuzzy_search", "mc23_13p6TeV", "addresses"),
+        [("JetPhoton", "Dijet", "Baseline", "Pythia8")],
+    )
+
+    stats = import_snapshot(snapshot, cache, catalog)
+    assert "get_provenance" not in stats.entries
+    assert cache.get(PROV_KEY) == ["local"]
+    assert len(cache.get(("fuzzy_search", "mc23_13p6TeV", "addresses"))) == 2
+
+    import_snapshot(snapshot, cache, catalog, overwrite=True)
+    assert cache.get(PROV_KEY) == [EVNT]
+
+
+def test_import_skips_entries_expired_since_export(tmp_path, source, target):
+    cache, _ = source
+    cache.set(("atlas_mcp.central_page.get_metadata", "x"), {"a": 1}, expire=0.05)
+    snapshot = tmp_path / "snap.gz"
+    export_snapshot(snapshot, *source)
+    time.sleep(0.1)
+
+    stats = import_snapshot(snapshot, *target)
+    assert stats.skipped_expired == 1
+    assert "get_metadata" not in stats.entries
+
+
+def test_import_rejects_other_files(tmp_path, target):
+    bad = tmp_path / "bad.gz"
+    with gzip.open(bad, "wb") as f:
+        pickle.dump({"format": "something-else"}, f)
+
+    with pytest.raises(ValueError):
+        import_snapshot(bad, *target)
+
+
+def test_cli_snapshot_commands(mocker, tmp_path):
+    from atlas_mcp.snapshot import SnapshotStats
+
+    export = mocker.patch(
+        "atlas_mcp.snapshot.export_snapshot", return_value=SnapshotStats(created=0)
+    )
+    load = mocker.patch(
+        "atlas_mcp.snapshot.import_snapshot", return_value=SnapshotStats(created=0)
+    )
+
+    cli.main(["snapshot", "export", str(tmp_path / "s.gz")])
+    export.assert_called_once_with(str(tmp_path / "s.gz"))
+
+    cli.main(["snapshot", "import", "--overwrite", str(tmp_path / "s.gz")])
+    load.assert_called_once_with(str(tmp_path / "s.gz"), overwrite=True)
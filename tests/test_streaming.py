@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from atlas_mcp import deadlines, streaming
+
+
+def backend(lines, delay=0.0):
+    "A stand-in for a backend call, printing `lines` to the current listener"
+    listener = streaming.listener()
+    for line in lines:
+        if listener is not None:
+            listener(line)
+        time.sleep(delay)
+    return len(lines)
+
+
+@pytest.mark.asyncio
+async def test_run_streaming_passes_lines_on():
+    seen = []
+
+    async def on_line(line):
+        seen.append((line, time.monotonic()))
+
+    start = time.monotonic()
+    assert await streaming.run_streaming(on_line, backend, ["a", "b", "c"], 0.2) == 3
+    assert [line for line, _ in seen] == ["a", "b", "c"]
+    # The first line was passed on while the backend was still running
+    assert seen[0][1] - start < 0.3
+
+
+@pytest.mark.asyncio
+async def test_run_streaming_without_listener():
+    assert await streaming.run_streaming(None, backend, ["a"]) == 1
+    assert streaming.listener() is None
+
+
+@pytest.mark.asyncio
+async def test_run_streaming_errors():
+    seen = []
+
+    async def on_line(line):
+        seen.append(line)
+
+    def failing():
+        streaming.listener()("partial")
+        raise deadlines.BackendTimeoutError("too slow")
+
+    with pytest.raises(deadlines.BackendTimeoutError):
+        await streaming.run_streaming(on_line, failing)
+    assert seen == ["partial"]
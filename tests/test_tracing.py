@@ -0,0 +1,111 @@
+import json
+import sys
+
+import pytest
+
+import atlas_mcp.central_page as cp
+from atlas_mcp import deadlines, server, tracing
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    tracing.configure(path)
+    yield path
+    tracing.configure(None)
+
+
+def read_spans(path):
+    spans = []
+    for line in path.read_text().splitlines():
+        request = json.loads(line)
+        for rs in request["resourceSpans"]:
+            for ss in rs["scopeSpans"]:
+                spans.extend(ss["spans"])
+    return spans
+
+
+def attributes(span):
+    return {a["key"]: list(a["value"].values())[0] for a in span["attributes"]}
+
+
+def test_disabled_is_noop(tmp_path):
+    tracing.configure(None)
+    with tracing.span("nothing") as s:
+        s.set_attribute("a", 1)
+    assert tracing.current_trace_id() is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_nested_spans(trace_file):
+    with tracing.span("outer", {"n": 1}):
+        trace_id = tracing.current_trace_id()
+        with pytest.raises(ValueError):
+            with tracing.span("inner"):
+                raise ValueError("bad")
+
+    inner, outer = read_spans(trace_file)
+    assert inner["traceId"] == outer["traceId"] == trace_id
+    assert len(trace_id) == 32
+    assert inner["parentSpanId"] == outer["spanId"]
+    assert "parentSpanId" not in outer
+    assert inner["status"] == {"code": 2, "message": "ValueError: bad"}
+    assert outer["status"] == {"code": 1}
+    assert attributes(outer) == {"n": "1"}
+    assert int(outer["endTimeUnixNano"]) >= int(inner["endTimeUnixNano"])
+
+
+@pytest.mark.asyncio
+async def test_tool_to_subprocess(trace_file, mocker):
+    """One trace runs from the tool, through the cache and scheduler, to the process,
+    and a second call is a cache hit."""
+    cp.cache.clear()
+    run_process = deadlines._run_process
+    stdout = "--start--\nmc23_13p6TeV.601237.X.evgen.EVNT.e8514\n"
+    echo = [sys.executable, "-c", "import sys; sys.stdout.write(sys.argv[1])", stdout]
+    mocker.patch(
+        "atlas_mcp.deadlines._run_process",
+        side_effect=lambda cmd, *args: run_process(echo, *args),
+    )
+    hashtags = ["Top", "TTbar", "Baseline", "PowhegPythia"]
+
+    result = await server.get_evtgen_for_address("mc23_13p6TeV", hashtags)
+    assert json.loads(result) == ["mc23_13p6TeV.601237.X.evgen.EVNT.e8514"]
+    spans = read_spans(trace_file)
+    by_name = {s["name"]: s for s in spans}
+    assert set(by_name) == {
+        "tool get_evtgen_for_address",
+        "cache get_evtgen_for_address",
+        "run_ami_helper",
+        "scheduler.wait",
+        "run_on_wsl",
+        "subprocess",
+    }
+    assert len({s["traceId"] for s in spans}) == 1
+
+    chain = [
+        "tool get_evtgen_for_address",
+        "cache get_evtgen_for_address",
+        "run_ami_helper",
+        "run_on_wsl",
+        "subprocess",
+    ]
+    for parent, child in zip(chain, chain[1:]):
+        assert by_name[child]["parentSpanId"] == by_name[parent]["spanId"]
+    assert (
+        by_name["scheduler.wait"]["parentSpanId"] == by_name["run_ami_helper"]["spanId"]
+    )
+    assert attributes(by_name["cache get_evtgen_for_address"])["cache.hit"] is False
+    assert attributes(by_name["subprocess"])["process.exit_code"] == "0"
+
+    trace_file.unlink()
+    await server.get_evtgen_for_address("mc23_13p6TeV", hashtags)
+    tool, cache = sorted(read_spans(trace_file), key=lambda s: s["name"])[::-1]
+    assert attributes(cache)["cache.hit"] is True
+    assert tool["traceId"] == cache["traceId"]
+
+
+def test_traced_cache_keeps_memoize_attributes():
+    assert cp.get_evtgen_for_address.__wrapped__.__name__ == "get_evtgen_for_address"
+    assert not hasattr(cp.get_evtgen_for_address.__wrapped__, "__cache_key__")
+    assert cp.get_evtgen_for_address.__cache_key__